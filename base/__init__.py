@@ -3,10 +3,6 @@
 # Copyright 2021 Adansons Inc.
 # Please contact engineer@adansons.co.jp
 
-from .project import Project
-from .dataset import Dataset
-
-
 # check exists local cache directory and files
 import os
 
@@ -24,3 +20,23 @@ if not os.path.exists(PROJECT_FILE):
 
 VERSION = "0.1.3"
 __version__ = VERSION
+
+# classes are imported on first access, so that CLI starts without heavy modules
+_LAZY_ATTRIBUTES = {
+    "Project": "base.project",
+    "Dataset": "base.dataset",
+    "AsyncProject": "base.aio",
+    "profile": "base.profiler",
+}
+
+
+def __getattr__(name: str):
+    if name in _LAZY_ATTRIBUTES:
+        import importlib
+
+        return getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_ATTRIBUTES))
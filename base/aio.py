@@ -0,0 +1,514 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import asyncio
+import functools
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, Tuple, Union
+
+from base.files import Files
+from base.project import Project
+from base.config import BASE_API_ENDPOINT
+
+# worker threads of the shared executor, requests in flight are still
+# limited by "BASE_MAX_CONCURRENCY" in each client
+MAX_WORKERS = 32
+
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def get_executor() -> Executor:
+    """
+    Get the shared executor of AsyncProject and AsyncFiles.
+
+    Returns
+    -------
+    executor : concurrent.futures.ThreadPoolExecutor
+        executor created on the first call
+    """
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(
+                max_workers=MAX_WORKERS, thread_name_prefix="base-aio"
+            )
+    return _EXECUTOR
+
+
+async def run_in_executor(
+    executor: Optional[Executor], func: Callable, *args, **kwargs
+) -> Any:
+    """
+    Run a blocking function in the executor without blocking the event loop.
+
+    Parameters
+    ----------
+    executor : concurrent.futures.Executor
+        executor to run the function, use the shared executor if None
+    func : callable
+        blocking function
+    *args, **kwargs
+        arguments of the function
+
+    Returns
+    -------
+    result : Any
+        return value of the function
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor or get_executor(), functools.partial(func, *args, **kwargs)
+    )
+
+
+class AsyncFiles:
+    """
+    AsyncFiles class
+
+    Awaitable counterpart of Files, for asyncio applications.
+    Create it with `await AsyncFiles.search(...)` or `await AsyncProject.files(...)`.
+    Attributes of Files, like `files`, `paths` and `items`, are available as they are.
+
+    Attributes
+    ----------
+    sync_files : Files
+        wrapped Files instance
+    executor : concurrent.futures.Executor
+        executor to run blocking calls
+    """
+
+    def __init__(self, files: Files, executor: Optional[Executor] = None) -> None:
+        """
+        Parameters
+        ----------
+        files : Files
+            Files instance to wrap
+        executor : concurrent.futures.Executor, default None
+            executor to run blocking calls, use the shared executor if None
+        """
+        self.sync_files = files
+        self.executor = executor
+
+    @classmethod
+    async def search(
+        cls,
+        project_name: str,
+        conditions: Optional[str] = None,
+        query: List[str] = [],
+        sort_key: Union[str, List[str], None] = None,
+        user_id: Optional[str] = None,
+        access_key: Optional[str] = None,
+        executor: Optional[Executor] = None,
+    ) -> "AsyncFiles":
+        """
+        Search files of the project. Parameters are same as Files.
+
+        Returns
+        -------
+        files : AsyncFiles
+            search result
+        """
+        files = await run_in_executor(
+            executor,
+            Files,
+            project_name,
+            conditions=conditions,
+            query=query,
+            sort_key=sort_key,
+            user_id=user_id,
+            access_key=access_key,
+        )
+        return cls(files, executor)
+
+    async def filter(
+        self,
+        conditions: Optional[str] = None,
+        query: List[str] = [],
+        sort_key: Union[str, List[str], None] = None,
+    ) -> "AsyncFiles":
+        """
+        Filter files in the executor, see `Files.filter()`.
+
+        Returns
+        -------
+        files : AsyncFiles
+            filtered files
+        """
+        files = await run_in_executor(
+            self.executor,
+            self.sync_files.filter,
+            conditions=conditions,
+            query=query,
+            sort_key=sort_key,
+        )
+        return AsyncFiles(files, self.executor)
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "sync_files":
+            raise AttributeError(name)
+        return getattr(self.sync_files, name)
+
+    def __getitem__(self, idx: int):
+        return self.sync_files[idx]
+
+    def __len__(self) -> int:
+        return len(self.sync_files)
+
+    def __iter__(self):
+        return iter(self.sync_files.files)
+
+    def __repr__(self) -> str:
+        return repr(self.sync_files)
+
+    def __add__(self, other: "AsyncFiles") -> "AsyncFiles":
+        return AsyncFiles(self.sync_files + other.sync_files, self.executor)
+
+    def __or__(self, other: "AsyncFiles") -> "AsyncFiles":
+        return AsyncFiles(self.sync_files | other.sync_files, self.executor)
+
+
+class AsyncProject:
+    """
+    AsyncProject class
+
+    Awaitable counterpart of Project, for asyncio applications.
+    Create it with `await AsyncProject.create(...)`.
+    Each call runs in an executor, so that the event loop is not blocked,
+    and calls of many projects can be in flight concurrently.
+    Datafiles are hashed in the worker pools of `add_datafiles` and `ingest`.
+
+    Attributes
+    ----------
+    project : Project
+        wrapped Project instance, which is shared by every call
+    executor : concurrent.futures.Executor
+        executor to run blocking calls
+    project_name : str
+        registerd project name
+    user_id : str
+        registerd user id
+    project_uid : str
+        project unique hash
+    """
+
+    def __init__(self, project: Project, executor: Optional[Executor] = None) -> None:
+        """
+        Parameters
+        ----------
+        project : Project
+            Project instance to wrap
+        executor : concurrent.futures.Executor, default None
+            executor to run blocking calls, use the shared executor if None
+        """
+        self.project = project
+        self.executor = executor
+
+    @classmethod
+    async def create(
+        cls,
+        project_name: str,
+        user_id: Optional[str] = None,
+        access_key: Optional[str] = None,
+        executor: Optional[Executor] = None,
+    ) -> "AsyncProject":
+        """
+        Load the project. Parameters are same as Project.
+        The project list is updated in the executor if the project is not found locally.
+
+        Parameters
+        ----------
+        project_name : str
+            registerd project name
+        user_id : str, default None
+            registerd user id, use configured user id if None
+        access_key : str, default None
+            API access key, use configured access key if None
+        executor : concurrent.futures.Executor, default None
+            executor to run blocking calls, use the shared executor if None
+
+        Returns
+        -------
+        project : AsyncProject
+            loaded project
+        """
+        project = await run_in_executor(
+            executor, Project, project_name, user_id=user_id, access_key=access_key
+        )
+        return cls(project, executor)
+
+    @property
+    def project_name(self) -> str:
+        return self.project.project_name
+
+    @property
+    def user_id(self) -> str:
+        return self.project.user_id
+
+    @property
+    def project_uid(self) -> str:
+        return self.project.project_uid
+
+    @property
+    def import_report(self) -> Optional[dict]:
+        return self.project.import_report
+
+    async def __run(self, func: Callable, *args, **kwargs) -> Any:
+        return await run_in_executor(self.executor, func, *args, **kwargs)
+
+    async def get_attrs(self) -> dict:
+        """
+        Summarized attributes of the project, see `Project.attrs`.
+        """
+        return await self.__run(getattr, self.project, "attrs")
+
+    async def files(
+        self,
+        conditions: Optional[str] = None,
+        query: List[str] = [],
+        sort_key: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> AsyncFiles:
+        """
+        Search files of the project, see `Project.files()`.
+
+        Returns
+        -------
+        files : AsyncFiles
+            search result
+        """
+        files = await self.__run(
+            self.project.files,
+            conditions=conditions,
+            query=query,
+            sort_key=sort_key,
+            limit=limit,
+            offset=offset,
+        )
+        return AsyncFiles(files, self.executor)
+
+    async def count_files(
+        self, conditions: Optional[str] = None, query: List[str] = []
+    ) -> int:
+        """
+        Count files of the project, see `Project.count_files()`.
+
+        Returns
+        -------
+        file_num : int
+            number of matched files
+        """
+        return await self.__run(
+            self.project.count_files, conditions=conditions, query=query
+        )
+
+    async def add_datafile(self, file_path: str, attributes: dict) -> None:
+        """
+        Import meta data of one file, see `Project.add_datafile()`.
+        """
+        await self.__run(self.project.add_datafile, file_path, attributes)
+
+    async def add_datafiles(
+        self,
+        dir_path: Optional[str] = None,
+        extension: Optional[str] = None,
+        attributes: dict = {},
+        parsing_rule: Optional[str] = None,
+        detail_parsing_rule: Optional[str] = None,
+        resume: bool = False,
+        progress_callback: Optional[Callable[[dict], None]] = None,
+        dry_run: bool = False,
+        dry_run_output: Optional[str] = None,
+        max_workers: int = 2,
+        share_attributes: bool = False,
+        specs: Optional[List[dict]] = None,
+    ) -> int:
+        """
+        Import meta data related with datafile paths, see `Project.add_datafiles()`.
+        `progress_callback` is called in a worker thread.
+
+        Returns
+        -------
+        file_num : int
+            number of imported datafiles
+        """
+        return await self.__run(
+            self.project.add_datafiles,
+            dir_path,
+            extension,
+            attributes=attributes,
+            parsing_rule=parsing_rule,
+            detail_parsing_rule=detail_parsing_rule,
+            resume=resume,
+            progress_callback=progress_callback,
+            dry_run=dry_run,
+            dry_run_output=dry_run_output,
+            max_workers=max_workers,
+            share_attributes=share_attributes,
+            specs=specs,
+        )
+
+    async def ingest(
+        self,
+        items: Iterable[Union[str, bytes, Tuple[Union[str, bytes], dict]]],
+        attributes: dict = {},
+        max_latency: float = 1.0,
+        max_workers: int = 2,
+        share_attributes: bool = False,
+    ) -> int:
+        """
+        Import meta data of datafiles in a stream, see `Project.ingest()`.
+
+        Returns
+        -------
+        file_num : int
+            number of imported datafiles
+        """
+        return await self.__run(
+            self.project.ingest,
+            items,
+            attributes=attributes,
+            max_latency=max_latency,
+            max_workers=max_workers,
+            share_attributes=share_attributes,
+        )
+
+    async def extract_metafile(
+        self, file_path: str, attributes: dict = {}, verbose: int = 2
+    ) -> list:
+        """
+        Extract meta data from external file, see `Project.extract_metafile()`.
+
+        Returns
+        -------
+        tables : list
+            list of tables extracted from the external file
+        """
+        return await self.__run(
+            self.project.extract_metafile,
+            file_path,
+            attributes=attributes,
+            verbose=verbose,
+        )
+
+    async def estimate_join_rule(
+        self,
+        tables: Optional[list] = None,
+        file_path: Optional[str] = None,
+        verbose: int = 2,
+    ) -> list:
+        """
+        Estimate join rule from external file and existing table,
+        see `Project.estimate_join_rule()`.
+        """
+        return await self.__run(
+            self.project.estimate_join_rule,
+            tables=tables,
+            file_path=file_path,
+            verbose=verbose,
+        )
+
+    async def add_metafile(
+        self,
+        file_path: Optional[tuple] = None,
+        attributes: dict = {},
+        join_rule: dict = {},
+        auto: bool = True,
+        join_rule_path: Optional[str] = None,
+        verbose: int = 1,
+    ) -> None:
+        """
+        Join external file to the project, see `Project.add_metafile()`.
+        It runs without confirmation by default, because input() blocks a worker.
+        """
+        await self.__run(
+            self.project.add_metafile,
+            file_path=file_path,
+            attributes=attributes,
+            join_rule=join_rule,
+            auto=auto,
+            join_rule_path=join_rule_path,
+            verbose=verbose,
+        )
+
+    async def wait_for_tables(
+        self, interval: float = 2.0, timeout: Optional[float] = None
+    ) -> None:
+        """
+        Wait until tables of the project are available after joining,
+        with polling interval of `asyncio.sleep`.
+
+        Parameters
+        ----------
+        interval : float, default 2.0
+            seconds between status requests
+        timeout : float, default None
+            seconds to give up, wait forever if None
+
+        Raises
+        ------
+        Exception
+            raises if joining failed or it timed out
+        """
+        url = f"{BASE_API_ENDPOINT}/project/{self.project_uid}/tables/status/contents?user={self.user_id}"
+        deadline = None
+        if timeout is not None:
+            deadline = asyncio.get_running_loop().time() + timeout
+        while True:
+            res = await self.__run(
+                self.project.client.request,
+                "GET",
+                url,
+                error_message="Something went wrong. Please try again.",
+            )
+            status = res.json()["ContensStatus"]
+            if status == "Available":
+                return
+            elif status != "Updating":  # Failure
+                raise Exception("Failed to join the tables")
+            if deadline is not None and asyncio.get_running_loop().time() > deadline:
+                raise Exception("Timed out waiting for the tables to be available")
+            await asyncio.sleep(interval)
+
+    async def get_metadata_summary(self) -> List[dict]:
+        """
+        Get metadata summary of the project, see `Project.get_metadata_summary()`.
+        """
+        return await self.__run(self.project.get_metadata_summary)
+
+    async def link_datafiles(self, dir_path: str, extension: str) -> int:
+        """
+        Create linker of local datafiles, see `Project.link_datafiles()`.
+        """
+        return await self.__run(self.project.link_datafiles, dir_path, extension)
+
+    async def add_member(self, member: str, permission_level: str) -> None:
+        """
+        Invite a member to the project, see `Project.add_member()`.
+        """
+        await self.__run(self.project.add_member, member, permission_level)
+
+    async def update_member(self, member: str, permission_level: str) -> None:
+        """
+        Update project member's permission, see `Project.update_member()`.
+        """
+        await self.__run(self.project.update_member, member, permission_level)
+
+    async def get_members(self) -> List[dict]:
+        """
+        Get list of project members, see `Project.get_members()`.
+        """
+        return await self.__run(self.project.get_members)
+
+    async def remove_member(self, member: Union[str, List[str]]) -> None:
+        """
+        Remove project member, see `Project.remove_member()`.
+        """
+        await self.__run(self.project.remove_member, member)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,455 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import io
+import sys
+import time
+import shlex
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import redirect_stderr, redirect_stdout
+from typing import List, Optional
+
+# commands which can be a step of the plan
+BATCH_COMMANDS = ("new", "list", "show", "import", "link", "search", "invite", "rm")
+# number of steps run at once, when neither the plan nor the caller specifies it
+DEFAULT_CONCURRENCY = 4
+
+SUCCEEDED = "Succeeded"
+FAILED = "Failed"
+SKIPPED = "Skipped"
+
+
+class BatchStep:
+    """
+    BatchStep class
+
+    Attributes
+    ----------
+    name : str
+        unique name of the step
+    args : list of str
+        arguments of `base` command, like ["search", "project", "-c", "cat"]
+    needs : list of str
+        names of the steps which must succeed before this step
+    """
+
+    def __init__(self, name: str, args: List[str], needs: List[str] = []) -> None:
+        """
+        Parameters
+        ----------
+        name : str
+            unique name of the step
+        args : list of str
+            arguments of `base` command
+        needs : list of str, default []
+            names of the steps which must succeed before this step
+        """
+        self.name = name
+        self.args = args
+        self.needs = list(needs)
+
+    @property
+    def command(self) -> str:
+        return self.args[0]
+
+    @property
+    def project_name(self) -> Optional[str]:
+        return self.args[1] if len(self.args) > 1 else None
+
+    def __repr__(self) -> str:
+        return f"BatchStep(name='{self.name}', args={self.args}, needs={self.needs})"
+
+
+class BatchPlan:
+    """
+    BatchPlan class
+
+    Sequence or DAG of `base` commands, declared in YAML like below.
+    If no step has "needs", steps run one by one in order of the file.
+    Otherwise, each step waits only for the steps in its "needs",
+    except that imports of the same project never run at once.
+
+        concurrency: 4
+        steps:
+          - name: import-mnist
+            run: import mnist --directory ./mnist --extension png --parse "{dataType}/{label}/{id}.png"
+            needs: []
+          - name: import-cifar10
+            run: import cifar10 --directory ./cifar10 --extension png --parse "{label}/{id}.png"
+            needs: []
+          - name: export-mnist
+            run: [search, mnist, -c, "1", -e, csv, -o, mnist.csv]
+            needs: [import-mnist]
+          - name: export-cifar10
+            run: [search, cifar10, -c, cat, -e, csv, -o, cifar10.csv]
+            needs: [import-cifar10]
+
+    Attributes
+    ----------
+    steps : list of BatchStep
+        steps of the plan, sorted so that each step comes after its "needs"
+    concurrency : int or None
+        number of steps run at once, specified in the plan
+    """
+
+    def __init__(self, steps: List[BatchStep], concurrency: Optional[int] = None):
+        """
+        Parameters
+        ----------
+        steps : list of BatchStep
+            steps of the plan
+        concurrency : int, default None
+            number of steps run at once
+
+        Raises
+        ------
+        ValueError
+            raises if the steps are not a valid DAG of `base` commands
+        """
+        if concurrency is not None and (
+            not isinstance(concurrency, int) or concurrency < 1
+        ):
+            raise ValueError(f"Invalid concurrency: {concurrency}")
+        self.concurrency = concurrency
+        self.steps = self.__sort_steps(steps)
+
+    @classmethod
+    def load(cls, plan_path: str) -> "BatchPlan":
+        """
+        Load the plan from YAML (or JSON) file.
+
+        Parameters
+        ----------
+        plan_path : str
+            path of the plan file
+
+        Returns
+        -------
+        plan : BatchPlan
+            loaded plan
+
+        Raises
+        ------
+        ValueError
+            raises if the plan is invalid
+        """
+        # imported here, because ruamel.yaml takes time to import
+        import ruamel.yaml
+
+        with open(plan_path, "r", encoding="utf-8") as f:
+            try:
+                plan = ruamel.yaml.YAML(typ="safe").load(f)
+            except ruamel.yaml.YAMLError as e:
+                raise ValueError(f"Invalid plan file: {plan_path}\n{e}")
+        return cls.from_dict(plan)
+
+    @classmethod
+    def from_dict(cls, plan: dict) -> "BatchPlan":
+        """
+        Make the plan from dict, which has "steps" and optional "concurrency".
+
+        Parameters
+        ----------
+        plan : dict
+            declared plan
+
+        Returns
+        -------
+        plan : BatchPlan
+            parsed plan
+
+        Raises
+        ------
+        ValueError
+            raises if the plan is invalid
+        """
+        if not isinstance(plan, dict) or not isinstance(plan.get("steps"), list):
+            raise ValueError('Invalid plan: "steps" must be a list of steps.')
+
+        sequential = not any(
+            isinstance(step, dict) and "needs" in step for step in plan["steps"]
+        )
+        steps = []
+        for i, step in enumerate(plan["steps"]):
+            if not isinstance(step, dict) or "run" not in step:
+                raise ValueError(f'Invalid plan: step {i + 1} has no "run".')
+            name = str(step.get("name", f"step{i + 1}"))
+
+            args = step["run"]
+            if isinstance(args, str):
+                args = shlex.split(args)
+            if not isinstance(args, list) or not args:
+                raise ValueError(f'Invalid plan: "run" of {name} must be str or list.')
+            args = [str(arg) for arg in args]
+            if args[0] == "base":
+                args = args[1:]
+
+            if sequential:
+                needs = [steps[-1].name] if steps else []
+            else:
+                needs = step.get("needs") or []
+                if isinstance(needs, str):
+                    needs = [needs]
+            steps.append(BatchStep(name, args, [str(need) for need in needs]))
+
+        return cls(steps, concurrency=plan.get("concurrency"))
+
+    def __sort_steps(self, steps: List[BatchStep]) -> List[BatchStep]:
+        """
+        Validate the steps, and sort them topologically in stable order.
+        """
+        names = [step.name for step in steps]
+        seen = set()
+        for step in steps:
+            if not step.args or step.command not in BATCH_COMMANDS:
+                raise ValueError(
+                    f"Invalid plan: {step.name} runs unsupported command. "
+                    f"Select from {', '.join(BATCH_COMMANDS)}."
+                )
+            if step.name in seen:
+                raise ValueError(f"Invalid plan: step name {step.name} is duplicated.")
+            for need in step.needs:
+                if need not in names:
+                    raise ValueError(f"Invalid plan: {step.name} needs unknown {need}.")
+            seen.add(step.name)
+
+        sorted_steps = []
+        done = set()
+        while len(sorted_steps) < len(steps):
+            ready = [
+                step
+                for step in steps
+                if step.name not in done and all(need in done for need in step.needs)
+            ]
+            if not ready:
+                cycle = [name for name in names if name not in done]
+                raise ValueError(f"Invalid plan: steps depend cyclically: {cycle}")
+            sorted_steps.extend(ready)
+            done.update(step.name for step in ready)
+        return sorted_steps
+
+
+class BatchRunner:
+    """
+    BatchRunner class
+
+    Run steps of the plan in this process, in parallel as far as "needs" allows.
+    Steps share the process state, like the HTTP sessions, the loaded config,
+    the parsed linkers and search results, instead of loading them per command.
+    Steps whose "needs" failed are skipped, and the others keep running.
+
+    Attributes
+    ----------
+    plan : BatchPlan
+        plan to run
+    concurrency : int
+        number of steps run at once
+    """
+
+    def __init__(self, plan: BatchPlan, concurrency: Optional[int] = None) -> None:
+        """
+        Parameters
+        ----------
+        plan : BatchPlan
+            plan to run
+        concurrency : int, default None
+            number of steps run at once, use concurrency of the plan,
+            or 4 if both are None
+        """
+        self.plan = plan
+        self.concurrency = concurrency or plan.concurrency or DEFAULT_CONCURRENCY
+
+    def run(self) -> dict:
+        """
+        Run all steps, and write their output line by line with the step name.
+
+        Returns
+        -------
+        report : dict
+            result of the steps
+            {
+                "Steps": [
+                    {
+                        "Name": str,
+                        "Status": "Succeeded", "Failed" or "Skipped",
+                        "ExitCode": int or None,
+                        "Elapsed": float,
+                    },
+                    ...
+                ],
+                "Elapsed": float,
+            }
+        """
+        # imported here, because they import requests
+        from base import files
+        from base.cache import SearchCache
+        from base.daemon import MODIFYING_COMMANDS, notify_modified
+
+        start = time.time()
+        results = {}
+        stdout = _StepWriter(sys.stdout)
+        stderr = _StepWriter(sys.stderr)
+
+        search_cache = files.SEARCH_CACHE
+        if search_cache is None:
+            files.SEARCH_CACHE = SearchCache()
+        stdin = sys.stdin
+        # steps must not prompt, nobody answers while the batch runs
+        sys.stdin = io.StringIO()
+        try:
+            with redirect_stdout(stdout), redirect_stderr(stderr):
+                with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                    self.__run_steps(executor, stdout, stderr, results)
+        finally:
+            sys.stdin = stdin
+            files.SEARCH_CACHE = search_cache
+
+        # steps ran without the daemon, so let it drop results of modified projects
+        modified_projects = {
+            step.project_name
+            for step in self.plan.steps
+            if step.command in MODIFYING_COMMANDS
+            and results[step.name]["Status"] != SKIPPED
+        }
+        for project_name in modified_projects:
+            notify_modified(project_name)
+
+        return {
+            "Steps": [results[step.name] for step in self.plan.steps],
+            "Elapsed": time.time() - start,
+        }
+
+    def __run_steps(self, executor, stdout, stderr, results: dict) -> None:
+        waiting = list(self.plan.steps)
+        running = {}
+        while waiting or running:
+            for step in list(waiting):
+                statuses = [results.get(need, {}).get("Status") for need in step.needs]
+                if any(status in (FAILED, SKIPPED) for status in statuses):
+                    waiting.remove(step)
+                    results[step.name] = {
+                        "Name": step.name,
+                        "Status": SKIPPED,
+                        "ExitCode": None,
+                        "Elapsed": 0.0,
+                    }
+                elif (
+                    len(running) < self.concurrency
+                    and all(status == SUCCEEDED for status in statuses)
+                    and not self.__is_importing(step, running.values())
+                ):
+                    waiting.remove(step)
+                    future = executor.submit(self.__run_step, step, stdout, stderr)
+                    running[future] = step
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                results[step.name] = future.result()
+
+    def __is_importing(self, step: BatchStep, running_steps) -> bool:
+        """
+        Judge whether another import of the project is running.
+        Imports of the same project run one by one, because they share the checkpoint.
+        """
+        return step.command == "import" and any(
+            running_step.command == "import"
+            and running_step.project_name == step.project_name
+            for running_step in running_steps
+        )
+
+    def __run_step(self, step: BatchStep, stdout, stderr) -> dict:
+        from base.daemon import _run_cli
+
+        stdout.begin(step.name)
+        stderr.begin(step.name)
+        stdout.write(f"base {shlex.join(step.args)}\n")
+        start = time.time()
+        try:
+            exit_code = _run_cli(step.args, local=True)
+        finally:
+            self.__invalidate(step)
+            stdout.end()
+            stderr.end()
+        return {
+            "Name": step.name,
+            "Status": SUCCEEDED if exit_code == 0 else FAILED,
+            "ExitCode": exit_code,
+            "Elapsed": time.time() - start,
+        }
+
+    def __invalidate(self, step: BatchStep) -> None:
+        """
+        Drop shared search results of the project modified by the step.
+        """
+        from base import files
+        from base.config import get_project_uid, get_user_id
+        from base.daemon import MODIFYING_COMMANDS
+
+        if step.command not in MODIFYING_COMMANDS or files.SEARCH_CACHE is None:
+            return
+        try:
+            project_uid = get_project_uid(get_user_id(), step.project_name)
+        except Exception:
+            project_uid = None
+        files.SEARCH_CACHE.invalidate(project_uid)
+
+
+class _StepWriter(io.TextIOBase):
+    """
+    Text stream shared by steps running in threads.
+    Each line is written with the name of the step which wrote it, and
+    carriage return frames like progress bars are collapsed to the last one.
+    """
+
+    def __init__(self, stream) -> None:
+        self.stream = stream
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def writable(self) -> bool:
+        return True
+
+    def isatty(self) -> bool:
+        return False
+
+    @property
+    def encoding(self) -> str:
+        return "utf-8"
+
+    def begin(self, name: str) -> None:
+        self._local.name = name
+        self._local.pending = ""
+
+    def end(self) -> None:
+        pending = getattr(self._local, "pending", "")
+        if pending.strip():
+            self.__write_lines([pending])
+        self._local.name = None
+        self._local.pending = ""
+
+    def write(self, text: str) -> int:
+        if not isinstance(text, str):
+            # click probes whether the stream is binary with write(b"")
+            raise TypeError(f"write() argument must be str, not {type(text).__name__}")
+        lines = (getattr(self._local, "pending", "") + text).split("\n")
+        self._local.pending = lines.pop().rsplit("\r", 1)[-1]
+        if lines:
+            self.__write_lines(lines)
+        return len(text)
+
+    def __write_lines(self, lines: List[str]) -> None:
+        name = getattr(self._local, "name", None)
+        prefix = f"[{name}] " if name else ""
+        text = "".join(prefix + line.rsplit("\r", 1)[-1] + "\n" for line in lines)
+        with self._lock:
+            self.stream.write(text)
+            self.stream.flush()
+
+
+if __name__ == "__main__":
+    pass
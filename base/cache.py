@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import os
+import json
+import time
+import base64
+import hashlib
+import threading
+import requests
+from collections import OrderedDict
+from requests.structures import CaseInsensitiveDict
+from typing import List, Optional
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".base", "cache")
+# seconds a cached response is used without revalidation
+CACHE_TTL = float(os.environ.get("BASE_CACHE_TTL", 60))
+# number of search results kept in memory by SearchCache
+SEARCH_CACHE_SIZE = 32
+
+
+class ResponseCache:
+    """
+    ResponseCache class
+
+    Cache responses of read-only GET requests on disk under ~/.base/cache.
+    A cached response is returned as it is within `ttl` seconds,
+    after that it is revalidated with "If-None-Match" / "If-Modified-Since"
+    headers, and reused when the server answers 304 Not Modified.
+
+    Entries are separated by scope (the API access key), and each scope
+    is marked stale when the client sends a modifying request,
+    so that the next read is always revalidated.
+
+    Attributes
+    ----------
+    cache_dir : str
+        directory to save cached responses
+    ttl : float
+        seconds a cached response is used without revalidation
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, ttl: float = CACHE_TTL) -> None:
+        """
+        Parameters
+        ----------
+        cache_dir : str, default None
+            directory to save cached responses, use ~/.base/cache if None
+        ttl : float, default 60
+            seconds a cached response is used without revalidation,
+            can be set by "BASE_CACHE_TTL" environment variable
+        """
+        self.cache_dir = cache_dir or CACHE_DIR
+        self.ttl = ttl
+
+    def lookup(self, scope: str, url: str) -> Optional[dict]:
+        """
+        Get cached entry of the url.
+
+        Parameters
+        ----------
+        scope : str
+            scope of the entry, like API access key
+        url : str
+            request url
+
+        Returns
+        -------
+        entry : dict
+            cached entry, None if not cached
+        """
+        try:
+            with open(self.__entry_location(scope, url), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("URL") != url:
+            return None
+        return entry
+
+    def is_fresh(self, scope: str, entry: dict) -> bool:
+        """
+        Judge whether the entry can be used without revalidation.
+
+        Parameters
+        ----------
+        scope : str
+            scope of the entry
+        entry : dict
+            cached entry
+
+        Returns
+        -------
+        fresh : bool
+            True if the entry is within TTL and the scope was not modified after it
+        """
+        if time.time() - entry["StoredAt"] >= self.ttl:
+            return False
+        try:
+            stale_at = os.path.getmtime(self.__stale_location(scope))
+        except OSError:
+            return True
+        return entry["StoredAt"] > stale_at
+
+    def get_validators(self, entry: dict) -> dict:
+        """
+        Get conditional request headers of the entry.
+
+        Parameters
+        ----------
+        entry : dict
+            cached entry
+
+        Returns
+        -------
+        headers : dict
+            "If-None-Match" and "If-Modified-Since" headers
+        """
+        headers = {}
+        if entry.get("ETag"):
+            headers["If-None-Match"] = entry["ETag"]
+        if entry.get("LastModified"):
+            headers["If-Modified-Since"] = entry["LastModified"]
+        return headers
+
+    def store(self, scope: str, url: str, response: requests.Response) -> dict:
+        """
+        Save a successful response.
+
+        Parameters
+        ----------
+        scope : str
+            scope of the entry
+        url : str
+            request url
+        response : requests.Response
+            response with status code 200
+
+        Returns
+        -------
+        entry : dict
+            saved entry
+        """
+        entry = {
+            "URL": url,
+            "StoredAt": time.time(),
+            "ETag": response.headers.get("ETag"),
+            "LastModified": response.headers.get("Last-Modified"),
+            "Headers": dict(response.headers),
+            "Body": base64.b64encode(response.content).decode(),
+        }
+        self.__write(self.__entry_location(scope, url), entry)
+        return entry
+
+    def refresh(self, scope: str, entry: dict) -> None:
+        """
+        Restart TTL of the entry after it was revalidated.
+
+        Parameters
+        ----------
+        scope : str
+            scope of the entry
+        entry : dict
+            cached entry
+        """
+        entry["StoredAt"] = time.time()
+        self.__write(self.__entry_location(scope, entry["URL"]), entry)
+
+    def invalidate(self, scope: str) -> None:
+        """
+        Mark all entries of the scope stale.
+        Entries are kept, so that they can be revalidated with their ETag.
+
+        Parameters
+        ----------
+        scope : str
+            scope of the entries
+        """
+        scope_dir = os.path.dirname(self.__stale_location(scope))
+        if not os.path.isdir(scope_dir):
+            # nothing was cached in this scope
+            return
+        with open(self.__stale_location(scope), "a"):
+            pass
+        os.utime(self.__stale_location(scope))
+
+    def build_response(self, entry: dict) -> requests.Response:
+        """
+        Restore a response from the entry.
+
+        Parameters
+        ----------
+        entry : dict
+            cached entry
+
+        Returns
+        -------
+        response : requests.Response
+            response with the cached body and headers
+        """
+        response = requests.Response()
+        response.status_code = 200
+        response.url = entry["URL"]
+        response.headers = CaseInsensitiveDict(entry["Headers"])
+        response._content = base64.b64decode(entry["Body"])
+        response.encoding = "utf-8"
+        return response
+
+    def __scope_dir(self, scope: str) -> str:
+        return os.path.join(
+            self.cache_dir, hashlib.sha256(scope.encode("utf-8")).hexdigest()
+        )
+
+    def __entry_location(self, scope: str, url: str) -> str:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.__scope_dir(scope), f"{key}.json")
+
+    def __stale_location(self, scope: str) -> str:
+        return os.path.join(self.__scope_dir(scope), "stale")
+
+    def __write(self, location: str, entry: dict) -> None:
+        os.makedirs(os.path.dirname(location), exist_ok=True)
+        tmp_location = f"{location}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_location, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_location, location)
+
+
+class SearchCache:
+    """
+    SearchCache class
+
+    Keep recent search results of Files in memory, in a long-running process
+    like `base daemon`. A result is used within `ttl` seconds, and results
+    of a project are dropped when the project is modified.
+
+    Attributes
+    ----------
+    ttl : float
+        seconds a search result is used
+    max_entries : int
+        number of search results kept, the least recently used one is dropped
+    hits : int
+        number of lookups answered from the cache
+    """
+
+    def __init__(self, ttl: float = CACHE_TTL, max_entries: int = SEARCH_CACHE_SIZE):
+        """
+        Parameters
+        ----------
+        ttl : float, default 60
+            seconds a search result is used,
+            can be set by "BASE_CACHE_TTL" environment variable
+        max_entries : int, default 32
+            number of search results kept
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, project_uid: str, url: str) -> Optional[List[dict]]:
+        """
+        Get the search result of the url.
+
+        Parameters
+        ----------
+        project_uid : str
+            project unique hash
+        url : str
+            url of the search request
+
+        Returns
+        -------
+        records : list of dict or None
+            records of the search result, None if it is not cached or expired.
+            they are shared with other callers, so copy before modifying them
+        """
+        key = (project_uid, url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, records = entry
+            if time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return records
+
+    def put(self, project_uid: str, url: str, records: List[dict]) -> None:
+        """
+        Store the search result of the url.
+
+        Parameters
+        ----------
+        project_uid : str
+            project unique hash
+        url : str
+            url of the search request
+        records : list of dict
+            records of the search result
+        """
+        with self._lock:
+            self._entries[(project_uid, url)] = (time.time(), records)
+            self._entries.move_to_end((project_uid, url))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, project_uid: Optional[str] = None) -> None:
+        """
+        Drop search results of the project.
+
+        Parameters
+        ----------
+        project_uid : str, default None
+            project unique hash, drop all results if None
+        """
+        with self._lock:
+            if project_uid is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == project_uid]:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+if __name__ == "__main__":
+    pass
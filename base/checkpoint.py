@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import os
+import json
+import hashlib
+import time
+import shutil
+import threading
+from typing import List
+
+CHECKPOINT_DIR = os.path.join(os.path.expanduser("~"), ".base", "checkpoint")
+# seconds to keep hashed records in the buffer, at most this much is lost on a kill
+FLUSH_INTERVAL = 1.0
+
+
+class ImportCheckpoint:
+    """
+    ImportCheckpoint class
+
+    Persist the progress of `Project.add_datafiles` under
+    ~/.base/checkpoint/{project_uid}/{signature hash}, so that an interrupted
+    import can continue from the last acknowledged batch. Imports with other
+    arguments on the same project have their own checkpoints.
+
+    - records.jsonl : hashed records, appended while calculating filehashs
+      and flushed every FLUSH_INTERVAL seconds
+    - state.json : import arguments, linker state and uploaded batches
+
+    Attributes
+    ----------
+    project_uid : str
+        project unique hash
+    signature : dict
+        arguments of the import, the checkpoint is valid only for same arguments
+    records : list of dict
+        hashed meta data records in upload order
+    paths : list of str
+        file paths related with `records`
+    linked : bool
+        whether the local datafile linker was written or not
+    uploaded_batches : list of str
+        ids of acknowledged batches
+    uploaded_num : int
+        number of acknowledged records from the head of `records`
+    persistent : bool
+        if False, keep the progress only in memory (used on dry run)
+    """
+
+    def __init__(
+        self, project_uid: str, signature: dict, persistent: bool = True
+    ) -> None:
+        """
+        Parameters
+        ----------
+        project_uid : str
+            project unique hash
+        signature : dict
+            arguments of the import
+        persistent : bool, default True
+            if False, keep the progress only in memory (used on dry run)
+        """
+        self.project_uid = project_uid
+        self.signature = signature
+        self.persistent = persistent
+        self.project_dir = os.path.join(CHECKPOINT_DIR, project_uid)
+        signature_hash = hashlib.sha256(
+            json.dumps(signature, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:16]
+        self.checkpoint_dir = os.path.join(self.project_dir, signature_hash)
+        self.records_location = os.path.join(self.checkpoint_dir, "records.jsonl")
+        self.state_location = os.path.join(self.checkpoint_dir, "state.json")
+
+        self.records = []
+        self.paths = []
+        self.linked = False
+        self.uploaded_batches = []
+        self.uploaded_num = 0
+
+        self._lock = threading.Lock()
+        self._records_file = None
+        self._flushed_at = 0.0
+
+    def load(self) -> bool:
+        """
+        Load saved checkpoint of the same import.
+
+        Returns
+        -------
+        loaded : bool
+            False if there is no checkpoint or it was saved by another import
+        """
+        if not self.persistent or not os.path.exists(self.state_location):
+            return False
+        try:
+            with open(self.state_location, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except ValueError:
+            return False
+        if state.get("Signature") != self.signature:
+            return False
+
+        records = []
+        paths = []
+        if os.path.exists(self.records_location):
+            with open(self.records_location, "rb+") as f:
+                valid_size = 0
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("Incomplete line")
+                        entry = json.loads(line.decode("utf-8"))
+                    except ValueError:
+                        # the last line may be broken by interruption
+                        f.truncate(valid_size)
+                        break
+                    records.append(entry["Record"])
+                    paths.append(entry["FilePath"])
+                    valid_size += len(line)
+
+        self.records = records
+        self.paths = paths
+        self.linked = state.get("Linked", False)
+        self.uploaded_batches = state.get("UploadedBatches", [])
+        self.uploaded_num = min(state.get("UploadedNum", 0), len(records))
+        return True
+
+    def clear(self) -> None:
+        """
+        Remove saved checkpoint and start a new one.
+        """
+        self.close()
+        if self.persistent:
+            shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+        self.records = []
+        self.paths = []
+        self.linked = False
+        self.uploaded_batches = []
+        self.uploaded_num = 0
+
+    def add_record(self, file_path: str, record: dict) -> None:
+        """
+        Append a hashed record. This method is safe to call from worker threads.
+        Records are flushed to the file every FLUSH_INTERVAL seconds.
+
+        Parameters
+        ----------
+        file_path : str
+            absolute path of the datafile
+        record : dict
+            meta data record of the datafile
+        """
+        line = None
+        if self.persistent:
+            line = json.dumps({"FilePath": file_path, "Record": record}) + "\n"
+        with self._lock:
+            if line is not None:
+                if self._records_file is None:
+                    os.makedirs(self.checkpoint_dir, exist_ok=True)
+                    self._records_file = open(
+                        self.records_location, "a", encoding="utf-8"
+                    )
+                    self._flushed_at = time.monotonic()
+                self._records_file.write(line)
+                if time.monotonic() - self._flushed_at >= FLUSH_INTERVAL:
+                    self._records_file.flush()
+                    self._flushed_at = time.monotonic()
+            self.records.append(record)
+            self.paths.append(file_path)
+
+    def close(self) -> None:
+        """
+        Flush and close the records file.
+        """
+        with self._lock:
+            if self._records_file is not None:
+                self._records_file.close()
+                self._records_file = None
+
+    def mark_linked(self) -> None:
+        """
+        Record that the local datafile linker was written.
+        """
+        self.linked = True
+        self.save()
+
+    def mark_uploaded(self, batch_id: str, uploaded_num: int) -> None:
+        """
+        Record an acknowledged batch.
+
+        Parameters
+        ----------
+        batch_id : str
+            id of the acknowledged batch
+        uploaded_num : int
+            number of acknowledged records from the head of `records`
+        """
+        self.uploaded_batches.append(batch_id)
+        self.uploaded_num = uploaded_num
+        self.save()
+
+    def pending_records(self) -> List[dict]:
+        """
+        Get records which have not been acknowledged yet.
+
+        Returns
+        -------
+        records : list of dict
+            meta data records after `uploaded_num`
+        """
+        return self.records[self.uploaded_num :]
+
+    def save(self) -> None:
+        """
+        Write state.json atomically.
+        """
+        self.close()
+        if not self.persistent:
+            return
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        state = {
+            "Signature": self.signature,
+            "Linked": self.linked,
+            "UploadedBatches": self.uploaded_batches,
+            "UploadedNum": self.uploaded_num,
+        }
+        tmp_location = (
+            f"{self.state_location}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        with open(tmp_location, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_location, self.state_location)
+
+    def remove(self) -> None:
+        """
+        Remove the checkpoint after the import was completed.
+        """
+        self.close()
+        if self.persistent:
+            shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+            try:
+                # left while other imports of the project have checkpoints
+                os.rmdir(self.project_dir)
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    pass
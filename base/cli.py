@@ -6,39 +6,33 @@ import os
 import sys
 import time
 import glob
-import json
 
 import click
 from datetime import datetime
 
 from base import VERSION
-from base.project import (
-    Project,
-    create_project,
-    get_projects,
-    archive_project,
-    delete_project,
-    summarize_keys_information,
-)
-from base.config import (
-    get_user_id,
-    get_access_key,
-    register_access_key,
-    register_user_id,
-    update_project_info,
-    get_user_id_from_db,
-    check_project_available,
-)
+from base.daemon import DaemonGroup
 from .exception import CatchAllExceptions, search_export_exception
 
 
 def base_config(func):
     def wrapper(*args, **kwargs):
+        from base.config import (
+            get_user_id,
+            get_access_key,
+            register_access_key,
+            register_user_id,
+            update_project_info,
+            get_user_id_from_db,
+            REGISTRY_TTL,
+        )
+
         # Try get user_id
         try:
             access_key = get_access_key()
             user_id = get_user_id()
-            update_project_info(user_id)
+            # the project file is updated only when it is old or misses the project
+            update_project_info(user_id, kwargs.get("project"), ttl=REGISTRY_TTL)
         except:
             click.echo(
                 "Welcome to Adansons Base!!\n\nLet's start with your access key provided on our slack.\n(if you don't have access key, please press ENTER.)\n"
@@ -52,10 +46,10 @@ def base_config(func):
                         click.echo(
                             "\nGet invitation from here!\n-> https://share.hsforms.com/16OxTF7eJRPK92oGCny7nGw8moen\n"
                         )
-                        sys.exit()
+                        sys.exit(1)
                 except click.exceptions.Abort:
                     click.echo("\nAborted!")
-                    sys.exit()
+                    sys.exit(1)
 
                 try:
                     register_access_key(access_key)
@@ -64,7 +58,7 @@ def base_config(func):
                     update_project_info(user_id)
                 except click.exceptions.Abort:
                     click.echo("\nAborted!")
-                    sys.exit()
+                    sys.exit(1)
                 except:
                     click.echo(
                         "\nIncorrect access key was specified, please re-configure or ask support team.\n"
@@ -83,10 +77,27 @@ def base_config(func):
 
 
 @click.version_option(VERSION)
-@click.group()
-def main():
+@click.group(cls=DaemonGroup)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="show wall and CPU time of each stage at exit",
+)
+@click.option(
+    "--profile-output",
+    type=str,
+    help="dump cProfile stats to the file, with --profile",
+    required=False,
+)
+@click.pass_context
+def main(ctx, profile, profile_output):
     """Adansons Database Command Line Interface"""
-    pass
+    if profile:
+        from base.profiler import start_profile, stop_profile
+
+        start_profile(profile_output)
+        # the summary is written to stderr, so that it does not mix with exports
+        ctx.call_on_close(lambda: click.echo(stop_profile().format_summary(), err=True))
 
 
 @main.command(name="new", help="create new project")
@@ -111,11 +122,15 @@ def create_table(project, user_id):
     project_uid : str
         project unique hash
     """
+    from base.project import create_project
+    from base.config import check_project_available
+
     try:
         project_uid = create_project(user_id, project)
         check_project_available(user_id, project_uid)
     except Exception as e:
         click.echo(e)
+        sys.exit(1)
     else:
         click.echo(
             f"Your Project UID\n----------------\n{project_uid}\n\nsave Project UID in local file (~/.base/projects)"
@@ -139,11 +154,13 @@ def list_project(archived, user_id):
     archived : bool
         if you want show archived projects
     """
+    from base.project import get_projects
 
     try:
         project_list = get_projects(user_id, archived=archived)
     except Exception as e:
         click.echo(e)
+        sys.exit(1)
     else:
         click.echo("projects\n========")
         for project in project_list:
@@ -190,12 +207,15 @@ def remove_project(confirm, project, user_id, member):
     member : list
         if you want remove project member from project
     """
+    from base.project import Project, archive_project, delete_project
+
     if not member:
         if confirm:
             try:
                 delete_project(user_id, project)
             except Exception as e:
                 click.echo(e)
+                sys.exit(1)
 
             else:
                 click.echo(f"{project} was Deleted")
@@ -205,6 +225,7 @@ def remove_project(confirm, project, user_id, member):
                 archive_project(user_id, project)
             except Exception as e:
                 click.echo(e)
+                sys.exit(1)
             else:
                 click.echo(f"{project} was Archived")
     else:
@@ -214,6 +235,7 @@ def remove_project(confirm, project, user_id, member):
             pjt.remove_member(member)
         except Exception as e:
             click.echo(e)
+            sys.exit(1)
         else:
             click.echo(f"{','.join(member)} was removed from {project}")
 
@@ -242,6 +264,8 @@ def show_project_detail(project, user_id, member_list):
     member_list : bool
         if you want see about project members
     """
+    from base.project import Project, summarize_keys_information
+
     pjt = Project(project)
     if not member_list:
 
@@ -250,6 +274,7 @@ def show_project_detail(project, user_id, member_list):
             summary_for_print = summarize_keys_information(key_list)
         except Exception as e:
             click.echo(e)
+            sys.exit(1)
         else:
             click.echo(
                 f"project {project}\n===============\nYou have {summary_for_print['MaxRecordedCount']} records with {summary_for_print['UniqueKeyCount']} keys in this project.\n\n[Keys Information]\n"
@@ -274,6 +299,7 @@ def show_project_detail(project, user_id, member_list):
             member_list = pjt.get_members()
         except Exception as e:
             click.echo(e)
+            sys.exit(1)
         else:
             click.echo("project Members\n===============")
             for column in member_list:
@@ -306,20 +332,28 @@ def show_project_detail(project, user_id, member_list):
     "-d",
     "--directory",
     type=str,
-    help="target directory path",
+    help="target directory path, repeat it to import multiple directories at once",
     required=False,
     default=None,
+    multiple=True,
 )
 @click.option(
     "-e",
     "--extension",
     type=str,
-    help="target file extensions",
+    help="target file extensions, once for all directories or once for each",
     required=False,
     default=None,
+    multiple=True,
 )
 @click.option(
-    "-c", "--parse", type=str, help="path parsing rule", required=False, default=None
+    "-c",
+    "--parse",
+    type=str,
+    help="path parsing rule, once for all directories or once for each",
+    required=False,
+    default=None,
+    multiple=True,
 )
 @click.option(
     "-a",
@@ -354,6 +388,45 @@ def show_project_detail(project, user_id, member_list):
 @click.option("--export", type=str, help="export file type", required=False)
 @click.option("--output", type=str, help="output file path", required=False)
 @click.option("--auto-approve", is_flag=True)
+@click.option(
+    "--resume",
+    help="flag for continuing the interrupted import from the last checkpoint",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--dry-run",
+    help="flag for building payloads without uploading them",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--dry-run-output",
+    type=str,
+    help="file path to write payloads as JSONL on dry run",
+    required=False,
+    default=None,
+)
+@click.option(
+    "-w",
+    "--workers",
+    type=int,
+    help="number of threads to calculate filehashs",
+    required=False,
+    default=2,
+)
+@click.option(
+    "--share-attributes",
+    help="flag for sending additional key and values once per batch",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--background",
+    help="flag for queueing the import as a background job, see `base jobs`",
+    is_flag=True,
+    default=False,
+)
 @base_config
 def import_data(
     project,
@@ -369,6 +442,12 @@ def import_data(
     join_rule,
     export,
     output,
+    resume,
+    dry_run,
+    dry_run_output,
+    workers,
+    share_attributes,
+    background,
     user_id,
 ):
     """
@@ -376,6 +455,10 @@ def import_data(
     Usage
     -----
     $ base import sample-project -d ../dataset -e wav -c {timestamp}/{UID}-{condition}-{iteration}.wav
+    If you want to import multiple directories at once :
+    $ base import sample-project -d /mnt/a/train -c {label}/{id}.png -d /mnt/b/test -c {id}.png -e png
+    If you want to import in background, and leave the terminal :
+    $ base import sample-project -d ../dataset -e wav -c {timestamp}/{UID}.wav --background
     If you want to import meta-data from an external file :
     $ base import sample-project --external-file your/path/to_data
     Arguments
@@ -386,12 +469,26 @@ def import_data(
     ----------
     user_id : str
         registerd user id
-    directory : str, default=None
-    extension : str, default=None
-    parse : str, default=None
+    directory : tuple of str, default=()
+    extension : tuple of str, default=()
+        one extension for all directories, or one for each directory
+    parse : tuple of str, default=()
+        one parsing rule for all directories, or one for each directory
     additional : tuple of str, default=None
     auto_approve : bool, default=False
         approve estimated table joining rule
+    resume : bool, default=False
+        continue the interrupted import from the last checkpoint
+    dry_run : bool, default=False
+        build payloads and report them without uploading
+    dry_run_output : str, default=None
+        file path to write payloads as JSONL on dry run
+    workers : int, default=2
+        number of threads to calculate filehashs
+    share_attributes : bool, default=False
+        send additional key and values once per batch instead of on every record
+    background : bool, default=False
+        queue the import as a background job instead of running it
     """
     if additional is None:
         additional = {}
@@ -404,23 +501,75 @@ def import_data(
             click.echo(
                 "Found invalid argument in -x. The argument must be : -x key:value"
             )
+            sys.exit(1)
         else:
-            import_metafile(
-                project,
-                path,
-                additional,
-                auto_approve,
-                extract,
-                estimate_rule,
-                join_rule,
-                export,
-                output,
-            ) if external_file else import_dataset(
-                project, directory, extension, parse, additional
-            )
+            if background:
+                queue_import(
+                    project,
+                    external_file,
+                    directory,
+                    extension,
+                    parse,
+                    additional,
+                    dry_run,
+                    dry_run_output,
+                    workers,
+                    share_attributes,
+                )
+            elif external_file:
+                import_metafile(
+                    project,
+                    path,
+                    additional,
+                    auto_approve,
+                    extract,
+                    estimate_rule,
+                    join_rule,
+                    export,
+                    output,
+                )
+            elif len(directory) > 1:
+                import_datasets(
+                    project,
+                    directory,
+                    extension,
+                    parse,
+                    additional,
+                    resume,
+                    dry_run,
+                    dry_run_output,
+                    workers,
+                    share_attributes,
+                )
+            else:
+                import_dataset(
+                    project,
+                    directory[0] if directory else None,
+                    extension[0] if extension else None,
+                    parse[0] if parse else None,
+                    additional,
+                    resume,
+                    dry_run,
+                    dry_run_output,
+                    workers,
+                    share_attributes,
+                )
 
 
-def import_dataset(project, directory, extension, parse, additional):
+def import_dataset(
+    project,
+    directory,
+    extension,
+    parse,
+    additional,
+    resume=False,
+    dry_run=False,
+    dry_run_output=None,
+    workers=2,
+    share_attributes=False,
+):
+    from base.project import Project
+
     pjt = Project(project)
     if directory is None:
         directory = click.prompt(
@@ -442,18 +591,7 @@ def import_dataset(project, directory, extension, parse, additional):
     ), "No datafiles found. Please check your directory and extension."
 
     if parse is None:
-        sample_file_path = files[0].split(directory)[-1]
-        if sample_file_path[0] == os.sep:
-            sample_file_path = sample_file_path[1:]
-        click.echo(
-            f"\nTell me parsing rule for get meta data from file path with '{extension}'.\n\
-* you can use {{key-name}} to parse phrases with key.\n\
-* you can use {{_}} to ignore some phrases.\n\
-* you have to use '/' as separator.\n\
-** sample parsing rule: {{_}}/{{name}}/{{timestamp}}/{{sensor}}-{{condition}}_{{iteration}}.csv\n\
-path to your file: {sample_file_path}"
-        )
-        parse = click.prompt("Parsing rule", type=str)
+        parse = prompt_parsing_rule(directory, extension, files[0])
 
     try:
         pjt.add_datafiles(
@@ -462,6 +600,11 @@ path to your file: {sample_file_path}"
             attributes=additional,
             parsing_rule=parse,
             detail_parsing_rule=None,
+            resume=resume,
+            dry_run=dry_run,
+            dry_run_output=dry_run_output,
+            max_workers=workers,
+            share_attributes=share_attributes,
         )
     except ValueError as e:
         click.echo(e)
@@ -484,17 +627,203 @@ path to your file: {files[0].split(directory)[-1]}"
                 attributes=additional,
                 parsing_rule=parse,
                 detail_parsing_rule=detail_parse,
+                resume=resume,
+                dry_run=dry_run,
+                dry_run_output=dry_run_output,
+                max_workers=workers,
+                share_attributes=share_attributes,
             )
         except Exception as e:
             click.echo(e)
+            sys.exit(1)
         else:
+            echo_import_report(pjt.import_report)
             click.echo("Success!")
     except Exception as e:
         click.echo(e)
+        sys.exit(1)
     else:
+        echo_import_report(pjt.import_report)
         click.echo("Success!")
 
 
+def import_datasets(
+    project,
+    directories,
+    extensions,
+    parses,
+    additional,
+    resume=False,
+    dry_run=False,
+    dry_run_output=None,
+    workers=2,
+    share_attributes=False,
+):
+    """
+    Import multiple directories in one `Project.add_datafiles()` call.
+    Each of `extensions` and `parses` has one value for all directories,
+    or one value for each directory.
+    """
+    from base.project import Project
+
+    for values in (extensions, parses):
+        if len(values) not in (0, 1, len(directories)):
+            click.echo(
+                "Specify -e and -c once for all directories, or once for each -d."
+            )
+            sys.exit(1)
+
+    pjt = Project(project)
+    specs = []
+    for i, directory in enumerate(directories):
+        if extensions:
+            extension = extensions[i if len(extensions) > 1 else 0]
+        else:
+            extension = click.prompt(
+                f"What is your data file extension in {directory}? (ex: csv, jpg, png, wav)",
+                type=str,
+            )
+        if extension[0] == ".":
+            extension = extension[1:]
+
+        if parses:
+            parse = parses[i if len(parses) > 1 else 0]
+        else:
+            # a sample file is needed to prompt the parsing rule, otherwise
+            # directories are scanned concurrently in `Project.add_datafiles()`
+            click.echo(f"Check datafiles in {directory}...")
+            files = glob.glob(
+                os.path.join(directory, "**", f"*.{extension}"), recursive=True
+            )
+            click.echo(f"found {len(files)} files with {extension} extension.")
+            assert (
+                len(files) > 0
+            ), "No datafiles found. Please check your directory and extension."
+            parse = prompt_parsing_rule(directory, extension, files[0])
+        specs.append(
+            {"Directory": directory, "Extension": extension, "ParsingRule": parse}
+        )
+
+    try:
+        pjt.add_datafiles(
+            attributes=additional,
+            resume=resume,
+            dry_run=dry_run,
+            dry_run_output=dry_run_output,
+            max_workers=workers,
+            share_attributes=share_attributes,
+            specs=specs,
+        )
+    except Exception as e:
+        click.echo(e)
+        sys.exit(1)
+    else:
+        echo_import_report(pjt.import_report)
+        click.echo("Success!")
+
+
+def queue_import(
+    project,
+    external_file,
+    directories,
+    extensions,
+    parses,
+    additional,
+    dry_run=False,
+    dry_run_output=None,
+    workers=2,
+    share_attributes=False,
+):
+    """
+    Queue the import of datafiles as a background job with `--resume`,
+    so that it continues from the checkpoint if the job is started again.
+    The job can not prompt, so that all of -d, -e and -c are required.
+    """
+    from base.jobs import JobQueue
+
+    if external_file:
+        click.echo("--background supports only import of datafiles.")
+        sys.exit(1)
+    if not (directories and extensions and parses):
+        click.echo("Specify -d, -e and -c to import in background.")
+        sys.exit(1)
+
+    args = ["import", project]
+    for option, values in (("-d", directories), ("-e", extensions), ("-c", parses)):
+        for value in values:
+            args += [option, value]
+    for key, value in additional.items():
+        args += ["-a", f"{key}:{value}"]
+    args += ["-w", str(workers), "--resume"]
+    if share_attributes:
+        args.append("--share-attributes")
+    if dry_run:
+        args.append("--dry-run")
+        if dry_run_output is not None:
+            args += ["--dry-run-output", os.path.abspath(dry_run_output)]
+
+    try:
+        job = JobQueue().submit(args)
+    except Exception as e:
+        click.echo(e)
+        sys.exit(1)
+    click.echo(f"Job {job['JobId']} queued.")
+    click.echo(f"See progress with `base jobs status {job['JobId']}`.")
+
+
+def prompt_parsing_rule(directory, extension, sample_file):
+    """
+    Ask the parsing rule, showing a sample datafile path in the directory.
+
+    Parameters
+    ----------
+    directory : str
+        root directory path of datafiles
+    extension : str
+        extension of datafiles
+    sample_file : str
+        one of datafile paths found in the directory
+
+    Returns
+    -------
+    parse : str
+        parsing rule entered by the user
+    """
+    sample_file_path = sample_file.split(directory)[-1]
+    if sample_file_path[0] == os.sep:
+        sample_file_path = sample_file_path[1:]
+    click.echo(
+        f"\nTell me parsing rule for get meta data from file path with '{extension}'.\n\
+* you can use {{key-name}} to parse phrases with key.\n\
+* you can use {{_}} to ignore some phrases.\n\
+* you have to use '/' as separator.\n\
+** sample parsing rule: {{_}}/{{name}}/{{timestamp}}/{{sensor}}-{{condition}}_{{iteration}}.csv\n\
+path to your file: {sample_file_path}"
+    )
+    return click.prompt("Parsing rule", type=str)
+
+
+def echo_import_report(report):
+    """
+    Show the report of dry run import.
+
+    Parameters
+    ----------
+    report : dict
+        `import_report` attribute of base.Project
+    """
+    if not report["DryRun"]:
+        return
+    click.echo(
+        f"\n[Dry Run Report]\n\
+records: {report['RecordCount']}\n\
+batches: {report['BatchCount']}\n\
+payload bytes: {report['PayloadBytes']}"
+    )
+    for stage, elapsed in report["StageTimes"].items():
+        click.echo(f"{stage} time: {elapsed:.2f}s")
+
+
 def import_metafile(
     project,
     path,
@@ -506,6 +835,9 @@ def import_metafile(
     export,
     output,
 ):
+    from base.project import Project
+    from base.export import export_records, get_output_path
+
     pjt = Project(project)
     if (path == ()) and (join_rule is None):
         path = click.prompt(
@@ -521,38 +853,16 @@ def import_metafile(
                 if export is not None:
                     if export.lower() == "csv":
                         for i, res in enumerate(result, 1):
-                            result_keys = list(res[0].keys())
-                            for r in res:
-                                extra_keys = list(set(r.keys()) - set(result_keys))
-                                result_keys += extra_keys
-
-                            output_csv = ",".join(result_keys)
-                            for r in res:
-                                result_values = [str(r[k]) for k in result_keys]
-                                output_csv += "\n" + ",".join(result_values)
-
-                            output_path = os.path.join(
-                                ".",
+                            output_path = get_output_path(
+                                output,
                                 f"{os.path.basename(pth.split('.')[0])}_Table{i}.csv",
                             )
-                            if output is not None:
-                                output_path = output
-                                os.makedirs(os.path.dirname(output), exist_ok=True)
-
-                            file_count = 1
-                            while True:
-                                if os.path.exists(output_path):
-                                    basename, ext = os.path.splitext(output_path)
-                                    output_path = f"{basename} ({file_count}){ext}"
-                                    file_count += 1
-                                else:
-                                    break
-                            with open(output_path, "w", encoding="utf-8") as f:
-                                f.write(output_csv)
+                            export_records(res, output_path, export)
                     else:
                         click.echo(
                             f"Sorry, export file type: {export} was not supprted yet..."
                         )
+                        sys.exit(1)
         elif estimate_rule:
             for pth in path:
                 pjt.estimate_join_rule(file_path=pth, verbose=2)
@@ -566,6 +876,7 @@ def import_metafile(
             )
     except Exception as e:
         click.echo(e)
+        sys.exit(1)
     else:
         click.echo("Success!")
 
@@ -591,9 +902,30 @@ def import_metafile(
     help="query value. you have to specify as 'value1,value2,...'",
     required=False,
 )
-@click.option("-e", "--export", type=str, help="export file type", required=False)
+@click.option(
+    "-e",
+    "--export",
+    type=str,
+    help="export file type (json, csv, jsonl, parquet or feather)",
+    required=False,
+)
 @click.option("-o", "--output", type=str, help="output file path", required=False)
 @click.option("-s", "--summary", is_flag=True)
+@click.option("--count", is_flag=True, help="show only the number of files")
+@click.option(
+    "-l",
+    "--limit",
+    type=click.IntRange(min=0),
+    help="maximum number of files",
+    required=False,
+)
+@click.option(
+    "--offset",
+    type=click.IntRange(min=0),
+    help="number of files to skip",
+    default=0,
+    show_default=True,
+)
 @base_config
 def search_files(
     project,
@@ -603,6 +935,9 @@ def search_files(
     output,
     user_id,
     summary,
+    count,
+    limit,
+    offset,
 ):
     """
     Query database
@@ -623,72 +958,82 @@ def search_files(
     -------
     summary : bool
         if you want hide detail
+    count : bool
+        if you want only the number of files
+    limit : int
+        maximum number of files
+    offset : int
+        number of files to skip
     """
+    from base.project import Project
+    from base.export import EXPORT_TYPES, export_records, get_output_path
+
     pjt = Project(project)
-    try:
-        if conditions is not None:
-            result = pjt.files(conditions=conditions, query=query).result
+    if count:
+        try:
+            file_num = pjt.count_files(conditions=conditions, query=query)
+        except Exception as e:
+            click.echo(e)
+            sys.exit(1)
         else:
-            result = pjt.files(query=query).result
+            click.echo(file_num)
+        return
+
+    try:
+        result = pjt.files(
+            conditions=conditions, query=query, limit=limit, offset=offset
+        ).result
     except Exception as e:
         click.echo(e)
+        sys.exit(1)
     else:
         click.echo(f"{len(result)} files")
         if not summary:
             click.echo("========")
-            for r in result:
-                click.echo(r)
+            echo_records(result)
         if export is not None:
-            if export.lower() == "json":
-                output_json = json.dumps({"Data": result}, indent=4, ensure_ascii=False)
-
-                output_path = os.path.join(".", "dataset.json")
-                if output is not None:
-                    output_path = output
-                    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
-
-                file_count = 1
-                while True:
-                    if os.path.exists(output_path):
-                        basename, ext = os.path.splitext(output_path)
-                        output_path = f"{basename} ({file_count}){ext}"
-                        file_count += 1
-                    else:
-                        break
-                with open(output_path, "w", encoding="utf-8") as f:
-                    f.write(output_json)
-            elif export.lower() == "csv":
-                result_keys = []
-                for r in result:
-                    extra_keys = list(set(r.keys()) - set(result_keys))
-                    result_keys += extra_keys
-
-                output_csv = ",".join(result_keys)
-                for r in result:
-                    result_values = [str(r[k]) for k in result_keys]
-                    output_csv += "\n" + ",".join(result_values)
-
-                output_path = os.path.join(".", "dataset.csv")
-                if output is not None:
-                    output_path = output
-                    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
-
-                file_count = 1
-                while True:
-                    if os.path.exists(output_path):
-                        basename, ext = os.path.splitext(output_path)
-                        output_path = f"{basename} ({file_count}){ext}"
-                        file_count += 1
-                    else:
-                        break
-                with open(output_path, "w", encoding="utf-8") as f:
-                    f.write(output_csv)
+            if export.lower() in EXPORT_TYPES:
+                output_path = get_output_path(output, f"dataset.{export.lower()}")
+                try:
+                    export_records(result, output_path, export)
+                except ImportError as e:
+                    click.echo(e)
+                    sys.exit(1)
             else:
                 click.echo(f"Sorry, export file type: {export} was not supprted yet...")
+                sys.exit(1)
         elif export is None and output is not None:
             click.echo("\nPlease specify export file type. (e.g. --export json)")
 
 
+def echo_records(records, chunk_size=1000):
+    """
+    Show records in chunks, which is much faster than line by line
+    for pagers or pipes like `base search ... | less`.
+
+    Parameters
+    ----------
+    records : list of dict
+        records to show
+    chunk_size : int, default 1000
+        number of records written at once
+    """
+    try:
+        for start in range(0, len(records), chunk_size):
+            chunk = records[start : start + chunk_size]
+            click.echo("".join(f"{record}\n" for record in chunk), nl=False)
+    except BrokenPipeError:
+        # the reader like `head` was closed, so the rest is discarded
+        # instead of raising again when stdout is flushed at exit
+        try:
+            fd = sys.stdout.fileno()
+        except (AttributeError, OSError, ValueError):
+            return
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, fd)
+        os.close(devnull)
+
+
 @main.command(name="invite", help="invite project member")
 @click.argument("project")
 @click.option(
@@ -726,12 +1071,15 @@ def invite_member(project, member, permission, update, user_id):
     update : bool
         if you want update permission exsisting project member
     """
+    from base.project import Project
+
     pjt = Project(project)
     if not update:
         try:
             pjt.add_member(member, permission)
         except Exception as e:
             click.echo(e)
+            sys.exit(1)
         else:
             click.echo(f"Successfully invited {member} into {project} as {permission}")
     else:
@@ -739,6 +1087,7 @@ def invite_member(project, member, permission, update, user_id):
             pjt.update_member(member, permission)
         except Exception as e:
             click.echo(e)
+            sys.exit(1)
         else:
             click.echo(f"Successfully update {member}'s permission to {permission}")
 
@@ -779,6 +1128,8 @@ def data_link(project, directory, extension, user_id):
     directory : str, default=None
     extension : str, default=None
     """
+    from base.project import Project
+
     pjt = Project(project)
     if directory is None:
         directory = click.prompt(
@@ -796,11 +1147,314 @@ def data_link(project, directory, extension, user_id):
         file_num = pjt.link_datafiles(directory, extension)
     except Exception as e:
         click.echo(e)
+        sys.exit(1)
     else:
         click.echo("Check datafiles...")
         click.echo(f"found {file_num} files with {extension} extension.")
         click.echo("linked!")
 
 
+@main.command(name="batch", help="run commands declared in a plan file at once")
+@click.argument("plan", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "-j",
+    "--concurrency",
+    type=click.IntRange(min=1),
+    help="number of steps run at once, default is concurrency of the plan or 4",
+    required=False,
+)
+@click.option(
+    "--dry-run", is_flag=True, help="show steps in order without running them"
+)
+def run_batch(plan, concurrency, dry_run):
+    """
+    Run commands of the plan in one process
+    Usage
+    -----
+    $ base batch nightly.yaml -j 4
+    Arguments
+    ---------
+    plan : str
+        path of YAML file declaring the steps
+    Options
+    -------
+    concurrency : int
+        number of steps run at once
+    dry_run : bool
+        if you want to check the plan
+    """
+    import shlex
+    from base.batch import SUCCEEDED, BatchPlan, BatchRunner
+
+    try:
+        batch_plan = BatchPlan.load(plan)
+    except ValueError as e:
+        click.echo(e)
+        sys.exit(1)
+
+    if dry_run:
+        for step in batch_plan.steps:
+            needs = f" (after {', '.join(step.needs)})" if step.needs else ""
+            click.echo(f"{step.name}: base {shlex.join(step.args)}{needs}")
+        return
+
+    report = BatchRunner(batch_plan, concurrency).run()
+    click.echo("========")
+    for result in report["Steps"]:
+        click.echo(f"{result['Name']}: {result['Status']} ({result['Elapsed']:.2f}s)")
+    click.echo(f"total: {report['Elapsed']:.2f}s")
+    if any(result["Status"] != SUCCEEDED for result in report["Steps"]):
+        sys.exit(1)
+
+
+@main.group(
+    name="daemon", help="manage background daemon serving search, list and show"
+)
+def daemon():
+    """
+    Background daemon commands
+    Usage
+    -----
+    $ base daemon start
+    $ base daemon status
+    $ base daemon stop
+    """
+    pass
+
+
+@daemon.command(name="start", help="start background daemon")
+@click.option(
+    "--cache-ttl",
+    type=float,
+    help="seconds search results are cached in the daemon",
+    required=False,
+)
+def start_daemon_process(cache_ttl):
+    """
+    Start background daemon, which answers search, list and show commands
+    with warm config, sessions, linkers and search results
+    Parameters
+    ----------
+    cache_ttl : float
+        seconds search results are cached in the daemon
+    """
+    from base.config import get_access_key, get_user_id
+    from base.daemon import start_daemon
+
+    try:
+        get_access_key()
+        get_user_id()
+    except Exception:
+        click.echo("Please configure your access key first. (e.g. $ base list)")
+        sys.exit(1)
+
+    try:
+        status = start_daemon(cache_ttl=cache_ttl)
+    except Exception as e:
+        click.echo(e)
+    else:
+        click.echo(f"base daemon started (pid {status['Pid']})")
+
+
+@daemon.command(name="stop", help="stop background daemon")
+def stop_daemon_process():
+    """
+    Stop background daemon
+    """
+    from base.daemon import stop_daemon
+
+    try:
+        stop_daemon()
+    except Exception as e:
+        click.echo(e)
+    else:
+        click.echo("base daemon stopped")
+
+
+@daemon.command(name="status", help="show background daemon status")
+def show_daemon_status():
+    """
+    Show background daemon status
+    """
+    from base.daemon import get_daemon_status
+
+    status = get_daemon_status()
+    if status is None:
+        click.echo("base daemon is not running")
+        return
+    click.echo(f"base daemon is running (pid {status['Pid']})")
+    click.echo(f"uptime          : {status['Uptime']:.0f} sec")
+    click.echo(f"commands        : {status['Commands']}")
+    click.echo(f"cached searches : {status['CachedSearches']}")
+    click.echo(f"cache hits      : {status['CacheHits']}")
+
+
+@main.group(name="jobs", help="manage background jobs like `base import --background`")
+def jobs():
+    """
+    Background job commands
+    Usage
+    -----
+    $ base jobs list
+    $ base jobs status 1
+    $ base jobs logs 1 --follow
+    $ base jobs cancel 1
+    """
+    pass
+
+
+@jobs.command(name="list", help="list background jobs")
+def list_jobs():
+    """
+    List background jobs
+    """
+    import shlex
+    from base.jobs import JobQueue
+
+    try:
+        job_list = JobQueue().list_jobs()
+    except Exception as e:
+        click.echo(e)
+        sys.exit(1)
+    if not job_list:
+        click.echo("No jobs found.")
+        return
+    click.echo(f"{'ID':<6}{'STATUS':<11}{'ELAPSED':>9}  COMMAND")
+    for job in job_list:
+        click.echo(
+            f"{job['JobId']:<6}{job['Status']:<11}{format_job_elapsed(job):>9}  "
+            f"base {shlex.join(job['Args'])}"
+        )
+
+
+@jobs.command(name="status", help="show status and progress of background job")
+@click.argument("job_id")
+def show_job_status(job_id):
+    """
+    Show status and progress of background job
+    Arguments
+    ---------
+    job_id : str
+        id of the job
+    """
+    import shlex
+    from base.jobs import JobQueue
+
+    try:
+        queue = JobQueue()
+        job = queue.get_job(job_id)
+    except Exception as e:
+        click.echo(e)
+        sys.exit(1)
+    click.echo(f"job       : {job['JobId']}")
+    click.echo(f"command   : base {shlex.join(job['Args'])}")
+    click.echo(f"status    : {job['Status']}")
+    created_at = datetime.fromtimestamp(job["CreatedAt"]).strftime("%Y-%m-%d %H:%M:%S")
+    click.echo(f"created   : {created_at}")
+    click.echo(f"elapsed   : {format_job_elapsed(job)}")
+    click.echo(f"attempts  : {job['Attempts']}")
+    if job["ExitCode"] is not None:
+        click.echo(f"exit code : {job['ExitCode']}")
+    progress = queue.get_progress(job_id)
+    if progress is not None:
+        click.echo(f"progress  : {progress}")
+    click.echo(f"log       : {queue.get_log_path(job_id)}")
+
+
+@jobs.command(name="cancel", help="cancel background job")
+@click.argument("job_id")
+def cancel_job(job_id):
+    """
+    Cancel background job, the interrupted import can be continued with --resume
+    Arguments
+    ---------
+    job_id : str
+        id of the job
+    """
+    from base.jobs import JobQueue
+
+    try:
+        JobQueue().cancel(job_id)
+    except Exception as e:
+        click.echo(e)
+        sys.exit(1)
+    click.echo(f"Job {job_id} canceled.")
+
+
+@jobs.command(name="logs", help="show output of background job")
+@click.argument("job_id")
+@click.option(
+    "-n",
+    "--lines",
+    type=click.IntRange(min=0),
+    help="number of lines from the end",
+    required=False,
+    default=None,
+)
+@click.option(
+    "-f",
+    "--follow",
+    help="flag for waiting for new output until the job finishes",
+    is_flag=True,
+    default=False,
+)
+def show_job_logs(job_id, lines, follow):
+    """
+    Show output of background job
+    Arguments
+    ---------
+    job_id : str
+        id of the job
+    Parameters
+    ----------
+    lines : int, default=None
+        number of lines from the end, show whole output if None
+    follow : bool, default=False
+        wait for new output until the job finishes
+    """
+    from base.jobs import FINISHED_STATUSES, JobQueue
+
+    try:
+        queue = JobQueue()
+        queue.get_job(job_id)
+    except Exception as e:
+        click.echo(e)
+        sys.exit(1)
+    text = queue.read_log(job_id, lines)
+    click.echo(text, nl=False)
+    if not follow:
+        return
+
+    position = len(queue.read_log(job_id))
+    while True:
+        finished = queue.get_job(job_id)["Status"] in FINISHED_STATUSES
+        text = queue.read_log(job_id)
+        click.echo(text[position:], nl=False)
+        position = len(text)
+        if finished:
+            return
+        time.sleep(1.0)
+
+
+def format_job_elapsed(job):
+    """
+    Format seconds the job has run.
+
+    Parameters
+    ----------
+    job : dict
+        job of base.jobs.JobQueue
+
+    Returns
+    -------
+    elapsed : str
+        like "1:02:03", "-" if the job has not started
+    """
+    if job["StartedAt"] is None:
+        return "-"
+    elapsed = int((job["FinishedAt"] or time.time()) - job["StartedAt"])
+    return f"{elapsed // 3600}:{elapsed % 3600 // 60:02d}:{elapsed % 60:02d}"
+
+
 if __name__ == "__main__":
     main()
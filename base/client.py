@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import os
+import copy
+import weakref
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Optional
+
+from base.retry import MAX_CONCURRENCY, RetryPolicy, send_request
+from base.cache import ResponseCache
+from base.profiler import stage
+
+# number of keep-alive connections kept per host
+POOL_SIZE = int(os.environ.get("BASE_POOL_SIZE", 10))
+
+
+class APIClient:
+    """
+    APIClient class
+
+    Send every request of Base API through pooled `requests.Session`,
+    so that connections are kept alive and reused across calls.
+    Each request has default timeouts and is retried with `RetryPolicy`.
+
+    The client is safe to share across threads. Credentials are kept
+    per client, and each thread uses its own session of the client.
+
+    Attributes
+    ----------
+    access_key : str
+        API access key, resolved from environment variable or config file if None
+    pool_size : int
+        number of keep-alive connections kept per host
+    retry_policy : RetryPolicy
+        retry policy and default timeouts of requests,
+        with the governor of in-flight requests of this client
+    cache : ResponseCache
+        cache of read-only responses, used by requests with `cache=True`
+    session : requests.Session
+        pooled session of the current thread
+    """
+
+    def __init__(
+        self,
+        access_key: Optional[str] = None,
+        pool_size: int = POOL_SIZE,
+        retry_policy: Optional[RetryPolicy] = None,
+        cache: Optional[ResponseCache] = None,
+        max_concurrency: int = MAX_CONCURRENCY,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        access_key : str, default None
+            API access key, resolved from environment variable
+            or config file on each request if None
+        pool_size : int, default 10
+            number of keep-alive connections kept per host,
+            can be set by "BASE_POOL_SIZE" environment variable
+        retry_policy : RetryPolicy, default None
+            retry policy and default timeouts of requests,
+            use the default policy if None
+        cache : ResponseCache, default None
+            cache of read-only responses, use ~/.base/cache if None
+        max_concurrency : int, default 8
+            maximum number of in-flight requests of this client,
+            can be set by "BASE_MAX_CONCURRENCY" environment variable.
+            ignored if `retry_policy` already has its governor
+        """
+        self.access_key = access_key
+        self.pool_size = pool_size
+        if retry_policy is None:
+            retry_policy = RetryPolicy()
+        if retry_policy.governor is None:
+            # copied, not to limit other clients sharing the policy
+            retry_policy = copy.copy(retry_policy)
+            retry_policy.governor = threading.BoundedSemaphore(max_concurrency)
+        self.retry_policy = retry_policy
+        self.cache = cache or ResponseCache()
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # sessions are owned by their threads, and dropped when the threads exit
+        self._sessions = weakref.WeakSet()
+
+    def __enter__(self) -> "APIClient":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    @property
+    def session(self) -> requests.Session:
+        """
+        Pooled session of the current thread, created on first access.
+        """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=self.pool_size, pool_maxsize=self.pool_size
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._local.session = session
+            with self._lock:
+                self._sessions.add(session)
+        return session
+
+    def get_headers(self, authorized: bool = True) -> dict:
+        """
+        Get request headers.
+
+        Parameters
+        ----------
+        authorized : bool, default True
+            if True, include the API access key
+
+        Returns
+        -------
+        headers : dict
+            request headers of Base API
+        """
+        headers = {"Content-Type": "application/json"}
+        if authorized:
+            access_key = self.access_key
+            if access_key is None:
+                # imported here, because base.config also sends requests with this module
+                from base.config import get_access_key
+
+                access_key = get_access_key()
+            headers["x-api-key"] = access_key
+        return headers
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        data=None,
+        headers: Optional[dict] = None,
+        authorized: bool = True,
+        idempotency_key: Optional[str] = None,
+        error_message: Optional[str] = None,
+        cache: bool = False,
+        **kwargs,
+    ) -> requests.Response:
+        """
+        Send a request of Base API.
+
+        Parameters
+        ----------
+        method : str
+            http method
+        url : str
+            request url
+        data : str or bytes, default None
+            request body
+        headers : dict, default None
+            extra request headers
+        authorized : bool, default True
+            if True, send headers of Base API with the API access key,
+            set False for presigned urls
+        idempotency_key : str, default None
+            key to identify the request on the server side
+        error_message : str, default None
+            if given, raise Exception with this message unless the status code is 200
+        cache : bool, default False
+            if True, reuse the cached response of GET request within TTL,
+            and revalidate it with ETag / Last-Modified after that
+        **kwargs
+            other arguments passed to `requests.Session.request`, like `timeout`
+
+        Returns
+        -------
+        response : requests.Response
+            the last response
+
+        Raises
+        ------
+        Exception
+            raises if `error_message` is given and the request failed
+        requests.RequestException
+            raises if the connection failed and it can not be retried
+        """
+        method = method.upper()
+        request_headers = self.get_headers() if authorized else {}
+        request_headers.update(headers or {})
+
+        # cached responses are separated by access key
+        scope = request_headers.get("x-api-key", "")
+        entry = None
+        if cache and method == "GET":
+            entry = self.cache.lookup(scope, url)
+            if entry is not None:
+                if self.cache.is_fresh(scope, entry):
+                    return self.cache.build_response(entry)
+                request_headers.update(self.cache.get_validators(entry))
+
+        with stage("http"):
+            res = send_request(
+                method,
+                url,
+                data=data,
+                headers=request_headers,
+                idempotency_key=idempotency_key,
+                retry_policy=self.retry_policy,
+                session=self.session,
+                **kwargs,
+            )
+
+        if cache and method == "GET":
+            if res.status_code == 304 and entry is not None:
+                self.cache.refresh(scope, entry)
+                res = self.cache.build_response(entry)
+            elif res.status_code == 200:
+                self.cache.store(scope, url, res)
+        elif method not in ("GET", "HEAD", "OPTIONS") and authorized:
+            self.cache.invalidate(scope)
+
+        if error_message is not None and res.status_code != 200:
+            raise Exception(error_message)
+        return res
+
+    def close(self) -> None:
+        """
+        Close pooled connections of all threads.
+        """
+        with self._lock:
+            sessions = list(self._sessions)
+            self._sessions = weakref.WeakSet()
+        for session in sessions:
+            session.close()
+        self._local = threading.local()
+
+
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_client(access_key: Optional[str] = None) -> APIClient:
+    """
+    Get the shared client of this process for the access key.
+
+    Parameters
+    ----------
+    access_key : str, default None
+        API access key, the client without explicit key resolves it
+        from environment variable or config file on each request
+
+    Returns
+    -------
+    client : APIClient
+        client created on the first call with the access key
+    """
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(access_key)
+        if client is None:
+            client = APIClient(access_key=access_key)
+            _CLIENTS[access_key] = client
+    return client
+
+
+if __name__ == "__main__":
+    pass
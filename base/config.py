@@ -5,20 +5,156 @@
 import os
 import json
 import time
-import requests
+import threading
 import configparser
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
 
-from base.spinner import Spinner
+from base.progress import ProgressDisplay
+from base.client import APIClient, get_client
 
 CONFIG_FILE = os.path.join(os.path.expanduser("~"), ".base", "config")
 PROJECT_FILE = os.path.join(os.path.expanduser("~"), ".base", "projects")
 LINKER_DIR = os.path.join(os.path.expanduser("~"), ".base", "linker")
+# last update time of the project file per user
+REGISTRY_FILE = os.path.join(os.path.expanduser("~"), ".base", "registry")
+# seconds the project file is used without updating it from remote in CLI
+REGISTRY_TTL = float(os.environ.get("BASE_REGISTRY_TTL", 300))
 
-HEADER = {"Content-Type": "application/json"}
 BASE_API_ENDPOINT = os.environ.get(
     "BASE_API_ENDPOINT", "https://api.base.adansons.co.jp"
 )
 
+# serialize read-modify-write of config files between threads
+_LOCK = threading.RLock()
+
+
+class LocalConfig:
+    """
+    LocalConfig class
+
+    Keep local config files (~/.base/config and ~/.base/projects) in memory.
+    A file is parsed on first lookup, and parsed again only when
+    its modification time, size or inode has changed.
+    Environment variables "BASE_USER_ID" and "BASE_ACCESS_KEY" are read once
+    when the instance is created, and override values of config file.
+
+    Attributes
+    ----------
+    config_file : str
+        user config file path
+    project_file : str
+        project config file path
+    env_user_id : str
+        user id from environment variable, None if not set
+    env_access_key : str
+        access key from environment variable, None if not set
+    """
+
+    def __init__(
+        self, config_file: Optional[str] = None, project_file: Optional[str] = None
+    ) -> None:
+        """
+        Parameters
+        ----------
+        config_file : str, default None
+            user config file path, use ~/.base/config if None
+        project_file : str, default None
+            project config file path, use ~/.base/projects if None
+        """
+        self.config_file = config_file or CONFIG_FILE
+        self.project_file = project_file or PROJECT_FILE
+        self.env_user_id = os.environ.get("BASE_USER_ID", None)
+        self.env_access_key = os.environ.get("BASE_ACCESS_KEY", None)
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def get_user_id(self) -> str:
+        """
+        Get user id, raise KeyError if not configured.
+        """
+        if self.env_user_id is not None:
+            return self.env_user_id
+        return self.__load(self.config_file)["default"]["user_id"]
+
+    def get_access_key(self) -> str:
+        """
+        Get access key, raise KeyError if not configured.
+        """
+        if self.env_access_key is not None:
+            return self.env_access_key
+        return self.__load(self.config_file)["default"]["access_key"]
+
+    def has_project(self, user_id: str, project_name: str) -> bool:
+        """
+        Check the project is registered, raise KeyError if the user is not.
+        """
+        return project_name in self.__load(self.project_file)[user_id]
+
+    def get_project_uid(self, user_id: str, project_name: str) -> str:
+        """
+        Get project uid, raise KeyError if the project is not registered.
+        """
+        projects = self.__load(self.project_file)[user_id]
+        if project_name not in projects:
+            raise KeyError(f"Project {project_name} does not exist.")
+        return projects[project_name]
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        """
+        Parse the config file again on next lookup.
+
+        Parameters
+        ----------
+        path : str, default None
+            config file path, invalidate all files if None
+        """
+        with self._lock:
+            if path is None:
+                self._files.clear()
+            else:
+                self._files.pop(path, None)
+
+    def __load(self, path: str) -> configparser.ConfigParser:
+        try:
+            stat = os.stat(path)
+            signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except OSError:
+            signature = None
+
+        cached = self._files.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        config = configparser.ConfigParser()
+        config.read(path)
+        with self._lock:
+            self._files[path] = (signature, config)
+        return config
+
+
+_CONFIG = None
+
+
+def get_config() -> LocalConfig:
+    """
+    Get the shared LocalConfig of this process.
+
+    Returns
+    -------
+    config : LocalConfig
+        config created on the first call
+    """
+    global _CONFIG
+    config = _CONFIG
+    if config is None or (config.config_file, config.project_file) != (
+        CONFIG_FILE,
+        PROJECT_FILE,
+    ):
+        with _LOCK:
+            config = _CONFIG = LocalConfig(CONFIG_FILE, PROJECT_FILE)
+    return config
+
 
 def get_user_id() -> str:
     """
@@ -30,14 +166,7 @@ def get_user_id() -> str:
     user_id : str
         aquired user id from environment variable or config file
     """
-    user_id = os.environ.get("BASE_USER_ID", None)
-    if user_id is None:
-        config = configparser.ConfigParser()
-        config.read(CONFIG_FILE)
-
-        user_id = config["default"]["user_id"]
-
-    return user_id
+    return get_config().get_user_id()
 
 
 def register_user_id(user_id: str) -> None:
@@ -49,12 +178,12 @@ def register_user_id(user_id: str) -> None:
     user_id : str
         target user id
     """
-    config = configparser.ConfigParser()
-    config.read(CONFIG_FILE)
+    with _LOCK:
+        config = configparser.ConfigParser()
+        config.read(CONFIG_FILE)
 
-    config["default"].update({"user_id": user_id})
-    with open(CONFIG_FILE, "w") as f:
-        config.write(f)
+        config["default"].update({"user_id": user_id})
+        _write_config(config, CONFIG_FILE)
 
 
 def get_access_key() -> str:
@@ -67,14 +196,7 @@ def get_access_key() -> str:
     access_key : str
         aquired API access key from environment variable or config file
     """
-    access_key = os.environ.get("BASE_ACCESS_KEY", None)
-    if access_key is None:
-        config = configparser.ConfigParser()
-        config.read(CONFIG_FILE)
-
-        access_key = config["default"]["access_key"]
-
-    return access_key
+    return get_config().get_access_key()
 
 
 def register_access_key(access_key: str) -> None:
@@ -86,13 +208,12 @@ def register_access_key(access_key: str) -> None:
     access_key : str
         API access key
     """
-    config = configparser.ConfigParser()
-    config.read(CONFIG_FILE)
+    with _LOCK:
+        config = configparser.ConfigParser()
+        config.read(CONFIG_FILE)
 
-    config["default"] = {"access_key": access_key}
-    os.makedirs(os.path.dirname(CONFIG_FILE), exist_ok=True)
-    with open(CONFIG_FILE, "w") as f:
-        config.write(f)
+        config["default"] = {"access_key": access_key}
+        _write_config(config, CONFIG_FILE)
 
 
 def get_project_uid(user_id: str, project_name: str) -> str:
@@ -111,15 +232,7 @@ def get_project_uid(user_id: str, project_name: str) -> str:
     project_uid : str
         project uid of given project name
     """
-    config = configparser.ConfigParser()
-    config.read(PROJECT_FILE)
-
-    is_exist = check_project_exists(user_id, project_name)
-    if not is_exist:
-        raise KeyError(f"Project {project_name} does not exist.")
-    else:
-        project_uid = config[user_id][project_name]
-        return project_uid
+    return get_config().get_project_uid(user_id, project_name)
 
 
 def check_project_exists(user_id: str, project_name: str) -> bool:
@@ -138,12 +251,7 @@ def check_project_exists(user_id: str, project_name: str) -> bool:
     project_exists : bool
         project already exists or not
     """
-    config = configparser.ConfigParser()
-    config.read(PROJECT_FILE)
-
-    project_exists = project_name in config[user_id]
-
-    return project_exists
+    return get_config().has_project(user_id, project_name)
 
 
 def check_project_available(user_id: str, project_id: str) -> None:
@@ -157,19 +265,15 @@ def check_project_available(user_id: str, project_id: str) -> None:
     project_uid : str
         target project uid
     """
-    access_key = get_access_key()
-    HEADER.update({"x-api-key": access_key})
-
-    with Spinner(text="Creating the project, please wait..."):
+    with ProgressDisplay(text="Creating the project, please wait..."):
         is_available = False
         while not is_available:
             url = (
                 f"{BASE_API_ENDPOINT}/project/{project_id}/tables/status?user={user_id}"
             )
-            res = requests.get(url, headers=HEADER)
-
-            if res.status_code != 200:
-                raise Exception("Something went wrong. Please try again.")
+            res = get_client().request(
+                "GET", url, error_message="Something went wrong. Please try again."
+            )
 
             status = res.json()["Status"]
             if status == "Creating":
@@ -191,15 +295,15 @@ def register_project_uid(user_id: str, project: str, project_uid: str) -> None:
     project_uid : str
         target project uid
     """
-    config = configparser.ConfigParser()
-    config.read(PROJECT_FILE)
-
-    if config.has_section(user_id):
-        config[user_id][project] = project_uid
-    else:
-        config[user_id] = {project: project_uid}
-    with open(PROJECT_FILE, "w") as f:
-        config.write(f)
+    with _LOCK:
+        config = configparser.ConfigParser()
+        config.read(PROJECT_FILE)
+
+        if config.has_section(user_id):
+            config[user_id][project] = project_uid
+        else:
+            config[user_id] = {project: project_uid}
+        _write_config(config, PROJECT_FILE)
 
 
 def delete_project_config(user_id: str, project_name: str) -> None:
@@ -213,15 +317,20 @@ def delete_project_config(user_id: str, project_name: str) -> None:
     project_name : str
         target project name
     """
-    config = configparser.ConfigParser()
-    config.read(PROJECT_FILE)
+    with _LOCK:
+        config = configparser.ConfigParser()
+        config.read(PROJECT_FILE)
 
-    config.remove_option(user_id, project_name)
-    with open(PROJECT_FILE, "w") as f:
-        config.write(f)
+        config.remove_option(user_id, project_name)
+        _write_config(config, PROJECT_FILE)
 
 
-def update_project_info(user_id: str) -> None:
+def update_project_info(
+    user_id: str,
+    project_name: Optional[str] = None,
+    ttl: float = 0,
+    client: Optional[APIClient] = None,
+) -> bool:
     """
     Update local project info with remote.
 
@@ -229,35 +338,84 @@ def update_project_info(user_id: str) -> None:
     ----------
     user_id : str
         target user id
-    """
-    config = configparser.ConfigParser()
-    config.read(PROJECT_FILE)
-
-    config.remove_section(user_id)
+    project_name : str, default None
+        project name to use, the project info is updated if it is not found locally
+    ttl : float, default 0
+        seconds the local project info is used without updating,
+        always update if 0
+    client : APIClient, default None
+        client to request with its credentials, use the shared client if None
 
-    access_key = get_access_key()
-    HEADER.update({"x-api-key": access_key})
+    Returns
+    -------
+    updated : bool
+        True if the local project info was updated
+    """
+    if ttl > 0 and is_project_info_fresh(user_id, project_name, ttl):
+        return False
 
+    client = client or get_client()
     url = f"{BASE_API_ENDPOINT}/projects?user={user_id}"
-    res = requests.get(url, headers=HEADER)
+    # get active and archived projects concurrently,
+    # not from the response cache, the update is forced when the ttl is expired
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        active = executor.submit(client.request, "GET", url)
+        archived = executor.submit(client.request, "GET", url + "&archived=1")
+        res, archived_res = active.result(), archived.result()
     if res.status_code != 200:
         raise ValueError("Invalid user configuration")
     projects = res.json()["Projects"]
+    if archived_res.json()["Projects"]:
+        projects.extend(archived_res.json()["Projects"])
 
-    url += "&archived=1"
-    res = requests.get(url, headers=HEADER)
-    if res.json()["Projects"]:
-        projects.extend(res.json()["Projects"])
+    project_info = {
+        project["ProjectName"]: project["ProjectUid"] for project in projects
+    }
 
-    project_info = {}
-    for project in projects:
-        project_name = project["ProjectName"]
-        project_uid = project["ProjectUid"]
-        project_info[project_name] = project_uid
+    with _LOCK:
+        config = configparser.ConfigParser()
+        config.read(PROJECT_FILE)
 
-    config[user_id] = project_info
-    with open(PROJECT_FILE, "w") as f:
-        config.write(f)
+        config.remove_section(user_id)
+        config[user_id] = project_info
+        _write_config(config, PROJECT_FILE)
+
+        registry = _read_registry()
+        registry[user_id] = time.time()
+        _write_registry(registry)
+    return True
+
+
+def is_project_info_fresh(
+    user_id: str, project_name: Optional[str] = None, ttl: float = REGISTRY_TTL
+) -> bool:
+    """
+    Check local project info can be used without updating.
+
+    Parameters
+    ----------
+    user_id : str
+        target user id
+    project_name : str, default None
+        project name to use
+    ttl : float, default 300
+        seconds the local project info is used without updating,
+        can be set by "BASE_REGISTRY_TTL" environment variable
+
+    Returns
+    -------
+    is_fresh : bool
+        True if it was updated within ttl and has the project
+    """
+    updated_at = _read_registry().get(user_id)
+    if updated_at is None or time.time() - updated_at >= ttl:
+        return False
+    if project_name is None:
+        return True
+    try:
+        return check_project_exists(user_id, project_name)
+    except KeyError:
+        return False
 
 
 def get_user_id_from_db(access_key: str) -> str:
@@ -270,7 +428,13 @@ def get_user_id_from_db(access_key: str) -> str:
         API access key saved in config file
     """
     url = f"{BASE_API_ENDPOINT}/user/id"
-    res = requests.get(url, data=json.dumps({"api_key": access_key}), headers=HEADER)
+    res = get_client().request(
+        "GET",
+        url,
+        data=json.dumps({"api_key": access_key}),
+        headers={"Content-Type": "application/json"},
+        authorized=False,
+    )
 
     if res.status_code != 200:
         raise ValueError(
@@ -281,5 +445,40 @@ def get_user_id_from_db(access_key: str) -> str:
     return user_id
 
 
+def _write_config(config: configparser.ConfigParser, path: str) -> None:
+    """
+    Write config file atomically, so that readers never see a truncated file.
+
+    Parameters
+    ----------
+    config : configparser.ConfigParser
+        config to write
+    path : str
+        config file path
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        config.write(f)
+    os.replace(tmp_path, path)
+    get_config().invalidate(path)
+
+
+def _read_registry() -> dict:
+    try:
+        with open(REGISTRY_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_registry(registry: dict) -> None:
+    os.makedirs(os.path.dirname(REGISTRY_FILE), exist_ok=True)
+    tmp_path = f"{REGISTRY_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(registry, f)
+    os.replace(tmp_path, REGISTRY_FILE)
+
+
 if __name__ == "__main__":
     pass
@@ -0,0 +1,668 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import io
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import struct
+import argparse
+import threading
+import socketserver
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from typing import List, Optional, Tuple
+
+import click
+
+SOCKET_PATH = os.environ.get(
+    "BASE_DAEMON_SOCKET",
+    os.path.join(os.path.expanduser("~"), ".base", "daemon.sock"),
+)
+LOG_FILE = os.path.join(os.path.expanduser("~"), ".base", "daemon.log")
+# seconds to wait for the daemon to answer after it is spawned
+START_TIMEOUT = 10.0
+
+# commands answered by the daemon, the others run in the calling process,
+# because they prompt to the user or read local datafiles
+FORWARDED_COMMANDS = ("search", "list", "show")
+# commands after which the daemon drops cached search results of the project
+MODIFYING_COMMANDS = ("import", "rm")
+
+# frames of the socket protocol, each one is a kind byte and a payload length
+_HEADER = struct.Struct("!cI")
+_STATUS = b"s"
+_STDOUT = b"o"
+_STDERR = b"e"
+_EXIT = b"x"
+
+# True in the daemon process, so that commands are not forwarded again
+_SERVING = False
+
+
+def _base_environ() -> dict:
+    """
+    Environment variables which change behavior of commands,
+    a command is forwarded only when they are same as the daemon's.
+    """
+    environ = {
+        key: value
+        for key, value in os.environ.items()
+        if key.startswith("BASE_") and not key.startswith("BASE_DAEMON_")
+    }
+    environ["HOME"] = os.path.expanduser("~")
+    return environ
+
+
+def _send(wfile, kind: bytes, payload: bytes) -> None:
+    wfile.write(_HEADER.pack(kind, len(payload)) + payload)
+    wfile.flush()
+
+
+def _recv(rfile) -> Tuple[Optional[bytes], bytes]:
+    header = rfile.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return None, b""
+    kind, length = _HEADER.unpack(header)
+    return kind, rfile.read(length)
+
+
+class _FrameWriter(io.TextIOBase):
+    """
+    Text stream sending written text to the client in frames.
+    Small writes like `click.echo` per record are buffered,
+    and sent in chunks or at least every `interval` seconds.
+    """
+
+    def __init__(
+        self, wfile, kind: bytes, tty: bool = False, interval: float = 0.1
+    ) -> None:
+        self.wfile = wfile
+        self.kind = kind
+        self.tty = tty
+        self.interval = interval
+        self._buffer = []
+        self._size = 0
+        self._sent_at = time.time()
+
+    def writable(self) -> bool:
+        return True
+
+    def isatty(self) -> bool:
+        return self.tty
+
+    @property
+    def encoding(self) -> str:
+        return "utf-8"
+
+    def write(self, text: str) -> int:
+        if not isinstance(text, str):
+            # click probes whether the stream is binary with write(b"")
+            raise TypeError(f"write() argument must be str, not {type(text).__name__}")
+        self._buffer.append(text)
+        self._size += len(text)
+        if self._size >= 65536 or time.time() - self._sent_at > self.interval:
+            self.send()
+        return len(text)
+
+    def send(self) -> None:
+        if self._buffer:
+            _send(self.wfile, self.kind, "".join(self._buffer).encode("utf-8"))
+            self._buffer = []
+            self._size = 0
+        self._sent_at = time.time()
+
+
+class Daemon:
+    """
+    Daemon class
+
+    Long-running process which answers read-only CLI commands
+    (`base search`, `base list`, `base show`) over a Unix domain socket.
+    Modules, config, the project registry, HTTP sessions, datafile linkers
+    and recent search results stay warm between commands, so repeated
+    commands return without paying process startup and downloads again.
+
+    Commands are run one at a time, in the working directory of the caller.
+
+    Attributes
+    ----------
+    socket_path : str
+        path of the Unix domain socket
+    search_cache : SearchCache
+        recent search results shared by commands
+    environ : dict
+        environment variables of the daemon, compared with callers'
+    stats : dict
+        number of "Requests" and "Commands", and "StartedAt" timestamp
+    """
+
+    def __init__(
+        self, socket_path: str = SOCKET_PATH, cache_ttl: Optional[float] = None
+    ) -> None:
+        """
+        Parameters
+        ----------
+        socket_path : str, default ~/.base/daemon.sock
+            path of the Unix domain socket,
+            can be set by "BASE_DAEMON_SOCKET" environment variable
+        cache_ttl : float, default None
+            seconds search results are cached, use CACHE_TTL if None
+
+        Raises
+        ------
+        Exception
+            raises if the daemon is already running on the socket
+        """
+        from base.cache import CACHE_TTL, SearchCache
+
+        if get_daemon_status(socket_path) is not None:
+            raise Exception(f"base daemon is already running on {socket_path}")
+        if os.path.exists(socket_path):
+            # left by the daemon which was killed
+            os.remove(socket_path)
+        os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+
+        self.socket_path = socket_path
+        self.search_cache = SearchCache(
+            ttl=CACHE_TTL if cache_ttl is None else cache_ttl
+        )
+        self.environ = _base_environ()
+        self.stats = {"Requests": 0, "Commands": 0, "StartedAt": time.time()}
+
+        self._run_lock = threading.Lock()
+        self._thread = None
+        self._server = socketserver.ThreadingUnixStreamServer(
+            socket_path, _RequestHandler
+        )
+        os.chmod(socket_path, 0o600)
+        self._server.daemon_threads = True
+        self._server.base_daemon = self
+
+    def __enter__(self) -> "Daemon":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        """
+        Start serving in a background thread.
+        """
+        self.__activate()
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop serving, and remove the socket.
+        """
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.__deactivate()
+
+    def serve_forever(self) -> None:
+        """
+        Serve in the current thread until interrupted or shut down.
+        """
+        self.__activate()
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.__deactivate()
+
+    def dispatch(self, request: dict, wfile) -> None:
+        """
+        Answer a request of the client.
+
+        Parameters
+        ----------
+        request : dict
+            request with "Command" of "Run", "Ping", "Invalidate" or "Shutdown"
+        wfile : file object
+            stream to send frames to the client
+        """
+        self.stats["Requests"] += 1
+        command = request.get("Command")
+        if command == "Run":
+            self.__run(request, wfile)
+            return
+
+        if command == "Ping":
+            status = {
+                "Status": "OK",
+                "Pid": os.getpid(),
+                "Uptime": time.time() - self.stats["StartedAt"],
+                "Requests": self.stats["Requests"],
+                "Commands": self.stats["Commands"],
+                "CachedSearches": len(self.search_cache),
+                "CacheHits": self.search_cache.hits,
+            }
+        elif command == "Invalidate":
+            self.__invalidate(request.get("ProjectName"), request.get("ProjectUid"))
+            status = {"Status": "OK"}
+        elif command == "Shutdown":
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+            status = {"Status": "OK"}
+        else:
+            status = {"Status": "Error", "Message": f"Unknown command: {command}"}
+        _send(wfile, _STATUS, json.dumps(status).encode("utf-8"))
+
+    def __run(self, request: dict, wfile) -> None:
+        args = request.get("Args", [])
+        if not args or args[0] not in FORWARDED_COMMANDS:
+            status = {"Status": "Rejected", "Message": "Not forwarded command"}
+        elif request.get("Env") != self.environ:
+            status = {"Status": "Rejected", "Message": "Environment mismatch"}
+        else:
+            status = {"Status": "Accepted"}
+        _send(wfile, _STATUS, json.dumps(status).encode("utf-8"))
+        if status["Status"] != "Accepted":
+            return
+
+        tty = request.get("Tty", False)
+        stdout = _FrameWriter(wfile, _STDOUT, tty)
+        stderr = _FrameWriter(wfile, _STDERR, tty)
+        with self._run_lock:
+            self.stats["Commands"] += 1
+            cwd, stdin = os.getcwd(), sys.stdin
+            try:
+                os.chdir(request.get("Cwd", cwd))
+                # commands must not prompt, the caller can not answer
+                sys.stdin = io.StringIO()
+                with redirect_stdout(stdout), redirect_stderr(stderr):
+                    exit_code = _run_cli(args)
+            finally:
+                sys.stdin = stdin
+                os.chdir(cwd)
+            stdout.send()
+            stderr.send()
+        _send(wfile, _EXIT, str(exit_code).encode("utf-8"))
+
+    def __invalidate(
+        self, project_name: Optional[str] = None, project_uid: Optional[str] = None
+    ) -> None:
+        from base.config import get_project_uid, get_user_id
+
+        if project_uid is None:
+            try:
+                project_uid = get_project_uid(get_user_id(), project_name)
+            except Exception:
+                project_uid = None
+        self.search_cache.invalidate(project_uid)
+
+    def __activate(self) -> None:
+        global _SERVING
+        # loaded once, and shared by every command
+        import base.cli
+        import base.project
+        from base import files
+
+        _SERVING = True
+        files.SEARCH_CACHE = self.search_cache
+
+    def __deactivate(self) -> None:
+        global _SERVING
+        from base import files
+
+        _SERVING = False
+        files.SEARCH_CACHE = None
+        self._server.server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        try:
+            line = self.rfile.readline()
+            if line:
+                self.server.base_daemon.dispatch(json.loads(line), self.wfile)
+        except (OSError, ValueError):
+            # the client went away, or sent a broken request
+            pass
+
+
+def _run_cli(args: List[str], local: bool = False) -> int:
+    from base.cli import main
+
+    try:
+        main.main(args=args, prog_name="base", local=local)
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        elif isinstance(e.code, int):
+            return e.code
+        click.echo(e.code, err=True)
+        return 1
+    except Exception:
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+def _connect(socket_path: str, timeout: Optional[float] = None) -> socket.socket:
+    if not hasattr(socket, "AF_UNIX"):
+        raise OSError("Unix domain socket is not supported on this platform")
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def send_request(
+    request: dict, socket_path: str = SOCKET_PATH, timeout: float = 5.0
+) -> dict:
+    """
+    Send a control request ("Ping", "Invalidate" or "Shutdown") to the daemon.
+
+    Parameters
+    ----------
+    request : dict
+        request with "Command"
+    socket_path : str, default ~/.base/daemon.sock
+        path of the Unix domain socket
+    timeout : float, default 5.0
+        seconds to wait for the answer
+
+    Returns
+    -------
+    status : dict
+        answer of the daemon
+
+    Raises
+    ------
+    OSError
+        raises if the daemon is not running
+    """
+    with _connect(socket_path, timeout) as sock, sock.makefile("rb") as rfile:
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        kind, payload = _recv(rfile)
+    if kind != _STATUS:
+        raise ConnectionError("base daemon closed the connection")
+    return json.loads(payload)
+
+
+def get_daemon_status(socket_path: str = SOCKET_PATH) -> Optional[dict]:
+    """
+    Get status of the daemon.
+
+    Parameters
+    ----------
+    socket_path : str, default ~/.base/daemon.sock
+        path of the Unix domain socket
+
+    Returns
+    -------
+    status : dict or None
+        "Pid", "Uptime", "Requests", "Commands", "CachedSearches"
+        and "CacheHits" of the daemon, None if it is not running
+    """
+    if not os.path.exists(socket_path):
+        return None
+    try:
+        return send_request({"Command": "Ping"}, socket_path)
+    except OSError:
+        return None
+
+
+def forward_command(
+    args: List[str],
+    socket_path: str = SOCKET_PATH,
+    stdout=None,
+    stderr=None,
+) -> Optional[int]:
+    """
+    Run a CLI command in the daemon if it is running.
+
+    Parameters
+    ----------
+    args : list of str
+        command line arguments without the program name
+    socket_path : str, default ~/.base/daemon.sock
+        path of the Unix domain socket
+    stdout, stderr : file object, default None
+        streams to write output of the command, use sys.stdout and sys.stderr if None
+
+    Returns
+    -------
+    exit_code : int or None
+        exit code of the command, None if the command was not run by the daemon,
+        because it is not running, or the command or environment is not supported
+    """
+    if not args or args[0] not in FORWARDED_COMMANDS:
+        return None
+    if not os.path.exists(socket_path):
+        return None
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+    request = {
+        "Command": "Run",
+        "Args": list(args),
+        "Cwd": os.getcwd(),
+        "Env": _base_environ(),
+        "Tty": stdout.isatty(),
+    }
+    try:
+        sock = _connect(socket_path)
+    except OSError:
+        return None
+
+    with sock, sock.makefile("rb") as rfile:
+        try:
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            kind, payload = _recv(rfile)
+        except OSError:
+            return None
+        if kind != _STATUS or json.loads(payload)["Status"] != "Accepted":
+            return None
+
+        while True:
+            try:
+                kind, payload = _recv(rfile)
+            except OSError:
+                kind = None
+            if kind == _STDOUT:
+                stdout.write(payload.decode("utf-8"))
+            elif kind == _STDERR:
+                stderr.write(payload.decode("utf-8"))
+            elif kind == _EXIT:
+                stdout.flush()
+                return int(payload)
+            else:
+                stderr.write("\nConnection to base daemon was lost\n")
+                return 1
+
+
+def notify_modified(
+    project_name: Optional[str],
+    socket_path: str = SOCKET_PATH,
+    project_uid: Optional[str] = None,
+):
+    """
+    Let the daemon drop cached search results of the modified project.
+    Nothing happens if the daemon is not running.
+
+    Parameters
+    ----------
+    project_name : str
+        registerd project name, drop results of all projects if None
+        and `project_uid` is not given
+    socket_path : str, default ~/.base/daemon.sock
+        path of the Unix domain socket
+    project_uid : str, default None
+        project unique hash, used instead of `project_name` if given
+    """
+    if not os.path.exists(socket_path):
+        return
+    request = {"Command": "Invalidate", "ProjectName": project_name}
+    if project_uid is not None:
+        request["ProjectUid"] = project_uid
+    try:
+        send_request(request, socket_path)
+    except OSError:
+        pass
+
+
+def start_daemon(
+    socket_path: str = SOCKET_PATH,
+    cache_ttl: Optional[float] = None,
+    log_file: str = LOG_FILE,
+    timeout: float = START_TIMEOUT,
+) -> dict:
+    """
+    Spawn the daemon in background, and wait until it answers.
+
+    Parameters
+    ----------
+    socket_path : str, default ~/.base/daemon.sock
+        path of the Unix domain socket
+    cache_ttl : float, default None
+        seconds search results are cached, use CACHE_TTL if None
+    log_file : str, default ~/.base/daemon.log
+        file to write output of the daemon
+    timeout : float, default 10.0
+        seconds to wait for the daemon
+
+    Returns
+    -------
+    status : dict
+        status of the started daemon, see `get_daemon_status()`
+
+    Raises
+    ------
+    Exception
+        raises if the daemon is already running, or failed to start
+    """
+    import subprocess
+
+    if not hasattr(socket, "AF_UNIX"):
+        raise Exception("base daemon is not supported on this platform")
+    if get_daemon_status(socket_path) is not None:
+        raise Exception("base daemon is already running")
+
+    command = [sys.executable, "-m", "base.daemon", "--socket", socket_path]
+    if cache_ttl is not None:
+        command += ["--cache-ttl", str(cache_ttl)]
+    os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+    with open(log_file, "a") as log:
+        process = subprocess.Popen(
+            command,
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = get_daemon_status(socket_path)
+        if status is not None:
+            return status
+        if process.poll() is not None:
+            break
+        time.sleep(0.05)
+    raise Exception(f"Failed to start base daemon, see {log_file}")
+
+
+def stop_daemon(socket_path: str = SOCKET_PATH, timeout: float = START_TIMEOUT):
+    """
+    Shut down the daemon, and wait until the socket is removed.
+
+    Parameters
+    ----------
+    socket_path : str, default ~/.base/daemon.sock
+        path of the Unix domain socket
+    timeout : float, default 10.0
+        seconds to wait for the daemon
+
+    Raises
+    ------
+    Exception
+        raises if the daemon is not running, or did not stop
+    """
+    try:
+        send_request({"Command": "Shutdown"}, socket_path)
+    except OSError:
+        raise Exception("base daemon is not running")
+
+    deadline = time.time() + timeout
+    while os.path.exists(socket_path):
+        if time.time() > deadline:
+            raise Exception("base daemon did not stop")
+        time.sleep(0.05)
+
+
+class DaemonGroup(click.Group):
+    """
+    click.Group which forwards commands to the daemon when it is running,
+    and lets the daemon know projects modified by other commands.
+    """
+
+    def main(self, args: Optional[List[str]] = None, local: bool = False, **extra):
+        if args is None:
+            args = sys.argv[1:]
+        args = list(args)
+        # the caller like `base batch` runs it, and notifies the daemon by itself
+        if _SERVING or local:
+            return super().main(args, **extra)
+
+        # commands with options of the group like `--profile` run in this process
+        exit_code = forward_command(args)
+        if exit_code is not None:
+            sys.exit(exit_code)
+        command_args = self.__strip_options(args)
+        try:
+            return super().main(args, **extra)
+        finally:
+            if command_args and command_args[0] in MODIFYING_COMMANDS:
+                notify_modified(command_args[1] if len(command_args) > 1 else None)
+
+    def __strip_options(self, args: List[str]) -> List[str]:
+        """
+        Drop options of the group before the command name.
+        """
+        options = {opt: param for param in self.params for opt in param.opts}
+        i = 0
+        while i < len(args) and args[i].startswith("-"):
+            name = args[i].split("=", 1)[0]
+            param = options.get(name)
+            i += 1
+            if param is not None and not param.is_flag and "=" not in args[i - 1]:
+                i += 1
+        return args[i:]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Daemon serving base commands")
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    parser.add_argument("--cache-ttl", type=float, default=None)
+    args = parser.parse_args()
+
+    daemon = Daemon(socket_path=args.socket, cache_ttl=args.cache_ttl)
+    # remove the socket on `kill` too
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"Serving base daemon on {daemon.socket_path} (pid {os.getpid()})")
+    sys.stdout.flush()
+    daemon.serve_forever()
+
+
+if __name__ == "__main__":
+    # run main of `base.daemon` module imported by base.cli,
+    # instead of this `__main__` module, so that they share the state
+    from base.daemon import main
+
+    main()
@@ -2,8 +2,6 @@
 
 # Copyright 2022 Adansons Inc.
 # Please contact engineer@adansons.co.jp
-import numpy as np
-from sklearn.model_selection import train_test_split
 from typing import Callable, Optional, Tuple
 
 from base.files import Files
@@ -85,6 +83,9 @@ class Dataset:
         y_test : list of int
             target label used to test
         """
+        # imported here, because scikit-learn takes long time to import
+        from sklearn.model_selection import train_test_split
+
         self.y = [getattr(i, self.target_key) for i in self.files]
         self.x = [self.transform(i) for i in self.paths]
 
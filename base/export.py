@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import os
+import csv
+import json
+import itertools
+from typing import IO, Dict, Iterable, List, Optional
+
+# file types of `export_records()`
+EXPORT_TYPES = ("json", "csv", "jsonl", "parquet", "feather")
+# columnar file types, written with pyarrow
+ARROW_TYPES = ("parquet", "feather")
+# number of records encoded at once in JSON
+JSON_BATCH_SIZE = 1000
+# number of records in a row group of parquet, or a record batch of feather
+ARROW_CHUNK_SIZE = 65536
+
+# column type of each value type, the other types are written as JSON string
+_VALUE_TYPES = {str: "string", int: "int", float: "float", bool: "bool"}
+
+
+def get_output_path(output: Optional[str], default_path: str) -> str:
+    """
+    Decide the path to export, which does not overwrite existing files.
+
+    Parameters
+    ----------
+    output : str
+        output file path specified by the user, use `default_path` if None
+    default_path : str
+        default output file path
+
+    Returns
+    -------
+    output_path : str
+        path of the output file, " (1)", " (2)", ... is added to the name
+        if the file already exists
+    """
+    output_path = default_path
+    if output is not None:
+        output_path = output
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+
+    file_count = 1
+    basename, ext = os.path.splitext(output_path)
+    while os.path.exists(output_path):
+        output_path = f"{basename} ({file_count}){ext}"
+        file_count += 1
+    return output_path
+
+
+def collect_keys(records: Iterable[dict]) -> List[str]:
+    """
+    Collect keys of records in order of appearance.
+
+    Parameters
+    ----------
+    records : iterable of dict
+        records to export
+
+    Returns
+    -------
+    keys : list of str
+        union of keys of the records
+    """
+    keys = {}
+    for record in records:
+        # only the keys are used, dict.update keeps them in order in one call
+        keys.update(record)
+    return list(keys)
+
+
+def write_csv(
+    records: Iterable[dict], f: IO[str], keys: Optional[List[str]] = None
+) -> int:
+    """
+    Write records to the file in CSV, row by row.
+    Values with commas, quotes or line breaks are quoted.
+
+    Parameters
+    ----------
+    records : iterable of dict
+        records to export, it must be a list if `keys` is None
+    f : file object
+        text file opened with newline=""
+    keys : list of str, default None
+        columns of the CSV, collected from the records if None,
+        missing values are written as empty
+
+    Returns
+    -------
+    record_num : int
+        number of written records
+    """
+    if keys is None:
+        keys = collect_keys(records)
+    writer = csv.DictWriter(f, fieldnames=keys, restval="", extrasaction="ignore")
+    writer.writeheader()
+    record_num = 0
+    for record in records:
+        writer.writerow(record)
+        record_num += 1
+    return record_num
+
+
+def write_json(records: Iterable[dict], f: IO[str], root_key: str = "Data") -> int:
+    """
+    Write records to the file in indented JSON, record by record.
+    The output is same as `json.dump({root_key: records}, f, indent=4)`,
+    without building the whole document in memory.
+
+    Parameters
+    ----------
+    records : iterable of dict
+        records to export
+    f : file object
+        text file to write
+    root_key : str, default "Data"
+        key of the records in the JSON document
+
+    Returns
+    -------
+    record_num : int
+        number of written records
+    """
+    # records are encoded in batches, with less overhead than one by one
+    encoder = json.JSONEncoder(indent=4, ensure_ascii=False)
+    records = iter(records)
+    f.write("{\n    " + encoder.encode(root_key) + ": [")
+    record_num = 0
+    while True:
+        batch = list(itertools.islice(records, JSON_BATCH_SIZE))
+        if not batch:
+            break
+        # strip "[" and "\n]" of the list, and indent it in the document
+        text = encoder.encode(batch)[1:-2].replace("\n", "\n    ")
+        f.write("," + text if record_num else text)
+        record_num += len(batch)
+    f.write("\n    ]\n}" if record_num else "]\n}")
+    return record_num
+
+
+def write_jsonl(records: Iterable[dict], f: IO[str]) -> int:
+    """
+    Write records to the file in JSON Lines, one record per line.
+
+    Parameters
+    ----------
+    records : iterable of dict
+        records to export
+    f : file object
+        text file to write
+
+    Returns
+    -------
+    record_num : int
+        number of written records
+    """
+    encoder = json.JSONEncoder(ensure_ascii=False)
+    records = iter(records)
+    record_num = 0
+    while True:
+        batch = list(itertools.islice(records, JSON_BATCH_SIZE))
+        if not batch:
+            break
+        f.write("".join([encoder.encode(record) + "\n" for record in batch]))
+        record_num += len(batch)
+    return record_num
+
+
+def infer_column_types(records: Iterable[dict]) -> Dict[str, str]:
+    """
+    Infer type of each column from values of the records.
+
+    Parameters
+    ----------
+    records : iterable of dict
+        records to export
+
+    Returns
+    -------
+    column_types : dict
+        dict of key to "string", "int", "float" or "bool" in order of appearance.
+        int and float values make "float" column, other mixed values, lists,
+        dicts and keys without values make "string" column
+    """
+    column_types = {}
+    for record in records:
+        for key, value in record.items():
+            if value is None:
+                column_types.setdefault(key, None)
+                continue
+            value_type = _VALUE_TYPES.get(type(value), "string")
+            column_type = column_types.get(key)
+            if column_type is None:
+                column_types[key] = value_type
+            elif column_type != value_type:
+                if {column_type, value_type} == {"int", "float"}:
+                    column_types[key] = "float"
+                else:
+                    column_types[key] = "string"
+    return {key: column_type or "string" for key, column_type in column_types.items()}
+
+
+def write_arrow(
+    records: List[dict],
+    output_path: str,
+    file_type: str = "parquet",
+    chunk_size: int = ARROW_CHUNK_SIZE,
+) -> int:
+    """
+    Write records to the file in columnar format, chunk by chunk.
+    Each column is typed with `infer_column_types()`, so that readers
+    like pandas or Spark can load only the columns they need.
+
+    Parameters
+    ----------
+    records : list of dict
+        records to export
+    output_path : str
+        path of the output file
+    file_type : str, default "parquet"
+        "parquet", or "feather" (Arrow IPC file, which can be memory-mapped)
+    chunk_size : int, default 65536
+        number of records in a row group or a record batch
+
+    Returns
+    -------
+    record_num : int
+        number of written records
+
+    Raises
+    ------
+    ImportError
+        raises if pyarrow is not installed
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError(
+            f"pyarrow is required to export {file_type} file. "
+            "Please install it with `pip install adansons-base[arrow]`."
+        )
+
+    arrow_types = {
+        "string": pa.string(),
+        "int": pa.int64(),
+        "float": pa.float64(),
+        "bool": pa.bool_(),
+    }
+    column_types = infer_column_types(records)
+    schema = pa.schema(
+        [(key, arrow_types[column_type]) for key, column_type in column_types.items()]
+    )
+
+    if file_type == "parquet":
+        import pyarrow.parquet as pq
+
+        writer = pq.ParquetWriter(output_path, schema)
+    else:
+        import pyarrow.ipc
+
+        writer = pyarrow.ipc.new_file(output_path, schema)
+
+    with writer:
+        for start in range(0, len(records), chunk_size):
+            chunk = records[start : start + chunk_size]
+            columns = []
+            for key, column_type in column_types.items():
+                values = [record.get(key) for record in chunk]
+                if column_type == "string":
+                    values = [_to_string(value) for value in values]
+                columns.append(pa.array(values, type=arrow_types[column_type]))
+            writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=schema))
+    return len(records)
+
+
+def export_records(records: Iterable[dict], output_path: str, file_type: str) -> int:
+    """
+    Export records to the file.
+
+    Parameters
+    ----------
+    records : iterable of dict
+        records to export, it must be a list for "csv", "parquet" and "feather"
+    output_path : str
+        path of the output file
+    file_type : str
+        "json", "csv", "jsonl", "parquet" or "feather"
+
+    Returns
+    -------
+    record_num : int
+        number of exported records
+
+    Raises
+    ------
+    ValueError
+        raises if the file type is not supported
+    ImportError
+        raises if pyarrow is not installed for "parquet" and "feather"
+    """
+    file_type = file_type.lower()
+    if file_type not in EXPORT_TYPES:
+        raise ValueError(f"Export file type: {file_type} is not supported")
+
+    if file_type in ARROW_TYPES:
+        return write_arrow(records, output_path, file_type)
+    with open(output_path, "w", encoding="utf-8", newline="") as f:
+        if file_type == "csv":
+            return write_csv(records, f)
+        elif file_type == "jsonl":
+            return write_jsonl(records, f)
+        return write_json(records, f)
+
+
+def _to_string(value) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    elif isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+if __name__ == "__main__":
+    pass
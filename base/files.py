@@ -6,19 +6,26 @@ import os
 import re
 import json
 import copy
-import requests
+import heapq
+import itertools
 import urllib.parse
-from typing import Optional, Union, List, Any
-
+from typing import Callable, Iterator, Optional, Union, List, Any
+
+from base.cache import SearchCache
+from base.client import get_client
+from base.export import export_records
+from base.linker import load_linker
+from base.profiler import stage
+from base.stream import CHUNK_SIZE, iter_json_array
 from base.config import (
     get_user_id,
-    get_access_key,
     get_project_uid,
     BASE_API_ENDPOINT,
 )
 
-HEADER = {"Content-Type": "application/json"}
-LINKER_DIR = os.path.join(os.path.expanduser("~"), ".base", "linker")
+# recent search results kept in memory, enabled in long-running process
+# like `base daemon`, see `base.cache.SearchCache`
+SEARCH_CACHE: Optional[SearchCache] = None
 
 
 class File(str):
@@ -82,6 +89,10 @@ class Files:
         conditions: Optional[str] = None,
         query: List[str] = [],
         sort_key: Union[str, List[str], None] = None,
+        user_id: Optional[str] = None,
+        access_key: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
     ) -> None:
         """
         Parameters
@@ -94,23 +105,81 @@ class Files:
             conditional expression of key and value to search for files
         sort_key : str, default None
             key to sort files
+        user_id : str, default None
+            registerd user id, use configured user id if None
+        access_key : str, default None
+            API access key, use configured access key if None
+        limit : int, default None
+            maximum number of files, keep all files if None.
+            the search stops as soon as enough files are found unless `sort_key` is given
+        offset : int, default 0
+            number of files skipped from the beginning (after sorted)
         """
-        access_key = get_access_key()
-        HEADER.update({"x-api-key": access_key})
-
+        self.client = get_client(access_key)
         self.project_name = project_name
-        self.user_id = get_user_id()
+        self.user_id = user_id or get_user_id()
         self.project_uid = get_project_uid(self.user_id, project_name)
 
         self.sort_key = sort_key
 
-        self.__export(conditions=conditions, query=query, sort_key=sort_key)
+        self.__export(
+            conditions=conditions,
+            query=query,
+            sort_key=sort_key,
+            limit=limit,
+            offset=offset,
+        )
 
         self.reprtext = self.__reprtext_generator(conditions, query)
         self.expression = self.__class__.__name__
 
+    @classmethod
+    def count(
+        cls,
+        project_name: str,
+        conditions: Optional[str] = None,
+        query: List[str] = [],
+        user_id: Optional[str] = None,
+        access_key: Optional[str] = None,
+    ) -> int:
+        """
+        Count files which match the conditions and the query,
+        without resolving local paths nor creating File objects.
+
+        Parameters
+        ----------
+        project_name : str
+            registerd project name
+        conditions : str, default None
+            value of the condition to search for files
+        query : list of str, default []
+            conditional expression of key and value to search for files
+        user_id : str, default None
+            registerd user id, use configured user id if None
+        access_key : str, default None
+            API access key, use configured access key if None
+
+        Returns
+        -------
+        file_num : int
+            number of matched files
+        """
+        files = cls.__new__(cls)
+        files.client = get_client(access_key)
+        files.project_name = project_name
+        files.user_id = user_id or get_user_id()
+        files.project_uid = get_project_uid(files.user_id, project_name)
+        files.__validate_args(conditions, query, None)
+
+        return sum(1 for _ in files.__iter_matched(conditions, query, resolve=False))
+
     def __search(
-        self, conditions: Optional[str] = None, query: List[str] = []
+        self,
+        conditions: Optional[str] = None,
+        query: List[str] = [],
+        sort_key: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
     ) -> List[dict]:
         """
         Get metadata of filtered files from DynamoDB.
@@ -121,43 +190,118 @@ class Files:
             value of the condition to search for files
         query : list of str, default []
             conditional expression of key and value to search for files
-        sort_key : str, default None
-            key to sort files
+        sort_key : list of str, default None
+            keys to sort files
+        limit : int, default None
+            maximum number of files, keep all files if None
+        offset : int, default 0
+            number of files skipped from the beginning
 
         Returns
         -------
         result : list of dict
             search result of metadata
         """
+        records = self.__iter_matched(conditions, query)
+        if sort_key is not None:
+            key = lambda x: [x.get(k, float("inf")) for k in sort_key]
+            if limit is None:
+                result = sorted(records, key=key)
+            else:
+                # keep only top records, it is same as sorted()[:n]
+                result = heapq.nsmallest(offset + limit, records, key=key)
+            return result[offset:]
+
+        stop = None if limit is None else offset + limit
+        result = list(itertools.islice(records, offset, stop))
+        # stop downloading the rest of the search result
+        records.close()
+        return result
+
+    def __iter_matched(
+        self,
+        conditions: Optional[str] = None,
+        query: List[str] = [],
+        resolve: bool = True,
+    ) -> Iterator[dict]:
+        """
+        Search files, and yield matched records one by one.
+
+        Parameters
+        ----------
+        conditions : str, default None
+            value of the condition to search for files
+        query : list of str, default []
+            conditional expression of key and value to search for files
+        resolve : bool, default True
+            if True, "FileHash" is replaced with "FilePath" of local linker
+
+        Yields
+        ------
+        data : dict
+            metadata of a matched file
+        """
         url = f"{BASE_API_ENDPOINT}/project/{self.project_uid}/files"
         if conditions is not None:
             url += "/" + "/".join(map(urllib.parse.quote_plus, conditions.split(",")))
         url += "?user=" + self.user_id
 
-        res = requests.get(url=url, headers=HEADER)
+        predicates = self.__query_predicates(query)
+        if resolve:
+            hash_dict = load_linker(self.project_uid)
+
+        if SEARCH_CACHE is not None:
+            records = SEARCH_CACHE.get(self.project_uid, url)
+            if records is None:
+                records = list(self.__iter_records(url))
+                SEARCH_CACHE.put(self.project_uid, url, records)
+            # cached records are shared, so they are copied before modified
+            records = (dict(data) for data in records)
+        else:
+            records = self.__iter_records(url)
+
+        # parse the result record by record, and keep only matched records
+        try:
+            for data in records:
+                if all(predicate(data) for predicate in predicates):
+                    if resolve:
+                        data = {"FilePath": hash_dict[data.pop("FileHash")], **data}
+                    yield data
+        finally:
+            records.close()
+
+    def __iter_records(self, url: str) -> Iterator[dict]:
+        """
+        Download the search result and yield its records one by one.
+
+        Parameters
+        ----------
+        url : str
+            url of the search request
+
+        Yields
+        ------
+        data : dict
+            metadata of a file
+        """
+        res = self.client.request("GET", url)
         if res.status_code == 200:
             result_url = res.json()["URL"]
-            result = requests.get(result_url)
-            result = json.loads(result.content.decode("utf-8"))["Items"]
         else:
             raise Exception("Undefined error happend.")
 
-        result = self.__query_filter(result, query)
-
-        linked_hash_location = os.path.join(
-            LINKER_DIR, self.project_uid, "linked_hash.json"
-        )
-        with open(linked_hash_location, "r", encoding="utf-8") as f:
-            hash_dict = json.loads(f.read())
-            result = [{"FilePath": hash_dict[i.pop("FileHash")], **i} for i in result]
-
-        return result
+        with self.client.request(
+            "GET", result_url, authorized=False, stream=True
+        ) as res:
+            yield from iter_json_array(res.iter_content(CHUNK_SIZE), "Items")
 
     def __export(
         self,
         conditions: Optional[str] = None,
         query: List[str] = [],
         sort_key: Union[str, List[str], None] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
     ):
         """
         Get metadata and return the File class.
@@ -170,25 +314,26 @@ class Files:
             conditional expression of key and value to search for files
         sort_key : str, default None
             key to sort files
+        limit : int, default None
+            maximum number of files, keep all files if None
+        offset : int, default 0
+            number of files skipped from the beginning
 
         Returns
         -------
         self : Files class instance
         """
         # arguments varidation
-        self.__validate_args(conditions, query, sort_key)
+        self.__validate_args(conditions, query, sort_key, limit, offset)
 
-        result = self.__search(conditions, query)
-        if sort_key is not None:
-            if isinstance(sort_key, str):
-                sort_key = [sort_key]
-            result = sorted(
-                result,
-                key=lambda x: [x.get(key, float("inf")) for key in sort_key],
-            )
+        if isinstance(sort_key, str):
+            sort_key = [sort_key]
+        with stage("search"):
+            result = self.__search(conditions, query, sort_key, limit, offset)
 
         self.result = result
-        self.__set_attributes(result)
+        with stage("files"):
+            self.__set_attributes(result)
 
         return self
 
@@ -240,6 +385,28 @@ class Files:
 
         return filtered_files
 
+    def export(self, output_path: str, file_type: Optional[str] = None) -> int:
+        """
+        Export metadata of the files to the file.
+
+        Parameters
+        ----------
+        output_path : str
+            path of the output file
+        file_type : str, default None
+            "json", "csv", "jsonl", "parquet" or "feather",
+            inferred from the extension of `output_path` if None.
+            "parquet" and "feather" require pyarrow
+
+        Returns
+        -------
+        file_num : int
+            number of exported files
+        """
+        if file_type is None:
+            file_type = os.path.splitext(output_path)[1][1:]
+        return export_records(self.result, output_path, file_type)
+
     def __query_filter(self, result: List[dict], query: List[str] = []) -> List[dict]:
         """
         Filter metadata with query.
@@ -256,6 +423,26 @@ class Files:
         result : list of dict
             metadata filterd with query
         """
+        predicates = self.__query_predicates(query)
+        result = [
+            data for data in result if all(predicate(data) for predicate in predicates)
+        ]
+        return result
+
+    def __query_predicates(self, query: List[str] = []) -> List[Callable[[dict], bool]]:
+        """
+        Parse query into predicates, which judge one record of metadata.
+
+        Parameters
+        ----------
+        query : list of str, default []
+            conditional expression of key and value to search for files
+
+        Returns
+        -------
+        predicates : list of callable
+            functions return True if the record matches each query
+        """
 
         def number_to_int(obj: str):
             return int(obj) if obj.isdigit() else obj
@@ -271,11 +458,44 @@ class Files:
 
             return sort_funcion
 
+        def compare(data: dict, key: str, value: str) -> List[Any]:
+            return sorted(
+                [data[key], value],
+                key=natural_keys(data[key].__class__.__name__),
+            )
+
+        def build_predicate(
+            key: str, operator: str, value: Any
+        ) -> Callable[[dict], bool]:
+            if operator == "==":
+                return lambda data: key in data and eval(
+                    f"'{data[key]}' {operator} '{value}'"
+                )
+            elif operator == "!=":
+                return lambda data: not (
+                    key in data and not eval(f"'{data[key]}' {operator} '{value}'")
+                )
+            elif operator in [">", ">="]:
+                return (
+                    lambda data: key in data and compare(data, key, value)[0] == value
+                )
+            elif operator in ["<", "<="]:
+                return (
+                    lambda data: key in data and compare(data, key, value)[1] == value
+                )
+            elif operator == "is":
+                return lambda data: key not in data
+            elif operator == "is not":
+                return lambda data: key in data
+            else:  # "in" or "not in"
+                return lambda data: key in data and eval(
+                    f"'{data[key]}' {operator} {value}"
+                )
+
         unquote = lambda v: v.lstrip("'").rstrip("'").lstrip('"').rstrip('"')
 
+        predicates = []
         for q in query:
-            queried_result = []
-
             query_split = q.split(" ", 2)
             if len(query_split) < 3 or query_split[1] not in [
                 "==",
@@ -304,58 +524,22 @@ class Files:
                 value = unquote(query_split[-1])
                 operator = " ".join(query_split[1:-1])
 
-            if operator == "==":
-                for data in result:
-                    if key in data and eval(f"'{data[key]}' {operator} '{value}'"):
-                        queried_result.append(data)
-            elif operator == "!=":
-                for data in result:
-                    if key in data and not eval(f"'{data[key]}' {operator} '{value}'"):
-                        continue
-                    else:
-                        queried_result.append(data)
-            elif operator in [">", ">="]:
-                for data in result:
-                    if key in data:
-                        s = sorted(
-                            [data[key], value],
-                            key=natural_keys(data[key].__class__.__name__),
-                        )
-                        if s[0] == value:
-                            queried_result.append(data)
-            elif operator in ["<", "<="]:
-                for data in result:
-                    if key in data:
-                        s = sorted(
-                            [data[key], value],
-                            key=natural_keys(data[key].__class__.__name__),
-                        )
-                        if s[1] == value:
-                            queried_result.append(data)
-            elif operator in ["is", "is not"]:
+            if operator in ["is", "is not"]:
                 # in python, "is" and "is not" operators allowed to compare with `None`
                 # so, if other values set as 'value', raise ValueError
                 if value != "None":
                     raise ValueError(
                         "Only 'None' is allowed with `is` or `is not` operators."
                     )
-                for data in result:
-                    if (operator == "is" and key not in data) or (
-                        operator == "is not" and key in data
-                    ):
-                        queried_result.append(data)
             elif operator in ["in", "not in"]:
                 value = [unquote(v) for v in re.split("[ ,]", value[1:-1]) if v != ""]
-                for data in result:
-                    if key in data and eval(f"'{data[key]}' {operator} {value}"):
-                        queried_result.append(data)
-            else:
+            elif operator not in ["==", "!=", ">", ">=", "<", "<="]:
                 raise ValueError(
                     f"Specified operator '{operator}' was blocked for the security."
                 )
 
-            result = queried_result
-        return result
+            predicates.append(build_predicate(key, operator, value))
+        return predicates
 
     def __conditions_filter(
         self, result: List[dict], conditions: Optional[str] = None
@@ -411,7 +595,7 @@ class Files:
         self.paths = paths  # list of filepaths
         self.items = items  # list of metadata_dict other than filepath
 
-    def __validate_args(self, conditions, query, sort_key):
+    def __validate_args(self, conditions, query, sort_key, limit=None, offset=0):
         if conditions is not None:
             if not isinstance(conditions, str):
                 raise TypeError(
@@ -426,6 +610,19 @@ class Files:
                 raise TypeError(
                     f'Argument "sort_key" must be str, not {sort_key.__class__.__name__}.'
                 )
+        if limit is not None:
+            if not isinstance(limit, int):
+                raise TypeError(
+                    f'Argument "limit" must be int, not {limit.__class__.__name__}.'
+                )
+            if limit < 0:
+                raise ValueError('Argument "limit" must not be negative.')
+        if not isinstance(offset, int):
+            raise TypeError(
+                f'Argument "offset" must be int, not {offset.__class__.__name__}.'
+            )
+        if offset < 0:
+            raise ValueError('Argument "offset" must not be negative.')
 
     def __getitem__(self, idx: int) -> File:
         return self.files[idx]
@@ -445,30 +642,31 @@ class Files:
         return reprtext
 
     def __repr__(self) -> str:
+        # build text on local variables, so that repr never changes the instance
+        reprtext = self.reprtext
+        expression = self.expression
         # if this instance is operated,
-        if self.reprtext.count(self.__class__.__name__) >= 2:
+        if reprtext.count(self.__class__.__name__) >= 2:
             repr_header = "======Files======\n"
             expres_header = "===Expressions===\n"
             # number each File instance
             # 'Files(project_name=,...)' -> '{}(projwct_name=,...)' to use str.format()
-            self.reprtext = re.sub(f"{self.__class__.__name__}", "{}", self.reprtext)
-            self.expression = re.sub(
-                f"{self.__class__.__name__}", "{}", self.expression
-            )
+            reprtext = re.sub(f"{self.__class__.__name__}", "{}", reprtext)
+            expression = re.sub(f"{self.__class__.__name__}", "{}", expression)
             # '{}(projwct_name=,...)' -> 'Files1(projwct_name=,...)'
-            self.reprtext = self.reprtext.format(
+            reprtext = reprtext.format(
                 *[
                     f"{self.__class__.__name__}{i+1}"
-                    for i in range(self.reprtext.count("{}"))
+                    for i in range(reprtext.count("{}"))
                 ]
             )
-            self.expression = self.expression.format(
+            expression = expression.format(
                 *[
                     f"{self.__class__.__name__}{i+1}"
-                    for i in range(self.expression.count("{}"))
+                    for i in range(expression.count("{}"))
                 ]
             )
-            return repr_header + self.reprtext + expres_header + self.expression
+            return repr_header + reprtext + expres_header + expression
         else:
             return self.reprtext
 
@@ -517,5 +715,25 @@ class Files:
             )
 
 
+def invalidate_search_results(project_uid: str) -> None:
+    """
+    Drop cached search results of the modified project, best effort.
+    Results cached in this process, like `base daemon` or `base batch`,
+    are dropped at once, otherwise the daemon is notified if it is running.
+
+    Parameters
+    ----------
+    project_uid : str
+        project unique hash
+    """
+    if SEARCH_CACHE is not None:
+        SEARCH_CACHE.invalidate(project_uid)
+        return
+    # imported here, because base.daemon is needed only after modifications
+    from base import daemon
+
+    daemon.notify_modified(None, project_uid=project_uid)
+
+
 if __name__ == "__main__":
     pass
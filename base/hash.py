@@ -4,6 +4,7 @@
 # Please contact engineer@adansons.co.jp
 import hashlib
 
+from base.profiler import stage
 
 HASH_FUNCS = {
     "md5": hashlib.md5,
@@ -42,7 +43,7 @@ def calc_file_hash(
     """
     hash_func = HASH_FUNCS[algorithm]()
 
-    with open(path, "rb") as f:
+    with stage("hash"), open(path, "rb") as f:
         if split_chunk:
             while True:
                 chunk = f.read(chunk_size * hash_func.block_size)
@@ -58,5 +59,29 @@ def calc_file_hash(
     return digest
 
 
+def calc_bytes_hash(data: bytes, algorithm: str = "sha256") -> str:
+    """
+    Calculate hash value of in-memory data
+
+    The digest is same as `calc_file_hash` of a file which has the same content.
+
+    Parameters
+    ----------
+    data : bytes
+        target data
+    algorithm : {"md5", "sha224", "sha256", "sha384", "sha512", "sha1"}, default="sha256"
+        hash algorithm name
+
+    Returns
+    -------
+    digest : str
+        hash string of inputed data
+    """
+    hash_func = HASH_FUNCS[algorithm]()
+    hash_func.update(data)
+    digest = hash_func.hexdigest()
+    return digest
+
+
 if __name__ == "__main__":
     pass
@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import os
+import json
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional, Tuple, Union
+
+from base.client import APIClient
+from base.config import BASE_API_ENDPOINT
+from base.files import invalidate_search_results
+from base.hash import calc_file_hash, calc_bytes_hash
+from base.linker import update_linker
+from base.uploader import BatchUploader, MAX_BATCH_RECORDS, PAYLOAD_SEP
+
+# seconds a record may wait in the buffer before it is flushed
+MAX_LATENCY = 1.0
+# minimum seconds between rewrites of the local datafile linker
+LINKER_INTERVAL = 5.0
+# number of flushed batches which may be in flight at once
+MAX_PENDING = 2
+
+
+class IngestWriter:
+    """
+    IngestWriter class
+
+    Accept datafiles one by one and upload their meta data records
+    in micro-batches. The buffer is flushed when it reaches the batch size
+    of the uploader, or when the oldest record has waited `max_latency` seconds.
+    Flushed batches are posted on a background thread, so `write` returns
+    as soon as the record is hashed and buffered.
+
+    >>> with project.writer(attributes={"camera": "front"}) as writer:
+    ...     for frame in capture():
+    ...         writer.write(frame, {"timestamp": frame.timestamp})
+
+    Attributes
+    ----------
+    project_uid : str
+        project unique hash
+    attributes : dict
+        common meta data added to every record
+    share_attributes : bool
+        if True, `attributes` are sent once per batch instead of on every record
+    max_latency : float
+        seconds a record may wait in the buffer before it is flushed
+    linker_interval : float
+        minimum seconds between rewrites of the local datafile linker
+    record_num : int
+        number of accepted records
+    uploader : BatchUploader
+        uploader of the flushed batches
+    """
+
+    def __init__(
+        self,
+        project_uid: str,
+        user_id: str,
+        attributes: dict = {},
+        max_batch_records: int = MAX_BATCH_RECORDS,
+        max_latency: float = MAX_LATENCY,
+        linker_interval: float = LINKER_INTERVAL,
+        max_pending: int = MAX_PENDING,
+        share_attributes: bool = False,
+        client: Optional[APIClient] = None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        project_uid : str
+            project unique hash
+        user_id : str
+            user id of the project owner
+        attributes : dict, default {}
+            common meta data added to every record
+        max_batch_records : int, default 10000
+            maximum number of records in one batch
+        max_latency : float, default 1.0
+            seconds a record may wait in the buffer before it is flushed
+        linker_interval : float, default 5.0
+            minimum seconds between rewrites of the local datafile linker
+        max_pending : int, default 2
+            number of flushed batches which may be in flight at once,
+            `write` blocks while this number of batches are in flight
+        share_attributes : bool, default False
+            if True, `attributes` are sent once per batch instead of on every record
+        client : APIClient, default None
+            client to send requests, use the shared client if None
+        """
+        self.project_uid = project_uid
+        self.attributes = attributes
+        self.share_attributes = share_attributes
+        self.max_latency = max_latency
+        self.linker_interval = linker_interval
+        self.max_pending = max(max_pending, 1)
+        self.record_num = 0
+
+        url = f"{BASE_API_ENDPOINT}/project/{project_uid}?user={user_id}"
+        self.uploader = BatchUploader(
+            url,
+            client=client,
+            max_batch_records=max_batch_records,
+            common_attributes=attributes if share_attributes else None,
+        )
+
+        self._lock = threading.Lock()
+        self._batch = []
+        self._batch_size = 0
+        self._batch_time = 0.0
+        self._hash_dict = {}
+        self._linker_buffer = {}
+        self._linker_time = time.time()
+        self._pending = deque()
+        self._error = None
+
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self.__run_timer, daemon=True)
+        self._timer.start()
+
+    def __enter__(self) -> "IngestWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    @property
+    def uploaded_num(self) -> int:
+        """
+        Number of acknowledged records.
+        """
+        return self.uploader.uploaded_num
+
+    @property
+    def closed(self) -> bool:
+        """
+        Whether the writer was closed or not.
+        """
+        return self._closed.is_set()
+
+    def write(
+        self,
+        data: Union[str, bytes],
+        attributes: dict = {},
+        file_path: Optional[str] = None,
+    ) -> str:
+        """
+        Hash one datafile and buffer its meta data record.
+
+        Parameters
+        ----------
+        data : str or bytes
+            the file path, or in-memory content of the datafile
+        attributes : dict, default {}
+            meta data of the datafile
+        file_path : str, default None
+            local path to link with the datafile,
+            required to link in-memory content to a saved file
+
+        Returns
+        -------
+        hash_value : str
+            file hash of the datafile
+
+        Raises
+        ------
+        ValueError
+            raises if the writer is already closed
+        Exception
+            raises if something went wrong on uploading request to server
+        """
+        record, file_path = self.__hash(data, attributes, file_path)
+        self.__add(record, file_path)
+        return record["FileHash"]
+
+    def write_many(
+        self,
+        items: Iterable[Union[str, bytes, Tuple[Union[str, bytes], dict]]],
+        max_workers: int = 2,
+    ) -> int:
+        """
+        Hash datafiles in parallel and buffer their meta data records in order.
+
+        The items are consumed lazily, so `items` can be an endless generator.
+
+        Parameters
+        ----------
+        items : iterable
+            the file path, in-memory content, or a tuple of either and its meta data
+        max_workers : int, default 2
+            number of threads calculating file hashes
+
+        Returns
+        -------
+        record_num : int
+            number of written records
+
+        Raises
+        ------
+        ValueError
+            raises if the writer is already closed
+        Exception
+            raises if something went wrong on uploading request to server
+        """
+        record_num = 0
+        window = deque()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for item in items:
+                if isinstance(item, tuple):
+                    data, attributes = item
+                else:
+                    data, attributes = item, {}
+                window.append(executor.submit(self.__hash, data, attributes, None))
+                if len(window) >= max_workers * 4:
+                    self.__add(*window.popleft().result())
+                    record_num += 1
+            while window:
+                self.__add(*window.popleft().result())
+                record_num += 1
+        return record_num
+
+    def flush(self) -> None:
+        """
+        Upload all buffered records and wait for the acknowledgement.
+
+        Raises
+        ------
+        Exception
+            raises if something went wrong on uploading request to server
+        """
+        with self._lock:
+            self.__raise_error()
+            self.__flush_buffer()
+            while self._pending:
+                self._pending.popleft().result()
+
+    def close(self) -> None:
+        """
+        Flush buffered records, write the local datafile linker
+        and stop the background threads.
+
+        Raises
+        ------
+        Exception
+            raises if something went wrong on uploading request to server
+        """
+        if self.closed:
+            return
+        self._closed.set()
+        self._timer.join()
+        try:
+            self.flush()
+        finally:
+            self._executor.submit(self.__link).result()
+            self._executor.shutdown()
+
+    def __hash(
+        self,
+        data: Union[str, bytes],
+        attributes: dict,
+        file_path: Optional[str],
+    ) -> Tuple[dict, Optional[str]]:
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            hash_value = calc_bytes_hash(bytes(data))
+        else:
+            file_path = file_path or data
+            hash_value = calc_file_hash(file_path)
+
+        if file_path is not None:
+            file_path = (
+                os.path.abspath(file_path).replace(os.sep, "/").replace("/", os.sep)
+            )
+        record = {"FileHash": hash_value}
+        if not self.share_attributes:
+            record.update(self.attributes)
+        record.update(attributes)
+        return record, file_path
+
+    def __add(self, record: dict, file_path: Optional[str]) -> None:
+        serialized = json.dumps(record)
+        size = len(serialized) + len(PAYLOAD_SEP)
+        with self._lock:
+            if self.closed:
+                raise ValueError("I/O operation on closed writer.")
+            self.__raise_error()
+            if self._batch and (
+                len(self._batch) >= self.uploader.max_batch_records
+                or self._batch_size + size > self.uploader.batch_bytes
+            ):
+                self.__flush_buffer()
+            if not self._batch:
+                self._batch_time = time.time()
+            self._batch.append(serialized)
+            self._batch_size += size
+            if file_path is not None:
+                self._hash_dict[record["FileHash"]] = file_path
+            self.record_num += 1
+
+    def __flush_buffer(self) -> None:
+        # must be called with self._lock
+        if not self._batch:
+            return
+        # back pressure, wait for the oldest batch while too many are in flight
+        while len(self._pending) >= self.max_pending:
+            self._pending.popleft().result()
+
+        batch, hash_dict = self._batch, self._hash_dict
+        self._batch, self._hash_dict = [], {}
+        self._batch_size = 0
+        self._pending.append(self._executor.submit(self.__post, batch, hash_dict))
+
+    def __post(self, batch: list, hash_dict: dict) -> None:
+        # runs on the single background thread, so batches keep their order
+        self._linker_buffer.update(hash_dict)
+        if time.time() - self._linker_time >= self.linker_interval:
+            self.__link()
+        self.uploader.post_batch(batch)
+        invalidate_search_results(self.project_uid)
+
+    def __link(self) -> None:
+        if self._linker_buffer:
+            update_linker(self.project_uid, self._linker_buffer)
+            self._linker_buffer = {}
+        self._linker_time = time.time()
+
+    def __run_timer(self) -> None:
+        while not self._closed.wait(self.max_latency / 4):
+            with self._lock:
+                if not self._batch or self._error is not None:
+                    continue
+                if time.time() - self._batch_time < self.max_latency:
+                    continue
+                try:
+                    self.__flush_buffer()
+                except Exception as e:
+                    self._error = e
+
+    def __raise_error(self) -> None:
+        # must be called with self._lock
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+
+if __name__ == "__main__":
+    pass
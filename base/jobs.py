@@ -0,0 +1,553 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import threading
+import importlib.util
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+JOB_DIR = os.environ.get(
+    "BASE_JOB_DIR", os.path.join(os.path.expanduser("~"), ".base", "jobs")
+)
+# number of jobs run at once by the worker
+JOB_CONCURRENCY = int(os.environ.get("BASE_JOB_CONCURRENCY", "2"))
+# times a job is started, when its process was killed without finishing
+MAX_ATTEMPTS = 3
+# seconds the worker waits between checks of the queue
+POLL_INTERVAL = 1.0
+
+QUEUED = "Queued"
+RUNNING = "Running"
+SUCCEEDED = "Succeeded"
+FAILED = "Failed"
+CANCELED = "Canceled"
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELED)
+
+
+class JobQueue:
+    """
+    JobQueue class
+
+    Local persistent queue of `base` commands, like long-running imports.
+    Jobs are saved under ~/.base/jobs/{job_id}, and run by a worker process
+    which is detached from the terminal, so that they keep running after
+    the terminal is closed. The worker runs up to `concurrency` jobs at once,
+    one job per project at a time, each in its own process, and exits when
+    the queue is empty.
+
+    - job.json : command, status and timestamps of the job
+    - output.log : output of the command, including progress lines
+
+    A job whose process was killed, e.g. by shutdown of the machine, is
+    queued again when the worker starts. Imports are queued with `--resume`,
+    so that they continue from their checkpoint.
+
+    Attributes
+    ----------
+    job_dir : str
+        directory of the queue
+    """
+
+    def __init__(self, job_dir: Optional[str] = None) -> None:
+        """
+        Parameters
+        ----------
+        job_dir : str, default None
+            directory of the queue, use ~/.base/jobs if None,
+            can be set by "BASE_JOB_DIR" environment variable
+
+        Raises
+        ------
+        Exception
+            raises if the platform has no file locks of fcntl, like Windows
+        """
+        if importlib.util.find_spec("fcntl") is None:
+            raise Exception("base jobs are not supported on this platform")
+        self.job_dir = job_dir or JOB_DIR
+        self.worker_log = os.path.join(self.job_dir, "worker.log")
+
+    def submit(
+        self,
+        args: List[str],
+        cwd: Optional[str] = None,
+        env: Optional[dict] = None,
+        concurrency: Optional[int] = None,
+        start_worker: bool = True,
+    ) -> dict:
+        """
+        Add a command to the queue.
+
+        Parameters
+        ----------
+        args : list of str
+            arguments of `base` command, like ["import", "project", "-d", "data"]
+        cwd : str, default None
+            working directory of the command, use the current directory if None
+        env : dict, default None
+            environment variables of the command, use "BASE_*" variables
+            and HOME of this process if None
+        concurrency : int, default None
+            number of jobs run at once, used when the worker is started,
+            use JOB_CONCURRENCY if None
+        start_worker : bool, default True
+            if True, start the worker unless it is running
+
+        Returns
+        -------
+        job : dict
+            queued job
+            {
+                "JobId": String,
+                "Args": [String],
+                "ProjectName": String or None,
+                "Status": "Queued",
+                "CreatedAt": Float,
+                ...
+            }
+        """
+        if env is None:
+            # imported here, because it imports click
+            from base.daemon import _base_environ
+
+            env = _base_environ()
+
+        with self.__lock():
+            job_ids = [int(job["JobId"]) for job in self.__read_jobs()]
+            job = {
+                "JobId": str(max(job_ids, default=0) + 1),
+                "Args": list(args),
+                "ProjectName": args[1] if len(args) > 1 else None,
+                "Cwd": os.path.abspath(cwd or os.getcwd()),
+                "Env": env,
+                "Status": QUEUED,
+                "CreatedAt": time.time(),
+                "StartedAt": None,
+                "FinishedAt": None,
+                "ExitCode": None,
+                "Pid": None,
+                "Attempts": 0,
+                "CancelRequested": False,
+            }
+            self.__write_job(job)
+            # under the lock, so that the worker does not exit without this job
+            if start_worker and not self.is_worker_running():
+                self.start_worker(concurrency)
+        return self.__public(job)
+
+    def list_jobs(self) -> List[dict]:
+        """
+        Get all jobs in order of submission.
+
+        Returns
+        -------
+        jobs : list of dict
+            jobs in the queue, see `submit()`
+        """
+        with self.__lock():
+            jobs = self.__read_jobs()
+        return [self.__public(job) for job in jobs]
+
+    def get_job(self, job_id: str) -> dict:
+        """
+        Get the job.
+
+        Parameters
+        ----------
+        job_id : str
+            id of the job
+
+        Returns
+        -------
+        job : dict
+            the job, see `submit()`
+
+        Raises
+        ------
+        Exception
+            raises if the job does not exist
+        """
+        with self.__lock():
+            job = self.__read_job(job_id)
+        return self.__public(job)
+
+    def cancel(self, job_id: str) -> dict:
+        """
+        Cancel the job. A queued job is canceled at once, and a running job
+        is terminated, keeping its checkpoint.
+
+        Parameters
+        ----------
+        job_id : str
+            id of the job
+
+        Returns
+        -------
+        job : dict
+            the canceled job, see `submit()`
+
+        Raises
+        ------
+        Exception
+            raises if the job does not exist or already finished
+        """
+        with self.__lock():
+            job = self.__read_job(job_id)
+            if job["Status"] in FINISHED_STATUSES:
+                raise Exception(f"Job {job_id} already {job['Status'].lower()}")
+            job["CancelRequested"] = True
+            if job["Status"] == QUEUED:
+                job["Status"] = CANCELED
+                job["FinishedAt"] = time.time()
+            self.__write_job(job)
+        if job["Status"] == RUNNING and job["Pid"] is not None:
+            try:
+                # the job process leads its own process group
+                os.killpg(job["Pid"], signal.SIGTERM)
+            except OSError:
+                pass
+        return self.__public(job)
+
+    def get_log_path(self, job_id: str) -> str:
+        """
+        Get path of the output log of the job.
+
+        Parameters
+        ----------
+        job_id : str
+            id of the job
+
+        Returns
+        -------
+        log_path : str
+            path of output.log
+        """
+        return os.path.join(self.job_dir, str(job_id), "output.log")
+
+    def read_log(self, job_id: str, lines: Optional[int] = None) -> str:
+        """
+        Read output of the job.
+
+        Parameters
+        ----------
+        job_id : str
+            id of the job
+        lines : int, default None
+            number of lines from the end, read whole output if None
+
+        Returns
+        -------
+        log : str
+            output of the job, "" if the job has not started
+        """
+        try:
+            with open(self.get_log_path(job_id), "r", encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            return ""
+        if lines is None:
+            return text
+        return "".join(text.splitlines(keepends=True)[-lines:]) if lines else ""
+
+    def get_progress(self, job_id: str) -> Optional[str]:
+        """
+        Get the last progress line of the job, like
+        "stage=hashing count=5000 total=70000 bytes=... rate=.../s elapsed=...s eta=...s"
+
+        Parameters
+        ----------
+        job_id : str
+            id of the job
+
+        Returns
+        -------
+        progress : str or None
+            None if the job has not reported progress
+        """
+        for line in reversed(self.read_log(job_id).splitlines()):
+            if line.startswith("stage="):
+                return line
+        return None
+
+    def is_worker_running(self) -> bool:
+        """
+        Check whether the worker is running or not.
+
+        Returns
+        -------
+        running : bool
+            True if a worker holds the lock of the queue
+        """
+        import fcntl
+
+        os.makedirs(self.job_dir, exist_ok=True)
+        with open(os.path.join(self.job_dir, "worker.lock"), "a") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return True
+            fcntl.flock(f, fcntl.LOCK_UN)
+        return False
+
+    def start_worker(self, concurrency: Optional[int] = None) -> None:
+        """
+        Spawn the worker detached from the terminal.
+
+        Parameters
+        ----------
+        concurrency : int, default None
+            number of jobs run at once, use JOB_CONCURRENCY if None
+        """
+        import subprocess
+
+        command = [sys.executable, "-m", "base.jobs", "--job-dir", self.job_dir]
+        command += ["--concurrency", str(concurrency or JOB_CONCURRENCY)]
+        os.makedirs(self.job_dir, exist_ok=True)
+        with open(self.worker_log, "a") as log:
+            subprocess.Popen(
+                command,
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                start_new_session=True,
+            )
+
+    def run_worker(
+        self, concurrency: Optional[int] = None, poll_interval: float = POLL_INTERVAL
+    ) -> None:
+        """
+        Run queued jobs until the queue is empty. Nothing happens if another
+        worker is running.
+
+        Parameters
+        ----------
+        concurrency : int, default None
+            number of jobs run at once, use JOB_CONCURRENCY if None
+        poll_interval : float, default 1.0
+            seconds to wait between checks of the queue
+        """
+        import fcntl
+
+        concurrency = concurrency or JOB_CONCURRENCY
+        os.makedirs(self.job_dir, exist_ok=True)
+        worker_lock = open(os.path.join(self.job_dir, "worker.lock"), "a")
+        try:
+            fcntl.flock(worker_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            worker_lock.close()
+            return
+
+        processes = {}
+        try:
+            while True:
+                # reap finished processes, they write their status by themselves
+                for job_id, process in list(processes.items()):
+                    if process.poll() is not None:
+                        del processes[job_id]
+
+                with self.__lock():
+                    jobs = self.__read_jobs()
+                    running = self.__recover(jobs, processes)
+                    running_projects = {job["ProjectName"] for job in running}
+                    queued = [job for job in jobs if job["Status"] == QUEUED]
+                    for job in queued:
+                        if len(running) >= concurrency:
+                            break
+                        if job["ProjectName"] in running_projects:
+                            # imports of a project share its checkpoint
+                            continue
+                        processes[job["JobId"]] = self.__spawn(job)
+                        running.append(job)
+                        running_projects.add(job["ProjectName"])
+
+                    if not running and not queued:
+                        # released under the lock, so that `submit()` starts
+                        # a new worker if it adds a job after this
+                        fcntl.flock(worker_lock, fcntl.LOCK_UN)
+                        return
+                time.sleep(poll_interval)
+        finally:
+            worker_lock.close()
+
+    def run_job(self, job_id: str) -> int:
+        """
+        Run the command of the job in this process, and save its result.
+        This is called in the process spawned by the worker.
+
+        Parameters
+        ----------
+        job_id : str
+            id of the job
+
+        Returns
+        -------
+        exit_code : int
+            exit code of the command
+        """
+        from base.daemon import _run_cli
+
+        # `cancel()` terminates the job, let the command clean up and exit
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(143))
+        job = self.get_job(job_id)
+        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] base {' '.join(job['Args'])}")
+        sys.stdout.flush()
+        try:
+            exit_code = _run_cli(job["Args"])
+        finally:
+            # ignore another cancel while the result is saved
+            signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+        with self.__lock():
+            job = self.__read_job(job_id)
+            if job["CancelRequested"]:
+                job["Status"] = CANCELED
+            else:
+                job["Status"] = SUCCEEDED if exit_code == 0 else FAILED
+            job["ExitCode"] = exit_code
+            job["FinishedAt"] = time.time()
+            self.__write_job(job)
+        return exit_code
+
+    def __spawn(self, job: dict):
+        """
+        Start the process of the job, and mark it as running.
+        """
+        import subprocess
+
+        job["Status"] = RUNNING
+        job["Attempts"] += 1
+        job["StartedAt"] = job["StartedAt"] or time.time()
+        env = dict(os.environ)
+        env.update(job["Env"])
+        with open(self.get_log_path(job["JobId"]), "a") as log:
+            process = subprocess.Popen(
+                [sys.executable, "-m", "base.jobs", "--job-dir", self.job_dir]
+                + ["--run", job["JobId"]],
+                cwd=job["Cwd"] if os.path.isdir(job["Cwd"]) else None,
+                env=env,
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                start_new_session=True,
+            )
+        job["Pid"] = process.pid
+        self.__write_job(job)
+        return process
+
+    def __recover(self, jobs: List[dict], processes: dict) -> List[dict]:
+        """
+        Queue again the running jobs whose process is gone without saving
+        the result, and return the jobs which are still running.
+        """
+        running = []
+        for job in jobs:
+            if job["Status"] != RUNNING:
+                continue
+            if job["JobId"] in processes or _is_alive(job["Pid"]):
+                running.append(job)
+                continue
+            if job["CancelRequested"]:
+                job["Status"] = CANCELED
+                job["FinishedAt"] = time.time()
+            elif job["Attempts"] < MAX_ATTEMPTS:
+                job["Status"] = QUEUED
+            else:
+                job["Status"] = FAILED
+                job["FinishedAt"] = time.time()
+            job["Pid"] = None
+            self.__write_job(job)
+        return running
+
+    @contextmanager
+    def __lock(self) -> Iterator[None]:
+        """
+        Lock the queue among processes while reading and writing jobs.
+        """
+        import fcntl
+
+        os.makedirs(self.job_dir, exist_ok=True)
+        with open(os.path.join(self.job_dir, "queue.lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def __read_jobs(self) -> List[dict]:
+        jobs = []
+        for name in os.listdir(self.job_dir):
+            if name.isdigit():
+                try:
+                    jobs.append(self.__read_job(name))
+                except Exception:
+                    # the job directory is being created or removed
+                    continue
+        return sorted(jobs, key=lambda job: int(job["JobId"]))
+
+    def __read_job(self, job_id: str) -> dict:
+        try:
+            with open(
+                os.path.join(self.job_dir, str(job_id), "job.json"),
+                "r",
+                encoding="utf-8",
+            ) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            raise Exception(f"Job {job_id} not found")
+
+    def __write_job(self, job: dict) -> None:
+        job_path = os.path.join(self.job_dir, job["JobId"])
+        os.makedirs(job_path, exist_ok=True)
+        location = os.path.join(job_path, "job.json")
+        tmp_location = f"{location}.{os.getpid()}.{threading.get_ident()}.tmp"
+        # the environment can have the access key
+        fd = os.open(tmp_location, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(fd, "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        os.replace(tmp_location, location)
+
+    def __public(self, job: dict) -> dict:
+        return {key: value for key, value in job.items() if key != "Env"}
+
+
+def _is_alive(pid: Optional[int]) -> bool:
+    if pid is None:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Worker running queued base jobs")
+    parser.add_argument("--job-dir", default=JOB_DIR)
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--run", default=None, help="run the job in this process")
+    args = parser.parse_args()
+
+    queue = JobQueue(args.job_dir)
+    if args.run is not None:
+        sys.exit(queue.run_job(args.run))
+    print(f"Running base jobs worker (pid {os.getpid()})")
+    sys.stdout.flush()
+    queue.run_worker(concurrency=args.concurrency)
+
+
+if __name__ == "__main__":
+    # run main of `base.jobs` module, instead of this `__main__` module,
+    # so that the command shares the module state with base.cli
+    from base.jobs import main
+
+    main()
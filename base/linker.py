@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import os
+import json
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+from base.profiler import stage
+
+LINKER_DIR = os.path.join(os.path.expanduser("~"), ".base", "linker")
+
+_LOCK = threading.Lock()
+# loaded linkers kept with (mtime, size, inode) of the file, reloaded when it changes
+_CACHE = {}
+
+
+def get_linker_location(project_uid: str) -> str:
+    """
+    Get local datafile linker path of the project.
+
+    Parameters
+    ----------
+    project_uid : str
+        project unique hash
+
+    Returns
+    -------
+    linked_hash_location : str
+        path of linked_hash.json
+    """
+    return os.path.join(LINKER_DIR, project_uid, "linked_hash.json")
+
+
+def load_linker(project_uid: str) -> dict:
+    """
+    Load local datafile linker.
+    The linker is parsed once, and reused until the file is modified.
+
+    Parameters
+    ----------
+    project_uid : str
+        project unique hash
+
+    Returns
+    -------
+    hash_dict : dict
+        dict of file hash to local file path,
+        it is shared with other callers, so copy before modifying it
+
+    Raises
+    ------
+    FileNotFoundError
+        raises if the project has no local linker
+    """
+    linked_hash_location = get_linker_location(project_uid)
+    stat = os.stat(linked_hash_location)
+    version = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    cached = _CACHE.get(linked_hash_location)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    with stage("linker"):
+        hash_dict = _read_linker(linked_hash_location)
+    _CACHE[linked_hash_location] = (version, hash_dict)
+    return hash_dict
+
+
+def update_linker(project_uid: str, hash_dict: dict) -> None:
+    """
+    Merge new entries into local datafile linker.
+
+    Parameters
+    ----------
+    project_uid : str
+        project unique hash
+    hash_dict : dict
+        dict of file hash to local file path
+    """
+    linked_hash_location = get_linker_location(project_uid)
+    os.makedirs(os.path.dirname(linked_hash_location), exist_ok=True)
+
+    # the linker is written by other processes too, like the job worker and daemon
+    with _LOCK, _lock_file(f"{linked_hash_location}.lock"), stage("linker"):
+        if os.path.exists(linked_hash_location):
+            exist_hash_dict = _read_linker(linked_hash_location)
+            exist_hash_dict.update(hash_dict)
+        else:
+            exist_hash_dict = hash_dict
+
+        tmp_location = (
+            f"{linked_hash_location}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        with open(tmp_location, "w", encoding="utf-8") as f:
+            json.dump(exist_hash_dict, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_location, linked_hash_location)
+
+
+def _read_linker(linked_hash_location: str) -> dict:
+    with open(linked_hash_location, "r", encoding="utf-8") as f:
+        return json.loads(f.read())
+
+
+@contextmanager
+def _lock_file(lock_location: str) -> Iterator[None]:
+    """
+    Lock the file among processes while reading and writing the linker.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        # e.g. Windows, the linker is locked only among threads of this process
+        yield
+        return
+
+    with open(lock_location, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,848 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import io
+import csv
+import json
+import time
+import uuid
+import base64
+import random
+import sqlite3
+import hashlib
+import argparse
+import threading
+import urllib.parse
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List, Optional, Tuple
+
+from base.uploader import COMMON_KEY, expand_common_attributes
+
+# API payload limit of the real server
+MAX_PAYLOAD_BYTES = 6 * 1024 * 1024
+# user id returned for any access key when no keys are registered
+DEFAULT_USER_ID = "mock@adansons.co.jp"
+# number of responses kept for "Idempotency-Key" header
+IDEMPOTENCY_CACHE_SIZE = 1024
+# number of search results kept behind presigned urls
+MAX_OBJECTS = 64
+
+
+class MemoryStorage:
+    """
+    MemoryStorage class
+
+    Default storage backend of MockServer, keeps everything in dicts.
+    Any object with the same methods can be passed to MockServer
+    as a storage backend, like SQLiteStorage.
+
+    Projects are saved as dicts with "ProjectUid", "ProjectName",
+    "PrivateProject", "CreatedTime", "Archived", "Members" and "Keys".
+    Records are identified by "FileHash" in each project.
+    """
+
+    def __init__(self, max_objects: int = MAX_OBJECTS) -> None:
+        """
+        Parameters
+        ----------
+        max_objects : int, default 64
+            number of objects kept, the oldest one is dropped first
+        """
+        self.max_objects = max_objects
+        self._projects = {}
+        self._records = {}
+        self._objects = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put_project(self, project: dict) -> None:
+        """
+        Save a project dict, replacing the one of the same "ProjectUid".
+        """
+        with self._lock:
+            self._projects[project["ProjectUid"]] = json.loads(json.dumps(project))
+            self._records.setdefault(project["ProjectUid"], {})
+
+    def get_project(self, project_uid: str) -> Optional[dict]:
+        """
+        Get a copy of the project dict, None if not exists.
+        """
+        with self._lock:
+            project = self._projects.get(project_uid)
+            return json.loads(json.dumps(project)) if project else None
+
+    def list_projects(self) -> List[dict]:
+        """
+        Get copies of all project dicts.
+        """
+        with self._lock:
+            return json.loads(json.dumps(list(self._projects.values())))
+
+    def delete_project(self, project_uid: str) -> None:
+        """
+        Delete the project and its records.
+        """
+        with self._lock:
+            self._projects.pop(project_uid, None)
+            self._records.pop(project_uid, None)
+
+    def upsert_records(self, project_uid: str, records: List[dict]) -> None:
+        """
+        Add records, or update the saved ones of the same "FileHash".
+        """
+        with self._lock:
+            saved = self._records.setdefault(project_uid, {})
+            for record in records:
+                file_hash = record.get("FileHash") or uuid.uuid4().hex
+                saved.setdefault(file_hash, {}).update(record)
+
+    def iter_records(self, project_uid: str) -> Iterator[dict]:
+        """
+        Iterate over records of the project.
+        """
+        with self._lock:
+            records = list(self._records.get(project_uid, {}).values())
+        for record in records:
+            yield dict(record)
+
+    def count_records(self, project_uid: str) -> int:
+        """
+        Get number of records of the project.
+        """
+        with self._lock:
+            return len(self._records.get(project_uid, {}))
+
+    def put_object(self, key: str, body: bytes) -> None:
+        """
+        Save an object served behind a presigned url.
+        """
+        with self._lock:
+            self._objects[key] = body
+            while len(self._objects) > self.max_objects:
+                self._objects.popitem(last=False)
+
+    def get_object(self, key: str) -> Optional[bytes]:
+        """
+        Get the object body, None if not exists.
+        """
+        with self._lock:
+            return self._objects.get(key)
+
+
+class SQLiteStorage:
+    """
+    SQLiteStorage class
+
+    Storage backend of MockServer saved in a sqlite3 database,
+    for projects larger than memory or kept between runs.
+    It has the same methods as MemoryStorage.
+    """
+
+    def __init__(self, path: str = ":memory:") -> None:
+        """
+        Parameters
+        ----------
+        path : str, default ":memory:"
+            database file path
+        """
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS projects (uid TEXT PRIMARY KEY, body TEXT)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS records "
+                "(uid TEXT, file_hash TEXT, body TEXT, PRIMARY KEY (uid, file_hash))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS objects (key TEXT PRIMARY KEY, body BLOB)"
+            )
+
+    def put_project(self, project: dict) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO projects VALUES (?, ?)",
+                (project["ProjectUid"], json.dumps(project)),
+            )
+
+    def get_project(self, project_uid: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body FROM projects WHERE uid = ?", (project_uid,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list_projects(self) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT body FROM projects").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def delete_project(self, project_uid: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM projects WHERE uid = ?", (project_uid,))
+            self._conn.execute("DELETE FROM records WHERE uid = ?", (project_uid,))
+
+    def upsert_records(self, project_uid: str, records: List[dict]) -> None:
+        with self._lock, self._conn:
+            for record in records:
+                file_hash = record.get("FileHash") or uuid.uuid4().hex
+                row = self._conn.execute(
+                    "SELECT body FROM records WHERE uid = ? AND file_hash = ?",
+                    (project_uid, file_hash),
+                ).fetchone()
+                if row:
+                    record = {**json.loads(row[0]), **record}
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO records VALUES (?, ?, ?)",
+                    (project_uid, file_hash, json.dumps(record, ensure_ascii=False)),
+                )
+
+    def iter_records(self, project_uid: str) -> Iterator[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT body FROM records WHERE uid = ?", (project_uid,)
+            ).fetchall()
+        for row in rows:
+            yield json.loads(row[0])
+
+    def count_records(self, project_uid: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM records WHERE uid = ?", (project_uid,)
+            ).fetchone()
+        return row[0]
+
+    def put_object(self, key: str, body: bytes) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO objects VALUES (?, ?)", (key, body)
+            )
+
+    def get_object(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body FROM objects WHERE key = ?", (key,)
+            ).fetchone()
+        return bytes(row[0]) if row else None
+
+
+class MockServer:
+    """
+    MockServer class
+
+    Local stand-in of Base API for offline benchmarking and load testing.
+    It implements the endpoints used by this SDK (projects, records,
+    files search with presigned result urls, meta_file, tables/status
+    and members) on top of a pluggable storage backend.
+
+    Latency and failures can be injected to every request, so that
+    retries, batching and concurrency can be measured reproducibly.
+
+    Attributes
+    ----------
+    storage : MemoryStorage or SQLiteStorage
+        storage backend
+    url : str
+        endpoint url, set it to "BASE_API_ENDPOINT" environment variable
+    latency : float
+        seconds added to every request
+    jitter : float
+        maximum seconds randomly added to `latency`
+    failure_rate : float
+        probability to reject a request with `failure_status`
+    failure_status : int
+        status code of injected failures
+    max_payload_bytes : int
+        request body larger than this is rejected with 413
+    api_keys : dict
+        registered access keys and their user ids, any key is accepted if None
+    stats : dict
+        number of "Requests", "Failures", "ReceivedBytes" and "SentBytes"
+    """
+
+    def __init__(
+        self,
+        storage=None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        failure_status: int = 503,
+        max_payload_bytes: int = MAX_PAYLOAD_BYTES,
+        api_keys: Optional[dict] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        storage : MemoryStorage or SQLiteStorage, default None
+            storage backend, use MemoryStorage if None
+        host : str, default "127.0.0.1"
+            host to bind
+        port : int, default 0
+            port to bind, a free port is chosen if 0
+        latency : float, default 0.0
+            seconds added to every request
+        jitter : float, default 0.0
+            maximum seconds randomly added to `latency`
+        failure_rate : float, default 0.0
+            probability to reject a request with `failure_status`
+        failure_status : int, default 503
+            status code of injected failures
+        max_payload_bytes : int, default 6MB
+            request body larger than this is rejected with 413
+        api_keys : dict, default None
+            registered access keys and their user ids, any key is accepted if None
+        seed : int, default None
+            seed of injected jitter and failures
+        """
+        self.storage = storage or MemoryStorage()
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.max_payload_bytes = max_payload_bytes
+        self.api_keys = api_keys
+        self.stats = {"Requests": 0, "Failures": 0, "ReceivedBytes": 0, "SentBytes": 0}
+
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._responses = OrderedDict()
+        self._thread = None
+        self._httpd = ThreadingHTTPServer((host, port), _RequestHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.mock = self
+
+    def __enter__(self) -> "MockServer":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> None:
+        """
+        Start serving in a background thread.
+        """
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop serving and close the socket.
+        """
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def serve_forever(self) -> None:
+        """
+        Serve in the current thread until interrupted.
+        """
+        try:
+            self._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._httpd.server_close()
+
+    def handle(
+        self, method: str, path: str, headers: dict, body: bytes
+    ) -> Tuple[int, dict, bytes]:
+        """
+        Handle a request of Base API.
+
+        Parameters
+        ----------
+        method : str
+            http method
+        path : str
+            request path with query string
+        headers : dict
+            request headers
+        body : bytes
+            request body
+
+        Returns
+        -------
+        response : tuple
+            status code, response headers and response body
+        """
+        with self._lock:
+            self.stats["Requests"] += 1
+            self.stats["ReceivedBytes"] += len(body)
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            failed = self._random.random() < self.failure_rate
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            with self._lock:
+                self.stats["Failures"] += 1
+            return self.__respond(
+                self.failure_status, {"Message": "Injected failure"}, retry_after=True
+            )
+        if len(body) > self.max_payload_bytes:
+            return self.__respond(413, {"Message": "Request Entity Too Large"})
+
+        headers = {k.lower(): v for k, v in headers.items()}
+        idempotency_key = headers.get("idempotency-key")
+        if idempotency_key:
+            with self._lock:
+                if idempotency_key in self._responses:
+                    return self._responses[idempotency_key]
+
+        response = self.__route(method, path, headers, body)
+
+        status, response_headers, response_body = response
+        if idempotency_key and status == 200:
+            with self._lock:
+                self._responses[idempotency_key] = response
+                while len(self._responses) > IDEMPOTENCY_CACHE_SIZE:
+                    self._responses.popitem(last=False)
+        if method == "GET" and status == 200:
+            etag = '"' + hashlib.sha256(response_body).hexdigest()[:32] + '"'
+            response_headers["ETag"] = etag
+            if headers.get("if-none-match") == etag:
+                return 304, {"ETag": etag}, b""
+        return response
+
+    def __route(
+        self, method: str, path: str, headers: dict, body: bytes
+    ) -> Tuple[int, dict, bytes]:
+        split_url = urllib.parse.urlsplit(path)
+        segments = [
+            urllib.parse.unquote_plus(segment)
+            for segment in split_url.path.strip("/").split("/")
+        ]
+        query = dict(urllib.parse.parse_qsl(split_url.query))
+
+        if segments[0] == "objects" and len(segments) == 2 and method == "GET":
+            # presigned url, accessed without API access key
+            obj = self.storage.get_object(segments[1])
+            if obj is None:
+                return self.__respond(404, {"Message": "Not Found"})
+            return 200, {"Content-Type": "application/json"}, obj
+
+        if segments == ["user", "id"] and method == "GET":
+            api_key = self.__load(body).get("api_key")
+            if self.api_keys is None:
+                return self.__respond(200, {"user_id": DEFAULT_USER_ID})
+            if api_key not in self.api_keys:
+                return self.__respond(403, {"Message": "Forbidden"})
+            return self.__respond(200, {"user_id": self.api_keys[api_key]})
+
+        api_key = headers.get("x-api-key")
+        if not api_key or (self.api_keys is not None and api_key not in self.api_keys):
+            return self.__respond(403, {"Message": "Forbidden"})
+        user_id = query.get("user") or (
+            self.api_keys[api_key] if self.api_keys else DEFAULT_USER_ID
+        )
+
+        try:
+            payload = self.__load(body)
+        except ValueError:
+            return self.__respond(400, {"Message": "Invalid JSON"})
+
+        if segments == ["projects"]:
+            if method == "POST":
+                return self.__create_project(user_id, payload)
+            if method == "GET":
+                return self.__get_projects(user_id, query.get("archived") == "1")
+        elif segments[0] == "project" and len(segments) >= 2:
+            project = self.storage.get_project(segments[1])
+            if project is None or user_id not in project["Members"]:
+                return self.__respond(404, {"Message": "No such project"})
+            route = (method, *segments[2:3])
+            if route == ("DELETE",) and len(segments) == 2:
+                return self.__archive_project(project)
+            if route == ("DELETE", "confirm"):
+                self.storage.delete_project(project["ProjectUid"])
+                return self.__respond(200, {"ProjectUid": project["ProjectUid"]})
+            if route == ("POST",):
+                return self.__add_records(project, user_id, payload)
+            if route == ("PUT",):
+                return self.__estimate_join_rule(project, payload)
+            if route == ("GET",):
+                return self.__get_metadata_summary(project)
+            if route == ("GET", "files"):
+                return self.__search(project, segments[3:])
+            if route == ("PUT", "files"):
+                return self.__join(project, user_id, payload)
+            if route == ("POST", "meta_file"):
+                return self.__extract_metafile(payload)
+            if route == ("GET", "tables"):
+                if segments[3:] == ["status"]:
+                    return self.__respond(200, {"Status": "Available"})
+                if segments[3:] == ["status", "contents"]:
+                    return self.__respond(200, {"ContensStatus": "Available"})
+            if route[1:] == ("member",):
+                return self.__member(project, method, segments[3:], payload)
+        return self.__respond(404, {"Message": "Not Found"})
+
+    def __create_project(self, user_id: str, payload: dict) -> Tuple[int, dict, bytes]:
+        project_name = payload.get("ProjectName")
+        if not project_name:
+            return self.__respond(400, {"Message": "ProjectName is required"})
+        with self._lock:
+            for project in self.storage.list_projects():
+                if (
+                    project["ProjectName"] == project_name
+                    and user_id in project["Members"]
+                    and not project["Archived"]
+                ):
+                    return self.__respond(400, {"Message": "Project already exists"})
+            now = str(time.time())
+            project = {
+                "ProjectUid": uuid.uuid4().hex[:20],
+                "ProjectName": project_name,
+                "PrivateProject": str(int(payload.get("PrivateProject", 0))),
+                "CreatedTime": now,
+                "Archived": False,
+                "Members": {
+                    user_id: {
+                        "UserID": user_id,
+                        "UserRole": "Owner",
+                        "CreatedTime": now,
+                    }
+                },
+                "Keys": {},
+            }
+            self.storage.put_project(project)
+        return self.__respond(200, {"ProjectUid": project["ProjectUid"]})
+
+    def __get_projects(self, user_id: str, archived: bool) -> Tuple[int, dict, bytes]:
+        project_list = [
+            {
+                "ProjectName": project["ProjectName"],
+                "ProjectUid": project["ProjectUid"],
+                "UserRole": project["Members"][user_id]["UserRole"],
+                "PrivateProject": project["PrivateProject"],
+                "CreatedTime": project["CreatedTime"],
+            }
+            for project in self.storage.list_projects()
+            if user_id in project["Members"] and project["Archived"] == archived
+        ]
+        return self.__respond(200, {"Projects": project_list})
+
+    def __archive_project(self, project: dict) -> Tuple[int, dict, bytes]:
+        with self._lock:
+            project = self.storage.get_project(project["ProjectUid"])
+            if project["Archived"]:
+                return self.__respond(400, {"Message": "Already archived"})
+            project["Archived"] = True
+            self.storage.put_project(project)
+        return self.__respond(200, {"ProjectUid": project["ProjectUid"]})
+
+    def __add_records(
+        self, project: dict, user_id: str, payload: dict
+    ) -> Tuple[int, dict, bytes]:
+        if not isinstance(payload.get("Items"), list):
+            return self.__respond(400, {"Message": "Items is required"})
+        records = expand_common_attributes(payload)
+        with self._lock:
+            self.storage.upsert_records(project["ProjectUid"], records)
+            self.__update_keys(project["ProjectUid"], user_id, records)
+        return self.__respond(200, {"RecordedCount": len(records)})
+
+    def __update_keys(
+        self, project_uid: str, user_id: str, records: List[dict]
+    ) -> None:
+        # called with self._lock, reload the project to keep concurrent updates
+        project = self.storage.get_project(project_uid)
+        now = str(time.time())
+        for key_name in {key for record in records for key in record}:
+            if key_name == "FileHash":
+                continue
+            key = project["Keys"].setdefault(
+                key_name,
+                {"CreatedTime": now, "Creator": user_id, "EditorList": []},
+            )
+            key["LastModifiedTime"] = now
+            key["LastEditor"] = user_id
+            if user_id not in key["EditorList"]:
+                key["EditorList"].append(user_id)
+        self.storage.put_project(project)
+
+    def __get_metadata_summary(self, project: dict) -> Tuple[int, dict, bytes]:
+        values = {key_name: [] for key_name in project["Keys"]}
+        for record in self.storage.iter_records(project["ProjectUid"]):
+            for key_name, value in record.items():
+                if key_name in values:
+                    values[key_name].append(value)
+
+        key_list = []
+        for key_name, key in project["Keys"].items():
+            if not values[key_name]:
+                continue
+            unique_values = set(json.dumps(v) for v in values[key_name])
+            vtypes = set(type(v).__name__ for v in values[key_name])
+            vtype = next(
+                (t for t in ["str", "float", "int", "bool"] if t in vtypes), "None"
+            )
+            if vtype in ("int", "float"):
+                sorted_values = sorted(json.loads(v) for v in unique_values)
+            else:
+                sorted_values = sorted(str(json.loads(v)) for v in unique_values)
+            key_list.append(
+                {
+                    "KeyHash": hashlib.sha256(key_name.encode("utf-8")).hexdigest(),
+                    "KeyName": key_name,
+                    "ValueHash": hashlib.sha256(
+                        "".join(sorted(unique_values)).encode("utf-8")
+                    ).hexdigest(),
+                    "ValueType": vtype,
+                    "RecordedCount": len(values[key_name]),
+                    "UpperValue": str(sorted_values[-1]),
+                    "LowerValue": str(sorted_values[0]),
+                    **key,
+                }
+            )
+        return self.__respond(200, {"Items": key_list})
+
+    def __estimate_join_rule(
+        self, project: dict, payload: dict
+    ) -> Tuple[int, dict, bytes]:
+        table = payload.get("Items") or []
+        exist_values = {}
+        for record in self.storage.iter_records(project["ProjectUid"]):
+            for key_name, value in record.items():
+                exist_values.setdefault(key_name, set()).add(str(value))
+
+        new_keys = list(table[0]) if table else []
+        # keys of the same name are connected first
+        update_rule = {key: key if key in exist_values else None for key in new_keys}
+        unused_keys = set(exist_values) - set(update_rule.values()) - {"FileHash"}
+        for new_key in new_keys:
+            if update_rule[new_key] is not None:
+                continue
+            new_values = set(str(record.get(new_key)) for record in table)
+            # connect to the unused key which contains the most of new values
+            best_key, best_rate = None, 0.5
+            for exist_key in sorted(unused_keys):
+                rate = len(new_values & exist_values[exist_key]) / len(new_values)
+                if rate > best_rate:
+                    best_key, best_rate = exist_key, rate
+            if best_key is not None:
+                update_rule[new_key] = best_key
+                unused_keys.remove(best_key)
+        return self.__respond(200, {"UpdateRule": update_rule})
+
+    def __join(
+        self, project: dict, user_id: str, payload: dict
+    ) -> Tuple[int, dict, bytes]:
+        table = payload.get("Items") or []
+        update_rule = payload.get("UpdateRule") or {}
+        join_keys = {
+            new_key: exist_key
+            for new_key, exist_key in update_rule.items()
+            if exist_key and not exist_key.startswith("ADD:")
+        }
+        add_keys = {
+            new_key: (exist_key[4:] if exist_key else new_key)
+            for new_key, exist_key in update_rule.items()
+            if new_key not in join_keys
+        }
+        if not join_keys:
+            return self.__respond(400, {"Message": "No key to join"})
+
+        rows = {}
+        for row in table:
+            join_value = tuple(str(row.get(key)) for key in join_keys)
+            rows.setdefault(join_value, []).append(row)
+
+        updated = []
+        for record in self.storage.iter_records(project["ProjectUid"]):
+            join_value = tuple(str(record.get(key)) for key in join_keys.values())
+            for row in rows.get(join_value, []):
+                update = {"FileHash": record["FileHash"]}
+                for new_key, key_name in add_keys.items():
+                    if new_key in row:
+                        update[key_name] = row[new_key]
+                updated.append(update)
+        with self._lock:
+            self.storage.upsert_records(project["ProjectUid"], updated)
+            self.__update_keys(project["ProjectUid"], user_id, updated)
+        return self.__respond(200, {"UpdatedCount": len(updated)})
+
+    def __search(self, project: dict, conditions: List[str]) -> Tuple[int, dict, bytes]:
+        conditions = set(conditions)
+        items = []
+        for record in self.storage.iter_records(project["ProjectUid"]):
+            if conditions and not any(str(v) in conditions for v in record.values()):
+                continue
+            items.append(record)
+        return self.__presign({"Items": items})
+
+    def __extract_metafile(self, payload: dict) -> Tuple[int, dict, bytes]:
+        try:
+            data = base64.b64decode(payload["Items"])
+        except (KeyError, ValueError):
+            return self.__respond(400, {"Message": "Items is required"})
+        common = payload.get(COMMON_KEY) or {}
+
+        if payload.get("is_csv"):
+            reader = csv.DictReader(io.StringIO(data.decode("utf-8-sig")))
+            tables = [[self.__parse_row(row) for row in reader]]
+        else:
+            try:
+                import pandas as pd
+
+                sheets = pd.read_excel(io.BytesIO(data), sheet_name=None)
+            except ImportError:
+                return self.__respond(
+                    500, {"Message": "openpyxl is required to parse xlsx file"}
+                )
+            tables = [
+                json.loads(sheet.to_json(orient="records")) for sheet in sheets.values()
+            ]
+        tables = [[{**common, **row} for row in table] for table in tables if table]
+        return self.__presign({"Items": tables})
+
+    def __parse_row(self, row: dict) -> dict:
+        parsed = {}
+        for key, value in row.items():
+            for parse in (int, float):
+                try:
+                    value = parse(value)
+                    break
+                except ValueError:
+                    pass
+            parsed[key] = value
+        return parsed
+
+    def __member(
+        self, project: dict, method: str, segments: List[str], payload: dict
+    ) -> Tuple[int, dict, bytes]:
+        if method == "GET" and not segments:
+            return self.__respond(200, {"Members": list(project["Members"].values())})
+        with self._lock:
+            project = self.storage.get_project(project["ProjectUid"])
+            members = project["Members"]
+            if method == "POST" and not segments:
+                member = payload.get("TargetUserID")
+                if not member or member in members:
+                    return self.__respond(400, {"Message": "Invalid member"})
+                members[member] = {
+                    "UserID": member,
+                    "UserRole": payload.get("NewUserRole"),
+                    "CreatedTime": str(time.time()),
+                }
+            elif len(segments) == 1 and segments[0] in members:
+                if method == "PUT":
+                    members[segments[0]]["UserRole"] = payload.get("NewUserRole")
+                elif method == "DELETE":
+                    del members[segments[0]]
+                else:
+                    return self.__respond(404, {"Message": "Not Found"})
+            else:
+                return self.__respond(404, {"Message": "No such member"})
+            self.storage.put_project(project)
+        return self.__respond(200, {"Members": list(members.values())})
+
+    def __presign(self, obj) -> Tuple[int, dict, bytes]:
+        key = uuid.uuid4().hex
+        self.storage.put_object(
+            key, json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        )
+        return self.__respond(200, {"URL": f"{self.url}/objects/{key}"})
+
+    def __load(self, body: bytes) -> dict:
+        if not body:
+            return {}
+        return json.loads(body.decode("utf-8"))
+
+    def __respond(
+        self, status: int, obj: dict, retry_after: bool = False
+    ) -> Tuple[int, dict, bytes]:
+        headers = {"Content-Type": "application/json"}
+        if retry_after:
+            headers["Retry-After"] = "0"
+        return status, headers, json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    # keep-alive, so that pooled connections of APIClient are reused
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        self.__handle("GET")
+
+    def do_POST(self) -> None:
+        self.__handle("POST")
+
+    def do_PUT(self) -> None:
+        self.__handle("PUT")
+
+    def do_DELETE(self) -> None:
+        self.__handle("DELETE")
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def __handle(self, method: str) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        mock = self.server.mock
+        try:
+            status, headers, response_body = mock.handle(
+                method, self.path, dict(self.headers), body
+            )
+        except Exception as e:
+            status, headers = 500, {"Content-Type": "application/json"}
+            response_body = json.dumps({"Message": str(e)}).encode("utf-8")
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(response_body)))
+        self.end_headers()
+        if method != "HEAD":
+            self.wfile.write(response_body)
+        with mock._lock:
+            mock.stats["SentBytes"] += len(response_body)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local mock server of Base API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--failure-status", type=int, default=503)
+    parser.add_argument("--max-payload-bytes", type=int, default=MAX_PAYLOAD_BYTES)
+    parser.add_argument(
+        "--sqlite", default=None, help="database path, keep data in memory if omitted"
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    storage = SQLiteStorage(args.sqlite) if args.sqlite else MemoryStorage()
+    server = MockServer(
+        storage=storage,
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        failure_rate=args.failure_rate,
+        failure_status=args.failure_status,
+        max_payload_bytes=args.max_payload_bytes,
+        seed=args.seed,
+    )
+    print(f"Serving Base API mock on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,8 @@
 import re
 from typing import List, Optional
 
+from base.profiler import stage
+
 
 class Parser:
     """
@@ -110,6 +112,10 @@ class Parser:
         >>> parser = Parser("your parsing rule")
         >>> result = parser("your target path for parse")
         """
+        with stage("parse"):
+            return self.__parse(path)
+
+    def __parse(self, path: str) -> dict:
         if path.startswith(self.sep):
             path = (self.sep).join(path.split(self.sep)[1:])
 
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Iterator, List, Optional
+
+# profiler enabled by `profile()` or `start_profile()`, None while disabled
+_PROFILER = None
+# returned by `stage()` while disabled, so that stages cost almost nothing
+_NULL_STAGE = nullcontext()
+
+
+class Profiler:
+    """
+    Profiler class
+
+    Collect wall time and CPU time of named stages, like "hash" or "http".
+    Stages can be nested, and times of the outer stage include the inner ones.
+    CPU time is of the thread which runs the stage, so stages run by worker
+    threads (e.g. "hash") are measured where they run.
+
+    Attributes
+    ----------
+    stages : dict
+        dict of stage name to {"Calls": int, "WallTime": float, "CPUTime": float}
+    output_path : str or None
+        path to dump cProfile stats of the main thread
+    """
+
+    def __init__(self, output_path: Optional[str] = None) -> None:
+        """
+        Parameters
+        ----------
+        output_path : str, default None
+            path to dump cProfile stats, cProfile is not used if None
+        """
+        self.stages = {}
+        self.output_path = output_path
+
+        self._lock = threading.Lock()
+        self._cprofile = None
+        self._start_time = None
+        self._end_time = None
+
+    def start(self) -> None:
+        """
+        Start measuring the total time, and cProfile if `output_path` is given.
+        """
+        self._start_time = time.perf_counter()
+        self._end_time = None
+        if self.output_path is not None:
+            # imported here, because it is needed only with output_path
+            import cProfile
+
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def stop(self) -> None:
+        """
+        Stop measuring, and dump cProfile stats to `output_path`.
+        """
+        self._end_time = time.perf_counter()
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.output_path)
+            self._cprofile = None
+
+    def stage(self, name: str) -> "_StageTimer":
+        """
+        Measure the stage in `with` block.
+
+        Parameters
+        ----------
+        name : str
+            stage name
+
+        Returns
+        -------
+        timer : context manager
+            adds times of the block to the stage on exit
+        """
+        return _StageTimer(self, name)
+
+    def add(self, name: str, wall_time: float, cpu_time: float) -> None:
+        """
+        Add times of one call to the stage.
+        This method is safe to call from worker threads.
+
+        Parameters
+        ----------
+        name : str
+            stage name
+        wall_time : float
+            elapsed seconds
+        cpu_time : float
+            CPU seconds of the thread
+        """
+        with self._lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = {"Calls": 0, "WallTime": 0.0, "CPUTime": 0.0}
+                self.stages[name] = stage
+            stage["Calls"] += 1
+            stage["WallTime"] += wall_time
+            stage["CPUTime"] += cpu_time
+
+    @property
+    def total_time(self) -> float:
+        """
+        Seconds from `start()` to `stop()`, or to now if it is running.
+        """
+        if self._start_time is None:
+            return 0.0
+        return (self._end_time or time.perf_counter()) - self._start_time
+
+    def summary(self) -> List[dict]:
+        """
+        Get times of the stages.
+
+        Returns
+        -------
+        summary : list of dict
+            stages in descending order of wall time
+            [
+                {
+                    "Stage": String,
+                    "Calls": Integer,
+                    "WallTime": Float (seconds),
+                    "CPUTime": Float (seconds)
+                },
+                ...
+            ]
+        """
+        with self._lock:
+            summary = [{"Stage": name, **stage} for name, stage in self.stages.items()]
+        return sorted(summary, key=lambda stage: stage["WallTime"], reverse=True)
+
+    def format_summary(self) -> str:
+        """
+        Format times of the stages as a table.
+
+        Returns
+        -------
+        text : str
+            ex.)
+            stage        calls     wall(s)      cpu(s)
+            hash          5000      12.503       3.201
+            http            14       2.750       0.105
+            total                   10.112
+        """
+        width = max([len(stage) for stage in self.stages] + [len("total")]) + 2
+        lines = [f"{'stage':<{width}}{'calls':>8}{'wall(s)':>12}{'cpu(s)':>12}"]
+        for stage in self.summary():
+            lines.append(
+                f"{stage['Stage']:<{width}}{stage['Calls']:>8}"
+                f"{stage['WallTime']:>12.3f}{stage['CPUTime']:>12.3f}"
+            )
+        lines.append(f"{'total':<{width}}{'':>8}{self.total_time:>12.3f}")
+        if self.output_path is not None:
+            lines.append(f"cProfile stats: {self.output_path}")
+        return "\n".join(lines)
+
+
+class _StageTimer:
+    def __init__(self, profiler: Profiler, name: str) -> None:
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self) -> "_StageTimer":
+        self._wall_time = time.perf_counter()
+        self._cpu_time = time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.profiler.add(
+            self.name,
+            time.perf_counter() - self._wall_time,
+            time.thread_time() - self._cpu_time,
+        )
+
+
+def stage(name: str):
+    """
+    Measure the stage in `with` block, if the profiler is enabled.
+
+    Parameters
+    ----------
+    name : str
+        stage name
+
+    Returns
+    -------
+    timer : context manager
+        it does nothing while the profiler is disabled
+
+    Example
+    -------
+    >>> from base.profiler import stage
+    >>> with stage("hash"):
+    ...     digest = calc_file_hash(path)
+    """
+    profiler = _PROFILER
+    if profiler is None:
+        return _NULL_STAGE
+    return profiler.stage(name)
+
+
+def start_profile(output_path: Optional[str] = None) -> Profiler:
+    """
+    Enable the profiler in this process.
+
+    Parameters
+    ----------
+    output_path : str, default None
+        path to dump cProfile stats, cProfile is not used if None
+
+    Returns
+    -------
+    profiler : Profiler
+        enabled profiler
+    """
+    global _PROFILER
+    profiler = Profiler(output_path)
+    profiler.start()
+    _PROFILER = profiler
+    return profiler
+
+
+def stop_profile() -> Optional[Profiler]:
+    """
+    Disable the profiler in this process.
+
+    Returns
+    -------
+    profiler : Profiler or None
+        disabled profiler, None if it was not enabled
+    """
+    global _PROFILER
+    profiler = _PROFILER
+    _PROFILER = None
+    if profiler is not None:
+        profiler.stop()
+    return profiler
+
+
+@contextmanager
+def profile(output_path: Optional[str] = None) -> Iterator[Profiler]:
+    """
+    Profile stages of Project, Files, Parser and hash in `with` block.
+
+    Parameters
+    ----------
+    output_path : str, default None
+        path to dump cProfile stats of the main thread, cProfile is not used if None
+
+    Yields
+    ------
+    profiler : Profiler
+        profiler collecting times of the stages
+
+    Example
+    -------
+    >>> import base
+    >>> with base.profile() as profiler:
+    ...     project = base.Project("mnist")
+    ...     files = project.files(conditions="1")
+    >>> print(profiler.format_summary())
+    """
+    profiler = start_profile(output_path)
+    try:
+        yield profiler
+    finally:
+        stop_profile()
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,464 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import os
+import sys
+import time
+import threading
+from typing import Callable, Optional, TextIO
+
+# weight of the latest rate on exponential smoothing
+SMOOTHING = 0.3
+# minimum seconds between rate samples and callbacks
+SAMPLE_INTERVAL = 0.5
+
+# how ProgressDisplay shows progress, "auto" shows bars on terminals
+# and log lines otherwise, "bar", "log" or "off" can be set with "BASE_PROGRESS"
+PROGRESS_MODES = ("auto", "bar", "log", "off")
+PROGRESS_MODE = os.environ.get("BASE_PROGRESS", "auto").lower()
+# minimum seconds between log lines of a stage
+LOG_INTERVAL = 10.0
+# number of characters of a bar
+BAR_WIDTH = 20
+
+
+class StageProgress:
+    """
+    StageProgress class
+
+    Measure throughput of one stage (e.g. hashing, uploading),
+    and estimate remaining time with exponentially smoothed rate.
+
+    Attributes
+    ----------
+    stage : str
+        stage name
+    total : int
+        total number of items, 0 if unknown
+    total_bytes : int
+        total bytes of items, 0 if unknown
+    count : int
+        number of processed items
+    nbytes : int
+        processed bytes
+    """
+
+    def __init__(
+        self,
+        stage: str,
+        total: int = 0,
+        total_bytes: int = 0,
+        callback: Optional[Callable[[dict], None]] = None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        stage : str
+            stage name
+        total : int, default 0
+            total number of items, 0 if unknown
+        total_bytes : int, default 0
+            total bytes of items, 0 if unknown
+        callback : function, default None
+            called with `snapshot()` at most every 0.5 seconds and on finish
+        """
+        self.stage = stage
+        self.total = total
+        self.total_bytes = total_bytes
+        self.callback = callback
+
+        # each thread adds to its own counter, they are summed when read
+        self._local = threading.local()
+        self._counters = []
+        self._lock = threading.Lock()
+        self._start_time = time.time()
+        self._end_time = None
+        self._sample_time = self._start_time
+        self._sample_count = 0
+        self._sample_bytes = 0
+        self._rate = None
+        self._byte_rate = None
+
+    def update(self, count: int = 1, nbytes: int = 0) -> None:
+        """
+        Add processed items. This method is safe to call from worker threads,
+        and takes no lock except once per thread and once per sample.
+        Counts of worker processes can be added from the parent process,
+        e.g. in callbacks of their futures.
+
+        Parameters
+        ----------
+        count : int, default 1
+            number of processed items
+        nbytes : int, default 0
+            processed bytes
+        """
+        counter = getattr(self._local, "counter", None)
+        if counter is None:
+            counter = self._local.counter = [0, 0]
+            with self._lock:
+                self._counters.append(counter)
+        counter[0] += count
+        counter[1] += nbytes
+
+        now = time.time()
+        if now - self._sample_time < SAMPLE_INTERVAL:
+            return
+        # another thread is sampling
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if now - self._sample_time < SAMPLE_INTERVAL:
+                return
+            self._sample(now)
+        finally:
+            self._lock.release()
+        if self.callback is not None:
+            self.callback(self.snapshot())
+
+    def finish(self) -> None:
+        """
+        Mark the stage as finished.
+        """
+        with self._lock:
+            self._end_time = time.time()
+        if self.callback is not None:
+            self.callback(self.snapshot())
+
+    def _sample(self, now: float) -> None:
+        count, nbytes = self.count, self.nbytes
+        interval = now - self._sample_time
+        rate = (count - self._sample_count) / interval
+        byte_rate = (nbytes - self._sample_bytes) / interval
+        if self._rate is None:
+            self._rate, self._byte_rate = rate, byte_rate
+        else:
+            self._rate = SMOOTHING * rate + (1 - SMOOTHING) * self._rate
+            self._byte_rate = SMOOTHING * byte_rate + (1 - SMOOTHING) * self._byte_rate
+        self._sample_time = now
+        self._sample_count = count
+        self._sample_bytes = nbytes
+
+    @property
+    def count(self) -> int:
+        """
+        Number of processed items.
+        """
+        return sum([counter[0] for counter in list(self._counters)])
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Processed bytes.
+        """
+        return sum([counter[1] for counter in list(self._counters)])
+
+    @property
+    def elapsed(self) -> float:
+        """
+        Seconds from the start of the stage.
+        """
+        return (self._end_time or time.time()) - self._start_time
+
+    @property
+    def rate(self) -> float:
+        """
+        Smoothed items per second.
+        """
+        if self._rate is None or self._end_time is not None:
+            return self.count / max(self.elapsed, 1e-6)
+        return self._rate
+
+    @property
+    def byte_rate(self) -> float:
+        """
+        Smoothed bytes per second.
+        """
+        if self._byte_rate is None or self._end_time is not None:
+            return self.nbytes / max(self.elapsed, 1e-6)
+        return self._byte_rate
+
+    @property
+    def eta(self) -> Optional[float]:
+        """
+        Estimated seconds to finish the stage, None if unknown.
+        """
+        if self._end_time is not None:
+            return 0.0
+        if self.total and self.rate > 0:
+            return max(self.total - self.count, 0) / self.rate
+        if self.total_bytes and self.byte_rate > 0:
+            return max(self.total_bytes - self.nbytes, 0) / self.byte_rate
+        return None
+
+    def snapshot(self) -> dict:
+        """
+        Get current progress.
+
+        Returns
+        -------
+        progress : dict
+            {
+                "Stage": String,
+                "Count": Integer,
+                "Total": Integer,
+                "Bytes": Integer,
+                "TotalBytes": Integer,
+                "Rate": Float (items per second),
+                "ByteRate": Float (bytes per second),
+                "Elapsed": Float (seconds),
+                "ETA": Float (seconds) or None,
+                "Finished": Bool
+            }
+        """
+        return {
+            "Stage": self.stage,
+            "Count": self.count,
+            "Total": self.total,
+            "Bytes": self.nbytes,
+            "TotalBytes": self.total_bytes,
+            "Rate": self.rate,
+            "ByteRate": self.byte_rate,
+            "Elapsed": self.elapsed,
+            "ETA": self.eta,
+            "Finished": self._end_time is not None,
+        }
+
+
+def format_progress(progress: dict, unit: str = "items") -> str:
+    """
+    Format progress for printing.
+
+    Parameters
+    ----------
+    progress : dict
+        output of StageProgress.snapshot()
+    unit : str, default "items"
+        unit name of items
+
+    Returns
+    -------
+    text : str
+        ex.) "1200/5000 files, 240.0 files/s, 35.2 MB/s, estimated time: 0m 15s"
+    """
+    text = f"{progress['Count']}"
+    if progress["Total"]:
+        text += f"/{progress['Total']}"
+    text += f" {unit}, {progress['Rate']:.1f} {unit}/s"
+    text += f", {progress['ByteRate'] / 1024 / 1024:.1f} MB/s"
+    if progress["ETA"] is not None:
+        minute, second = divmod(int(progress["ETA"]), 60)
+        text += f", estimated time: {minute}m {second}s"
+    return text
+
+
+def format_bar(progress: dict) -> str:
+    """
+    Format the ratio of processed items as a bar.
+
+    Parameters
+    ----------
+    progress : dict
+        output of StageProgress.snapshot()
+
+    Returns
+    -------
+    text : str
+        ex.) "[########------------]  40%", or "" if the total is unknown
+    """
+    if progress["Total"]:
+        ratio = progress["Count"] / progress["Total"]
+    elif progress["TotalBytes"]:
+        ratio = progress["Bytes"] / progress["TotalBytes"]
+    else:
+        return ""
+    ratio = min(max(ratio, 0.0), 1.0)
+    filled = int(BAR_WIDTH * ratio)
+    return f"[{'#' * filled}{'-' * (BAR_WIDTH - filled)}] {ratio * 100:3.0f}%"
+
+
+def format_log(progress: dict) -> str:
+    """
+    Format progress as a line of key=value pairs, for logs of CI or files.
+
+    Parameters
+    ----------
+    progress : dict
+        output of StageProgress.snapshot()
+
+    Returns
+    -------
+    text : str
+        ex.) "stage=hashing count=1200 total=5000 rate=240.0/s elapsed=5.0s eta=75s"
+    """
+    text = f"stage={progress['Stage']} count={progress['Count']}"
+    if progress["Total"]:
+        text += f" total={progress['Total']}"
+    if progress["Bytes"]:
+        text += f" bytes={progress['Bytes']}"
+    text += f" rate={progress['Rate']:.1f}/s elapsed={progress['Elapsed']:.1f}s"
+    if progress["ETA"] is not None:
+        text += f" eta={progress['ETA']:.0f}s"
+    return text
+
+
+def set_progress_mode(mode: str) -> None:
+    """
+    Set how ProgressDisplay shows progress in this process,
+    e.g. set "off" to silence progress of `Project` in applications.
+
+    Parameters
+    ----------
+    mode : {"auto", "bar", "log", "off"}
+        "auto" shows bars on terminals and log lines otherwise
+
+    Raises
+    ------
+    ValueError
+        raises if the mode is not supported
+    """
+    global PROGRESS_MODE
+    if mode not in PROGRESS_MODES:
+        raise ValueError(
+            f"Progress mode: {mode} is not supported. "
+            f"Select from {', '.join(PROGRESS_MODES)}."
+        )
+    PROGRESS_MODE = mode
+
+
+class ProgressDisplay:
+    """
+    ProgressDisplay class
+
+    Show the text of an operation, and progress of its stage.
+    On terminals the line is redrawn with a bar, rate and estimated time,
+    otherwise key=value lines are written at most every 10 seconds.
+    It draws only when the progress is updated, without threads.
+
+    Attributes
+    ----------
+    text : str
+        text to be displayed while the operation is running
+    etext : str
+        text to be displayed when the operation is finished
+    unit : str
+        unit name of items
+    overwrite : bool
+        whether `etext` overwrites `text` or not
+    """
+
+    def __init__(
+        self,
+        text: str = "Please wait...",
+        etext: str = "",
+        unit: str = "items",
+        overwrite: bool = True,
+        stream: Optional[TextIO] = None,
+        mode: Optional[str] = None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        text : str, default "Please wait..."
+            text to be displayed while the operation is running
+        etext : str, default ""
+            text to be displayed when the operation is finished
+        unit : str, default "items"
+            unit name of items
+        overwrite : bool, default True
+            whether `etext` overwrites `text` or not
+        stream : file object, default None
+            stream to write, use sys.stdout at the time if None
+        mode : {"auto", "bar", "log", "off"}, default None
+            use `PROGRESS_MODE` if None, which can be set with `set_progress_mode()`
+        """
+        self.text = text
+        self.etext = etext
+        self.unit = unit
+        self.overwrite = overwrite
+        self.stream = stream
+        self.mode = mode
+
+        self._lock = threading.Lock()
+        self._active = False
+        self._logged_at = 0.0
+
+    def start(self) -> None:
+        """
+        Show `text`.
+        """
+        stream = self.stream or sys.stdout
+        mode = self.mode or PROGRESS_MODE
+        if mode == "auto":
+            isatty = getattr(stream, "isatty", None)
+            mode = "bar" if isatty is not None and isatty() else "log"
+        self._mode = mode
+        self._stream = stream
+        self._active = mode != "off"
+        self._logged_at = time.time()
+        if self._mode == "bar":
+            self.__write(f"\r\033[2K{self.text}")
+        elif self._mode == "log":
+            self.__write(f"{self.text}\n")
+
+    def update(self, progress: dict) -> None:
+        """
+        Show the progress. This method can be a callback of StageProgress.
+
+        Parameters
+        ----------
+        progress : dict
+            output of StageProgress.snapshot()
+        """
+        if not self._active:
+            return
+        if self._mode == "bar":
+            text = f"{self.text} {format_bar(progress)} "
+            text += format_progress(progress, self.unit)
+            self.__write(f"\r\033[2K{text}")
+        elif progress["Finished"] or time.time() - self._logged_at >= LOG_INTERVAL:
+            self._logged_at = time.time()
+            self.__write(format_log(progress) + "\n")
+
+    def stop(self, etext: Optional[str] = None, failed: bool = False) -> None:
+        """
+        Finish the line, and show `etext`.
+
+        Parameters
+        ----------
+        etext : str, default None
+            text to be displayed, use `etext` attribute if None
+        failed : bool, default False
+            if True, keep the last line and show nothing
+        """
+        if not self._active:
+            return
+        etext = self.etext if etext is None else etext
+        if self._mode == "bar":
+            if failed or not self.overwrite:
+                text = "\n"
+            else:
+                text = "\r\033[2K"
+            if etext and not failed:
+                text += f"{etext}\n"
+            self.__write(text)
+        elif etext and not failed:
+            self.__write(f"{etext}\n")
+        self._active = False
+
+    def __write(self, text: str) -> None:
+        with self._lock:
+            self._stream.write(text)
+            self._stream.flush()
+
+    def __enter__(self) -> "ProgressDisplay":
+        self.start()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback) -> None:
+        self.stop(failed=exception_type is not None)
+
+
+if __name__ == "__main__":
+    pass
@@ -4,40 +4,47 @@
 # Please contact engineer@adansons.co.jp
 import os
 import json
-import ruamel.yaml
 import glob
-import math
 import base64
-import requests
-from typing import Optional, List, Union
+from typing import Callable, Iterable, Optional, List, Tuple, Union
 import time
+import threading
 from concurrent.futures import ThreadPoolExecutor
-import pandas as pd
+from contextlib import ExitStack
 from colorama import Fore, init
 
-from base.files import Files
-from base.spinner import Spinner
+from base.files import Files, invalidate_search_results
 from base.parser import Parser
 from base.hash import calc_file_hash
+from base.linker import load_linker, update_linker
+from base.ingest import IngestWriter
+from base.client import APIClient, get_client
+from base.uploader import BatchUploader, get_batch_id
+from base.checkpoint import ImportCheckpoint
+from base.progress import ProgressDisplay, StageProgress
+from base.profiler import stage
 from base.config import (
     get_user_id,
-    get_access_key,
     get_project_uid,
     check_project_exists,
     register_project_uid,
     delete_project_config,
+    update_project_info,
     BASE_API_ENDPOINT,
 )
 
 # colorama settings
 init(autoreset=True)
 
-HEADER = {"Content-Type": "application/json"}
 CONFIG_FILE = os.path.join(os.path.expanduser("~"), ".base", "projects")
-LINKER_DIR = os.path.join(os.path.expanduser("~"), ".base", "linker")
 
 
-def create_project(user_id: str, project_name: str, private: bool = True) -> str:
+def create_project(
+    user_id: str,
+    project_name: str,
+    private: bool = True,
+    client: Optional[APIClient] = None,
+) -> str:
     """
     Create new project.
 
@@ -49,6 +56,8 @@ def create_project(user_id: str, project_name: str, private: bool = True) -> str
         project name wich you want to create
     private : bool, default True
         whether to publish the project or not
+    client : APIClient, default None
+        client to request with its credentials, use the shared client if None
 
     Returns
     -------
@@ -64,12 +73,10 @@ def create_project(user_id: str, project_name: str, private: bool = True) -> str
         raise ValueError(f"Project {project_name} is already exists.")
 
     project_info = {"ProjectName": project_name, "PrivateProject": int(private)}
-    access_key = get_access_key()
-    HEADER.update({"x-api-key": access_key})
-    res = requests.post(
+    res = (client or get_client()).request(
+        "POST",
         f"{BASE_API_ENDPOINT}/projects?user={user_id}",
-        json.dumps(project_info),
-        headers=HEADER,
+        data=json.dumps(project_info),
     )
     if res.status_code == 200:
         project_uid = res.json()["ProjectUid"]
@@ -79,7 +86,9 @@ def create_project(user_id: str, project_name: str, private: bool = True) -> str
         raise Exception(f"{res.status_code} : Something went wrong")
 
 
-def get_projects(user_id: str, archived: bool = False) -> List[dict]:
+def get_projects(
+    user_id: str, archived: bool = False, client: Optional[APIClient] = None
+) -> List[dict]:
     """
     Get list of projects.
 
@@ -89,6 +98,8 @@ def get_projects(user_id: str, archived: bool = False) -> List[dict]:
         registerd user id
     private : bool, default True
         whether to publish the project or not
+    client : APIClient, default None
+        client to request with its credentials, use the shared client if None
 
     Returns
     -------
@@ -100,12 +111,10 @@ def get_projects(user_id: str, archived: bool = False) -> List[dict]:
     Exception
         raises if something went wrong on request to server
     """
-    access_key = get_access_key()
-    HEADER.update({"x-api-key": access_key})
     url = f"{BASE_API_ENDPOINT}/projects?user={user_id}"
     if archived:
         url += "&archived=1"
-    res = requests.get(url, headers=HEADER)
+    res = (client or get_client()).request("GET", url, cache=True)
     if res.status_code == 200:
         project_list = res.json()["Projects"]
         return project_list
@@ -129,11 +138,9 @@ def archive_project(user_id: str, project_name: str):
     Exception
         raises if something went wrong on request to server
     """
-    access_key = get_access_key()
-    HEADER.update({"x-api-key": access_key})
     project_uid = get_project_uid(user_id, project_name)
     url = f"{BASE_API_ENDPOINT}/project/{project_uid}?user={user_id}"
-    res = requests.delete(url, headers=HEADER)
+    res = get_client().request("DELETE", url)
 
     if res.status_code != 200:
         raise Exception(
@@ -157,11 +164,9 @@ def delete_project(user_id: str, project_name: str):
     Exception
         raises if something went wrong on request to server
     """
-    access_key = get_access_key()
-    HEADER.update({"x-api-key": access_key})
     project_uid = get_project_uid(user_id, project_name)
     url = f"{BASE_API_ENDPOINT}/project/{project_uid}/confirm?user={user_id}"
-    res = requests.delete(url, headers=HEADER)
+    res = get_client().request("DELETE", url)
 
     if res.status_code == 200:
         delete_project_config(user_id, project_name)
@@ -173,6 +178,9 @@ class Project:
     """
     Project class
 
+    An instance can be shared across threads. Credentials are kept
+    per instance, so that one process can serve several users.
+
     Attributes
     ----------
     project_name : str
@@ -181,28 +189,63 @@ class Project:
         registerd user id
     project_uid : str
         project unique hash
+    attrs : dict
+        summarized attributes of the project, fetched on first access
+    import_report : dict
+        report of the last `add_datafiles` call
+    client : APIClient
+        pooled client to send requests
     """
 
-    def __init__(self, project_name: str) -> None:
+    def __init__(
+        self,
+        project_name: str,
+        user_id: Optional[str] = None,
+        access_key: Optional[str] = None,
+    ) -> None:
         """
         Parameters
         ----------
         project_name : str
             Registerd project name
+        user_id : str, default None
+            registerd user id, use configured user id if None
+        access_key : str, default None
+            API access key, use configured access key if None
         """
-        access_key = get_access_key()
-        HEADER.update({"x-api-key": access_key})
-
+        self.client = get_client(access_key)
         self.project_name = project_name
-        self.user_id = get_user_id()
-        self.project_uid = get_project_uid(self.user_id, project_name)
-        self.attrs = self.__summarize_attributes()
+        self.user_id = user_id or get_user_id()
+        try:
+            self.project_uid = get_project_uid(self.user_id, project_name)
+        except KeyError:
+            # the project may be created or shared by other clients,
+            # look for it with the credentials of this instance
+            update_project_info(self.user_id, client=self.client)
+            self.project_uid = get_project_uid(self.user_id, project_name)
+        self.import_report = None
+        self._attrs = None
+        self._lock = threading.Lock()
+
+    @property
+    def attrs(self) -> dict:
+        """
+        Summarized attributes of the project.
+        It is fetched from server on first access.
+        """
+        if self._attrs is None:
+            with self._lock:
+                if self._attrs is None:
+                    self._attrs = self.__summarize_attributes()
+        return self._attrs
 
     def files(
         self,
         conditions: Optional[str] = None,
         query: List[str] = [],
         sort_key: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
     ) -> Files:
         """
         Generate Files clase instance.
@@ -215,6 +258,10 @@ class Project:
             conditional expression of key and value to search for files
         sort_key : str, default None
             key to sort files
+        limit : int, default None
+            maximum number of files, keep all files if None
+        offset : int, default 0
+            number of files skipped from the beginning
 
         Returns
         -------
@@ -225,9 +272,41 @@ class Project:
             conditions=conditions,
             query=query,
             sort_key=sort_key,
+            user_id=self.user_id,
+            access_key=self.client.access_key,
+            limit=limit,
+            offset=offset,
         )
         return files
 
+    def count_files(
+        self,
+        conditions: Optional[str] = None,
+        query: List[str] = [],
+    ) -> int:
+        """
+        Count files without creating Files class instance.
+
+        Parameters
+        ----------
+        conditions : str, default None
+            value of the condition to search for files
+        query : list of str, default []
+            conditional expression of key and value to search for files
+
+        Returns
+        -------
+        file_num : int
+            number of matched files
+        """
+        return Files.count(
+            self.project_name,
+            conditions=conditions,
+            query=query,
+            user_id=self.user_id,
+            access_key=self.client.access_key,
+        )
+
     def add_datafile(
         self,
         file_path: str,
@@ -270,36 +349,123 @@ class Project:
         meta_data.update(attributes)
 
         # create local datafile linker
-        linked_hash_location = os.path.join(
-            LINKER_DIR, self.project_uid, "linked_hash.json"
+        update_linker(self.project_uid, hash_dict)
+
+        # upload into database
+        item = json.dumps({"Items": [meta_data]}).encode("utf-8")
+        url = f"{BASE_API_ENDPOINT}/project/{self.project_uid}?user={self.user_id}"
+        self.client.request(
+            "POST",
+            url,
+            data=item,
+            idempotency_key=get_batch_id(item),
+            error_message="Failed to upload meta data.",
         )
-        os.makedirs(os.path.dirname(linked_hash_location), exist_ok=True)
+        invalidate_search_results(self.project_uid)
 
-        if os.path.exists(linked_hash_location):
-            with open(linked_hash_location, "r", encoding="utf-8") as f:
-                exist_hash_dict = json.loads(f.read())
-                exist_hash_dict.update(hash_dict)
-        else:
-            exist_hash_dict = hash_dict
+    def writer(
+        self,
+        attributes: dict = {},
+        max_latency: float = 1.0,
+        linker_interval: float = 5.0,
+        share_attributes: bool = False,
+    ) -> IngestWriter:
+        """
+        Open a streaming writer of datafiles.
 
-        with open(linked_hash_location, "w", encoding="utf-8") as f:
-            json.dump(exist_hash_dict, f, ensure_ascii=False, indent=4)
+        The writer hashes each datafile on `write`, and uploads meta data records
+        and local linker entries in micro-batches bounded by size and latency.
+        Close the writer, or use it as a context manager, to flush the rest.
 
-        # upload into database
-        item = {"Items": [meta_data]}
-        url = f"{BASE_API_ENDPOINT}/project/{self.project_uid}?user={self.user_id}"
-        res = requests.post(url, json.dumps(item), headers=HEADER)
+        Parameters
+        ----------
+        attributes : dict, default {}
+            the extra meta data (attributes) combined with whole datafiles
+        max_latency : float, default 1.0
+            seconds a record may wait in the buffer before it is uploaded
+        linker_interval : float, default 5.0
+            minimum seconds between rewrites of the local datafile linker
+        share_attributes : bool, default False
+            if True, send `attributes` once per batch as common attributes
+            instead of merging them into every record
 
-        if res.status_code != 200:
-            raise Exception("Failed to upload meta data.")
+        Returns
+        -------
+        writer : IngestWriter class instance
+        """
+        writer = IngestWriter(
+            self.project_uid,
+            self.user_id,
+            attributes=attributes,
+            max_latency=max_latency,
+            linker_interval=linker_interval,
+            share_attributes=share_attributes,
+            client=self.client,
+        )
+        return writer
+
+    def ingest(
+        self,
+        items: Iterable[Union[str, bytes, Tuple[Union[str, bytes], dict]]],
+        attributes: dict = {},
+        max_latency: float = 1.0,
+        max_workers: int = 2,
+        share_attributes: bool = False,
+    ) -> int:
+        """
+        Import meta data of streamed datafiles.
+
+        Each item is a file path, in-memory content of a datafile,
+        or a tuple of either and its own attributes.
+        Items are consumed lazily and uploaded in micro-batches,
+        so `items` can be a generator yielding files while they are captured.
+
+        Parameters
+        ----------
+        items : iterable
+            datafiles to import
+        attributes : dict, default {}
+            the extra meta data (attributes) combined with whole datafiles
+        max_latency : float, default 1.0
+            seconds a record may wait in the buffer before it is uploaded
+        max_workers : int, default 2
+            number of threads calculating file hashes
+        share_attributes : bool, default False
+            if True, send `attributes` once per batch as common attributes
+            instead of merging them into every record
+
+        Returns
+        -------
+        file_num : int
+            number of imported datafiles
+
+        Raises
+        ------
+        Exception
+            raises if something went wrong on uploading request to server
+        """
+        with self.writer(
+            attributes=attributes,
+            max_latency=max_latency,
+            share_attributes=share_attributes,
+        ) as writer:
+            file_num = writer.write_many(items, max_workers=max_workers)
+        return file_num
 
     def add_datafiles(
         self,
-        dir_path: str,
-        extension: str,
+        dir_path: Optional[str] = None,
+        extension: Optional[str] = None,
         attributes: dict = {},
         parsing_rule: Optional[str] = None,
         detail_parsing_rule: Optional[str] = None,
+        resume: bool = False,
+        progress_callback: Optional[Callable[[dict], None]] = None,
+        dry_run: bool = False,
+        dry_run_output: Optional[str] = None,
+        max_workers: int = 2,
+        share_attributes: bool = False,
+        specs: Optional[List[dict]] = None,
     ) -> int:
         """
         Import meta data related with datafile paths.
@@ -315,12 +481,21 @@ class Project:
             ...
         }
 
+        The progress is saved as a checkpoint under ~/.base/checkpoint,
+        and removed when the import was completed.
+        Record counts, payload sizes and timings of each stage are set
+        to `import_report` attribute.
+
+        Multiple directories, e.g. on different volumes, can be imported at once
+        with `specs`. They are scanned and hashed concurrently, and the records
+        are written to the linker once and uploaded in one stream.
+
         Parameters
         ----------
-        dir_path : str
-            the root directory path for datafiles
-        extension : str
-            the extension of datafiles
+        dir_path : str (default None)
+            the root directory path for datafiles, required without `specs`
+        extension : str (default None)
+            the extension of datafiles, required without `specs`
         attributes : dict (default {})
             the extra meta data (attributes) combined with whole datafiles
         parsing_rule : str (default None)
@@ -329,6 +504,33 @@ class Project:
         detail_parsing_rule : str (default None)
             detail information about parsing rule
             ex.) {_}/{CancerA}/{1-123}-{1}-{100}.png
+        resume : bool (default False)
+            if True, continue the interrupted import with same arguments
+            from the last acknowledged batch
+        progress_callback : function (default None)
+            called with the progress of "hashing" and "uploading" stages
+            see base.progress.StageProgress.snapshot() for the format
+        dry_run : bool (default False)
+            if True, build payloads without sending requests
+            and without writing local linker and checkpoint
+        dry_run_output : str (default None)
+            file path to write payloads as JSONL on dry run
+        max_workers : int (default 2)
+            number of threads to calculate filehashs
+        share_attributes : bool (default False)
+            if True, send `attributes` once per batch as common attributes
+            instead of merging them into every record
+        specs : list of dict (default None)
+            directories to import instead of `dir_path`, `extension`,
+            `parsing_rule` and `detail_parsing_rule`, each of them has
+            {
+                "Directory": String,
+                "Extension": String,
+                "ParsingRule": String (optional),
+                "DetailParsingRule": String (optional),
+                "Attributes": dict (optional, merged into records of the directory)
+            }
+            `max_workers` threads calculate filehashs for each directory
 
         Returns
         -------
@@ -338,104 +540,206 @@ class Project:
         Raises
         ------
         ValueError
-            raises if invalid parsing rule was specified
+            raises if invalid parsing rule or spec was specified,
+            or no datafiles were found in a directory
         Exception
             raises if something went wrong on uploading request to server
         """
-        if extension[0] == ".":
-            extension = extension[1:]
-        files = glob.glob(
-            os.path.join(dir_path, "**", f"*.{extension}"), recursive=True
-        )
-        data_list = []
-        hash_dict = {}
-
-        parser = None
-        if parsing_rule is not None:
-            parser = Parser(parsing_rule, extension=extension)
-            if detail_parsing_rule is not None:
-                parser.update_rule(detail_parsing_rule)
-            if not parser.validate_parsing_rule():
-                raise Exception(
-                    f"This parsing rule is not valid.\n\
-Make sure that the key is enclosed with `{{}}` in the parsing_rule."
+        if specs is None:
+            if dir_path is None or extension is None:
+                raise ValueError(
+                    'Argument "dir_path" and "extension" are required without "specs".'
                 )
-            if not parser.is_path_parsable(
-                files[0].split(dir_path)[-1].replace(os.sep, "/")
-            ):
+            specs = [
+                {
+                    "Directory": dir_path,
+                    "Extension": extension,
+                    "ParsingRule": parsing_rule,
+                    "DetailParsingRule": detail_parsing_rule,
+                }
+            ]
+        elif dir_path is not None or extension is not None:
+            raise ValueError(
+                'Specify either "dir_path" and "extension", or "specs", not both.'
+            )
+        specs = [self.__normalize_spec(spec) for spec in specs]
+
+        def scan(spec):
+            return glob.glob(
+                os.path.join(spec["Directory"], "**", f"*.{spec['Extension']}"),
+                recursive=True,
+            )
+
+        # directories are scanned concurrently, they can be on different volumes
+        scanning = StageProgress("scanning")
+        with stage("glob"), ThreadPoolExecutor(max_workers=len(specs)) as executor:
+            spec_files = list(executor.map(scan, specs))
+        scanning.update(sum(len(files) for files in spec_files))
+        scanning.finish()
+        for spec, files in zip(specs, spec_files):
+            if not files:
                 raise ValueError(
-                    "Failed to parse path with specified rule. tell me detail parsing rule."
+                    f"No datafiles found in {spec['Directory']}. "
+                    "Please check your directory and extension."
                 )
 
-        def calc_hash(file):
+        parsers = [
+            self.__build_parser(spec, files) for spec, files in zip(specs, spec_files)
+        ]
+
+        if len(specs) == 1:
+            signature = {
+                "DirPath": os.path.abspath(specs[0]["Directory"]),
+                "Extension": specs[0]["Extension"],
+                "Attributes": {**attributes, **specs[0]["Attributes"]},
+                "ParsingRule": specs[0]["ParsingRule"],
+                "DetailParsingRule": specs[0]["DetailParsingRule"],
+                "ShareAttributes": share_attributes,
+            }
+        else:
+            signature = {
+                "Specs": [
+                    {**spec, "Directory": os.path.abspath(spec["Directory"])}
+                    for spec in specs
+                ],
+                "Attributes": attributes,
+                "ShareAttributes": share_attributes,
+            }
+        checkpoint = ImportCheckpoint(
+            self.project_uid, signature=signature, persistent=not dry_run
+        )
+        if not (resume and checkpoint.load()):
+            checkpoint.clear()
+            checkpoint.save()
+        hashed_paths = set(checkpoint.paths)
+
+        def calc_hash(spec, parser, file, file_size):
             meta_data = {}
+            file_path = os.path.abspath(file).replace(os.sep, "/").replace("/", os.sep)
 
             # calculation hash value and update meta data dictionary
             hash_value = calc_file_hash(file)
             meta_data["FileHash"] = hash_value
-            hash_dict[hash_value] = (
-                os.path.abspath(file).replace(os.sep, "/").replace("/", os.sep)
-            )
-            meta_data.update(attributes)
+            if not share_attributes:
+                meta_data.update(attributes)
+            meta_data.update(spec["Attributes"])
 
             if parser is not None:
                 meta_data_from_path = parser(
-                    file.split(dir_path)[-1].replace(os.sep, "/")
+                    file.split(spec["Directory"])[-1].replace(os.sep, "/")
                 )
                 meta_data.update(meta_data_from_path)
 
-            data_list.append(meta_data)
+            checkpoint.add_record(file_path, meta_data)
+            hashing.update(1, file_size)
 
-        with Spinner(
-            text="Calculating filehashs...", etext="Calculating filehashs... Done."
-        ), ThreadPoolExecutor(max_workers=2) as executor:
+        spec_pending_files = []
+        for files in spec_files:
+            pending_files = []
             for file in files:
-                executor.submit(calc_hash, file)
+                file_path = (
+                    os.path.abspath(file).replace(os.sep, "/").replace("/", os.sep)
+                )
+                if file_path not in hashed_paths:
+                    pending_files.append((file, os.path.getsize(file)))
+            spec_pending_files.append(pending_files)
+
+        display = ProgressDisplay(
+            text="Calculating filehashs...",
+            etext="Calculating filehashs... Done.",
+            unit="files",
+        )
+        hashing = StageProgress(
+            "hashing",
+            total=sum(len(pending_files) for pending_files in spec_pending_files),
+            total_bytes=sum(
+                file_size
+                for pending_files in spec_pending_files
+                for _, file_size in pending_files
+            ),
+            callback=self.__progress_reporter(display, progress_callback),
+        )
+        with display:
+            # each directory has its own workers, so that a slow volume
+            # does not hold back the others
+            with ExitStack() as stack:
+                for spec, parser, pending_files in zip(
+                    specs, parsers, spec_pending_files
+                ):
+                    executor = stack.enter_context(
+                        ThreadPoolExecutor(max_workers=max_workers)
+                    )
+                    for file, file_size in pending_files:
+                        executor.submit(calc_hash, spec, parser, file, file_size)
+            checkpoint.close()
+            hashing.finish()
 
         # create local datafile linker
-        linked_hash_location = os.path.join(
-            LINKER_DIR, self.project_uid, "linked_hash.json"
+        linking = StageProgress("linking")
+        is_linked = checkpoint.linked and len(checkpoint.paths) == len(hashed_paths)
+        if not (dry_run or is_linked):
+            hash_dict = {
+                record["FileHash"]: file_path
+                for record, file_path in zip(checkpoint.records, checkpoint.paths)
+            }
+            update_linker(self.project_uid, hash_dict)
+            checkpoint.mark_linked()
+            linking.update(len(hash_dict))
+        linking.finish()
+
+        # divide by byte size and upload into database
+        file_num = len(checkpoint.records)
+        resumed_num = checkpoint.uploaded_num
+        url = f"{BASE_API_ENDPOINT}/project/{self.project_uid}?user={self.user_id}"
+        output = None
+        if dry_run and dry_run_output is not None:
+            os.makedirs(os.path.dirname(dry_run_output) or ".", exist_ok=True)
+            output = open(dry_run_output, "w", encoding="utf-8")
+        uploader = BatchUploader(
+            url,
+            client=self.client,
+            dry_run=dry_run,
+            output=output,
+            common_attributes=attributes if share_attributes else None,
+        )
+        text = "Building payloads..." if dry_run else "Uploading data..."
+        display = ProgressDisplay(text=text, etext=f"{text} Done.", unit="records")
+        uploading = StageProgress(
+            "uploading",
+            total=file_num - resumed_num,
+            callback=self.__progress_reporter(display, progress_callback),
         )
-        os.makedirs(os.path.dirname(linked_hash_location), exist_ok=True)
 
-        if os.path.exists(linked_hash_location):
-            with open(linked_hash_location, "r", encoding="utf-8") as f:
-                exist_hash_dict = json.loads(f.read())
-                exist_hash_dict.update(hash_dict)
-        else:
-            exist_hash_dict = hash_dict
-
-        with open(linked_hash_location, "w", encoding="utf-8") as f:
-            json.dump(exist_hash_dict, f, ensure_ascii=False, indent=4)
-
-        # divide and upload into database
-        limit_record_size = 10000
-        split_count = math.ceil(len(data_list) / limit_record_size)
-        split_data_num = math.ceil(len(data_list) / split_count)
-        file_num = len(data_list)
-
-        lap_time = []
-        for s in range(split_count):
-            mean_lap_time = 25 if not lap_time else sum(lap_time) // len(lap_time)
-            minute = (split_count - s) * mean_lap_time // 60
-            second = (split_count - s) * mean_lap_time % 60
-            text = f"{s*10000}/{file_num}, estimated time: {minute}m {second}s"
-
-            items = {"Items": data_list[s * split_data_num : (s + 1) * split_data_num]}
-            url = f"{BASE_API_ENDPOINT}/project/{self.project_uid}?user={self.user_id}"
-
-            start = time.time()
-            etext = (
-                "Uploading data... Done." if len(lap_time) == split_count - 1 else ""
+        def mark_uploaded(
+            uploaded_num: int, uploaded_bytes: int, batch_id: str
+        ) -> None:
+            checkpoint.mark_uploaded(batch_id, resumed_num + uploaded_num)
+            uploading.update(
+                uploaded_num - uploading.count, uploaded_bytes - uploading.nbytes
             )
-            with Spinner(text=f"Uploading data... {text}", etext=etext):
-                res = requests.post(url, json.dumps(items), headers=HEADER)
-                if res.status_code != 200:
-                    raise Exception("Failed to upload meta data.")
-
-            end = time.time()
-            lap_time.append(int(end - start))
 
+        try:
+            with display, stage("upload"):
+                uploader.upload(checkpoint.pending_records(), callback=mark_uploaded)
+                uploading.finish()
+        finally:
+            if output is not None:
+                output.close()
+
+        checkpoint.remove()
+        if not dry_run:
+            invalidate_search_results(self.project_uid)
+        self.import_report = {
+            "DryRun": dry_run,
+            "RecordCount": file_num,
+            "UploadedCount": uploader.uploaded_num,
+            "BatchCount": uploader.batch_num,
+            "PayloadBytes": uploader.uploaded_bytes,
+            "StageTimes": {
+                stage.stage: stage.elapsed
+                for stage in [scanning, hashing, linking, uploading]
+            },
+        }
         return file_num
 
     def extract_metafile(
@@ -469,6 +773,9 @@ Make sure that the key is enclosed with `{{}}` in the parsing_rule."
         Exception
             raises if something went wrong on uploading request to server
         """
+        # imported here, because pandas takes long time to import
+        import pandas as pd
+
         _, ext = os.path.splitext(file_path)
         tmp_file_path = os.path.join(
             os.path.dirname(file_path), f"tmp_{os.path.basename(file_path)}"
@@ -476,11 +783,7 @@ Make sure that the key is enclosed with `{{}}` in the parsing_rule."
         if ext.lower() == ".csv":
             df = pd.read_csv(file_path, header=0)
             if "FilePath" in df:
-                linked_hash_location = os.path.join(
-                    LINKER_DIR, self.project_uid, "linked_hash.json"
-                )
-                with open(linked_hash_location, "r", encoding="utf-8") as f:
-                    exist_hash_dict = json.loads(f.read())
+                exist_hash_dict = load_linker(self.project_uid)
                 path_to_hash = {v: k for k, v in exist_hash_dict.items()}
                 df["FileHash"] = df["FilePath"].apply(lambda x: path_to_hash[x])
                 del df["FilePath"]
@@ -505,7 +808,7 @@ Make sure that the key is enclosed with `{{}}` in the parsing_rule."
         item["is_csv"] = 1 if ext == ".csv" else 0
         item["common_keyvalue"] = attributes
 
-        with Spinner("extracting tables...", overwrite=False):
+        with ProgressDisplay("extracting tables...", overwrite=False):
             _, ext = os.path.splitext(file_path)
             if ext.lower() not in [".csv", ".xlsx"]:
                 raise ValueError(
@@ -522,12 +825,15 @@ Make sure that the key is enclosed with `{{}}` in the parsing_rule."
 
             # extract and parse external file
             url = f"{BASE_API_ENDPOINT}/project/{self.project_uid}/meta_file?user={self.user_id}"
-            res = requests.post(url, json.dumps(item), headers=HEADER)
-            if res.status_code != 200:
-                raise Exception("Failed to extract and parse external file.")
+            res = self.client.request(
+                "POST",
+                url,
+                data=json.dumps(item),
+                error_message="Failed to extract and parse external file.",
+            )
 
             s3_presigned_url = res.json()["URL"]
-            res = requests.get(s3_presigned_url)
+            res = self.client.request("GET", s3_presigned_url, authorized=False)
             tables = res.json()["Items"]
 
         if verbose != 0:
@@ -590,14 +896,19 @@ Make sure that the key is enclosed with `{{}}` in the parsing_rule."
                 extracted_tables = self.extract_metafile(file_path=file_path, verbose=1)
                 tables += extracted_tables
 
-        with Spinner("now estimating the rule for table joining...", overwrite=False):
+        with ProgressDisplay(
+            "now estimating the rule for table joining...", overwrite=False
+        ):
             join_rules = []
             for table in tables:
                 url = f"{BASE_API_ENDPOINT}/project/{self.project_uid}?user={self.user_id}"
                 payload = {"Items": table}
-                res = requests.put(url, json.dumps(payload), headers=HEADER)
-                if res.status_code != 200:
-                    raise Exception("Failed to estimate the joining rule")
+                res = self.client.request(
+                    "PUT",
+                    url,
+                    data=json.dumps(payload),
+                    error_message="Failed to estimate the joining rule",
+                )
 
                 join_rule = res.json()["UpdateRule"]
                 join_rules.append(json.dumps(join_rule, ensure_ascii=False))
@@ -656,6 +967,8 @@ Make sure that the key is enclosed with `{{}}` in the parsing_rule."
         Exception
             raises if something went wrong on uploading request to server
         """
+        import ruamel.yaml
+
         if join_rule_path:
             try:
                 with open(join_rule_path, "r", encoding="utf-8") as yf:
@@ -749,7 +1062,7 @@ Make sure that the key is enclosed with `{{}}` in the parsing_rule."
                         update_rule_for_add[key] = f"ADD:{key}"
                 url = f"{BASE_API_ENDPOINT}/project/{self.project_uid}/files?user={self.user_id}"
 
-                with Spinner(
+                with ProgressDisplay(
                     text="Joining tables...",
                     etext=f"{len(tables)} tables have been joined!",
                 ):
@@ -762,18 +1075,18 @@ Make sure that the key is enclosed with `{{}}` in the parsing_rule."
                                 "UpdateRule": update_rule_for_add,
                             }
                         try:
-                            res = requests.put(
-                                url=url,
+                            res = self.client.request(
+                                "PUT",
+                                url,
                                 data=json.dumps(payload),
-                                headers=HEADER,
                                 timeout=20,
                             )
                         except:
                             is_completed = False
                             while not is_completed:
-                                res = requests.get(
-                                    url=f"{BASE_API_ENDPOINT}/project/{self.project_uid}/tables/status/contents?user={self.user_id}",
-                                    headers=HEADER,
+                                res = self.client.request(
+                                    "GET",
+                                    f"{BASE_API_ENDPOINT}/project/{self.project_uid}/tables/status/contents?user={self.user_id}",
                                 )
                                 if res.status_code != 200:
                                     raise Exception(
@@ -786,6 +1099,7 @@ Make sure that the key is enclosed with `{{}}` in the parsing_rule."
                                     is_completed = True
                                 else:  # Failure
                                     raise Exception("Failed to join the tables")
+            invalidate_search_results(self.project_uid)
 
         elif approved == "m" and (not join_rule_path):
             join_rules_info = {
@@ -907,7 +1221,7 @@ Make sure that the key is enclosed with `{{}}` in the parsing_rule."
             raises if something went wrong with request to server
         """
         url = f"{BASE_API_ENDPOINT}/project/{self.project_uid}?user={self.user_id}"
-        res = requests.get(url, headers=HEADER)
+        res = self.client.request("GET", url, cache=True)
 
         if res.status_code == 200:
             key_list = res.json()["Items"]
@@ -943,22 +1257,7 @@ Make sure that the key is enclosed with `{{}}` in the parsing_rule."
             hash_value = calc_file_hash(f)
             hash_dict[hash_value] = f.replace(os.sep, "/").replace("/", os.sep)
 
-        linked_hash_location = os.path.join(
-            LINKER_DIR, self.project_uid, "linked_hash.json"
-        )
-        os.makedirs(os.path.dirname(linked_hash_location), exist_ok=True)
-
-        if os.path.exists(linked_hash_location):
-            with open(linked_hash_location, "r", encoding="utf-8") as f:
-                exist_hash_dict = json.loads(f.read())
-                exist_hash_dict.update(hash_dict)
-        else:
-            exist_hash_dict = {}
-
-        exist_hash_dict.update(hash_dict)
-
-        with open(linked_hash_location, "w", encoding="utf-8") as f:
-            json.dump(exist_hash_dict, f, ensure_ascii=False, indent=4)
+        update_linker(self.project_uid, hash_dict)
 
         file_num = len(files)
         return file_num
@@ -1006,9 +1305,12 @@ Make sure that the key is enclosed with `{{}}` in the parsing_rule."
         url = (
             f"{BASE_API_ENDPOINT}/project/{self.project_uid}/member?user={self.user_id}"
         )
-        res = requests.post(url, json.dumps(member_info), headers=HEADER)
-        if res.status_code != 200:
-            raise Exception(f"Failed to invite {member}.")
+        self.client.request(
+            "POST",
+            url,
+            data=json.dumps(member_info),
+            error_message=f"Failed to invite {member}.",
+        )
 
     def update_member(self, member: str, permission_level: str) -> None:
         """
@@ -1050,9 +1352,12 @@ Make sure that the key is enclosed with `{{}}` in the parsing_rule."
 
         member_info = {"NewUserRole": permission_level}
         url = f"{BASE_API_ENDPOINT}/project/{self.project_uid}/member/{member}?user={self.user_id}"
-        res = requests.put(url, json.dumps(member_info), headers=HEADER)
-        if res.status_code != 200:
-            raise Exception(f"Failed to update {member}'s permission.")
+        self.client.request(
+            "PUT",
+            url,
+            data=json.dumps(member_info),
+            error_message=f"Failed to update {member}'s permission.",
+        )
 
     def get_members(self) -> List[dict]:
         """
@@ -1079,7 +1384,7 @@ Make sure that the key is enclosed with `{{}}` in the parsing_rule."
         url = (
             f"{BASE_API_ENDPOINT}/project/{self.project_uid}/member?user={self.user_id}"
         )
-        res = requests.get(url, headers=HEADER)
+        res = self.client.request("GET", url, cache=True)
 
         if res.status_code == 200:
             member_list = res.json()["Members"]
@@ -1106,10 +1411,112 @@ Make sure that the key is enclosed with `{{}}` in the parsing_rule."
 
         for m in member:
             url = f"{BASE_API_ENDPOINT}/project/{self.project_uid}/member/{m}?user={self.user_id}"
-            res = requests.delete(url, headers=HEADER)
+            self.client.request(
+                "DELETE",
+                url,
+                error_message=f"Failed to remove {m} from {self.project_name}",
+            )
+
+    def __normalize_spec(self, spec: dict) -> dict:
+        """
+        Fill optional keys of the import spec, and strip "." of the extension.
+
+        Parameters
+        ----------
+        spec : dict
+            import spec of `add_datafiles()`
+
+        Returns
+        -------
+        spec : dict
+            normalized import spec
+
+        Raises
+        ------
+        ValueError
+            raises if the spec has no directory or extension
+        """
+        if not spec.get("Directory") or not spec.get("Extension"):
+            raise ValueError(
+                f'Import spec must have "Directory" and "Extension": {spec}'
+            )
+        extension = spec["Extension"]
+        if extension[0] == ".":
+            extension = extension[1:]
+        return {
+            "Directory": spec["Directory"],
+            "Extension": extension,
+            "ParsingRule": spec.get("ParsingRule"),
+            "DetailParsingRule": spec.get("DetailParsingRule"),
+            "Attributes": spec.get("Attributes") or {},
+        }
+
+    def __build_parser(self, spec: dict, files: List[str]) -> Optional[Parser]:
+        """
+        Build the parser of the import spec, and check it with the first datafile.
+
+        Parameters
+        ----------
+        spec : dict
+            normalized import spec
+        files : list of str
+            datafiles found in the directory
+
+        Returns
+        -------
+        parser : Parser or None
+            None if the spec has no parsing rule
+
+        Raises
+        ------
+        ValueError
+            raises if the path can not be parsed with the rule
+        """
+        if spec["ParsingRule"] is None:
+            return None
+        parser = Parser(spec["ParsingRule"], extension=spec["Extension"])
+        if spec["DetailParsingRule"] is not None:
+            parser.update_rule(spec["DetailParsingRule"])
+        if not parser.validate_parsing_rule():
+            raise Exception(
+                f"This parsing rule is not valid.\n\
+Make sure that the key is enclosed with `{{}}` in the parsing_rule."
+            )
+        if files and not parser.is_path_parsable(
+            files[0].split(spec["Directory"])[-1].replace(os.sep, "/")
+        ):
+            raise ValueError(
+                "Failed to parse path with specified rule. tell me detail parsing rule."
+            )
+        return parser
+
+    def __progress_reporter(
+        self,
+        display: ProgressDisplay,
+        progress_callback: Optional[Callable[[dict], None]] = None,
+    ) -> Callable[[dict], None]:
+        """
+        Generate callback which shows progress with the display.
+
+        Parameters
+        ----------
+        display : ProgressDisplay
+            display to show progress
+        progress_callback : function (default None)
+            user callback called with the progress
+
+        Returns
+        -------
+        callback : function
+            callback for base.progress.StageProgress
+        """
+
+        def callback(progress: dict) -> None:
+            display.update(progress)
+            if progress_callback is not None:
+                progress_callback(progress)
 
-            if res.status_code != 200:
-                raise Exception(f"Failed to remove {m} from {self.project_name}")
+        return callback
 
     def __summarize_attributes(self) -> dict:
         """
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import os
+import time
+import random
+import threading
+import requests
+from contextlib import nullcontext
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+# (connect timeout, read timeout) in seconds
+DEFAULT_TIMEOUT = (10, 300)
+# status codes which mean the request can be sent again later
+RETRY_STATUS = (429, 500, 502, 503, 504)
+# methods which never change the result when sent twice
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "DELETE")
+# default number of in-flight requests of each client
+MAX_CONCURRENCY = int(os.environ.get("BASE_MAX_CONCURRENCY", 8))
+
+
+class RetryPolicy:
+    """
+    RetryPolicy class
+
+    Retry failed requests with jittered exponential backoff.
+    Requests rejected with 429 are always retried. Other server errors and
+    connection errors are retried only when the request is idempotent,
+    that is sent with an idempotent method or an idempotency key.
+
+    Attributes
+    ----------
+    max_retries : int
+        maximum number of retries
+    backoff_factor : float
+        base seconds of the backoff
+    max_backoff : float
+        upper limit of seconds to wait before a retry
+    timeout : tuple or float
+        timeout of each request, passed to `requests`
+    governor : threading.BoundedSemaphore
+        semaphore to limit the number of in-flight requests, unlimited if None
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 5,
+        backoff_factor: float = 0.5,
+        max_backoff: float = 60.0,
+        timeout=DEFAULT_TIMEOUT,
+        governor: Optional[threading.BoundedSemaphore] = None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        max_retries : int, default 5
+            maximum number of retries
+        backoff_factor : float, default 0.5
+            base seconds of the backoff
+        max_backoff : float, default 60.0
+            upper limit of seconds to wait before a retry
+        timeout : tuple or float, default (10, 300)
+            timeout of each request, passed to `requests`
+        governor : threading.BoundedSemaphore, default None
+            semaphore to limit the number of in-flight requests,
+            shared by the requests sent with this policy, unlimited if None
+        """
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.governor = governor
+
+    def is_retryable(
+        self,
+        attempt: int,
+        idempotent: bool,
+        response: Optional[requests.Response] = None,
+    ) -> bool:
+        """
+        Judge whether the request should be sent again.
+
+        Parameters
+        ----------
+        attempt : int
+            number of retries so far
+        idempotent : bool
+            whether the request is idempotent or not
+        response : requests.Response, default None
+            response of the request, None if the connection failed
+
+        Returns
+        -------
+        retryable : bool
+            whether the request should be sent again
+        """
+        if attempt >= self.max_retries:
+            return False
+        if response is None:
+            return idempotent
+        if response.status_code == 429:
+            return True
+        return idempotent and response.status_code in RETRY_STATUS
+
+    def get_backoff(
+        self, attempt: int, response: Optional[requests.Response] = None
+    ) -> float:
+        """
+        Get seconds to wait before the next retry.
+
+        "Retry-After" header of the response is respected if exists,
+        otherwise full jitter backoff is used.
+
+        Parameters
+        ----------
+        attempt : int
+            number of retries so far
+        response : requests.Response, default None
+            response of the request
+
+        Returns
+        -------
+        backoff : float
+            seconds to wait
+        """
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                return min(retry_after, self.max_backoff)
+        backoff = min(self.max_backoff, self.backoff_factor * (2**attempt))
+        return random.uniform(0, backoff)
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+def send_request(
+    method: str,
+    url: str,
+    idempotency_key: Optional[str] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    session: Optional[requests.Session] = None,
+    **kwargs,
+) -> requests.Response:
+    """
+    Send a request with retry.
+
+    Parameters
+    ----------
+    method : str
+        http method
+    url : str
+        request url
+    idempotency_key : str, default None
+        key to identify the request on the server side.
+        it is sent as "Idempotency-Key" header, so that
+        a retried request is never applied twice
+    retry_policy : RetryPolicy, default None
+        retry policy, use DEFAULT_RETRY_POLICY if None
+    session : requests.Session, default None
+        session to reuse pooled connections,
+        a new connection is opened for each request if None
+    **kwargs
+        other arguments passed to `requests.request`
+
+    Returns
+    -------
+    response : requests.Response
+        the last response
+
+    Raises
+    ------
+    requests.RequestException
+        raises if the connection failed and it can not be retried
+    """
+    method = method.upper()
+    policy = retry_policy or DEFAULT_RETRY_POLICY
+    kwargs.setdefault("timeout", policy.timeout)
+    if idempotency_key is not None:
+        kwargs["headers"] = {
+            **(kwargs.get("headers") or {}),
+            "Idempotency-Key": idempotency_key,
+        }
+    idempotent = method in IDEMPOTENT_METHODS or idempotency_key is not None
+
+    attempt = 0
+    while True:
+        try:
+            with policy.governor or nullcontext():
+                res = (session or requests).request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            if not policy.is_retryable(attempt, idempotent):
+                raise
+            time.sleep(policy.get_backoff(attempt))
+        else:
+            if not policy.is_retryable(attempt, idempotent, res):
+                return res
+            time.sleep(policy.get_backoff(attempt, res))
+        attempt += 1
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse "Retry-After" header value.
+
+    Parameters
+    ----------
+    value : str
+        seconds or http date
+
+    Returns
+    -------
+    seconds : float
+        seconds to wait, None if the value is invalid
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+if __name__ == "__main__":
+    pass
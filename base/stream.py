@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import json
+import codecs
+from typing import Any, Iterable, Iterator
+
+# bytes read from the response at once
+CHUNK_SIZE = 64 * 1024
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+class _Buffer:
+    """
+    Text buffer filled from chunks of bytes on demand.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        # drop consumed text, so that memory is bounded by one value
+        self.text = self.text[self.pos :]
+        self.pos = 0
+        for chunk in self.chunks:
+            text = self.decoder.decode(chunk)
+            if text:
+                self.text += text
+                return True
+        self.text += self.decoder.decode(b"", final=True)
+        self.eof = True
+        return False
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                raise ValueError("Unexpected end of JSON data")
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' at JSON data")
+        self.pos += 1
+
+    def decode(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # a number may continue in the next chunk
+            if end == len(self.text) and not self.eof and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_array(chunks: Iterable[bytes], key: str = "Items") -> Iterator[Any]:
+    """
+    Parse elements of an array in a JSON object one by one.
+    Other values of the object are skipped.
+
+    Parameters
+    ----------
+    chunks : iterable of bytes
+        utf-8 encoded JSON object, like `requests.Response.iter_content()`
+    key : str, default "Items"
+        key of the array in the object
+
+    Yields
+    ------
+    element : Any
+        element of the array
+
+    Raises
+    ------
+    ValueError
+        raises if the data is not a JSON object or the key is not found
+    """
+    buffer = _Buffer(chunks)
+    buffer.expect("{")
+    if buffer.peek() == "}":
+        raise ValueError(f"'{key}' is not found in JSON data")
+    while True:
+        name = buffer.decode()
+        buffer.expect(":")
+        if name != key:
+            buffer.decode()
+        else:
+            buffer.expect("[")
+            if buffer.peek() == "]":
+                return
+            while True:
+                yield buffer.decode()
+                if buffer.peek() == "]":
+                    return
+                buffer.expect(",")
+        if buffer.peek() == "}":
+            raise ValueError(f"'{key}' is not found in JSON data")
+        buffer.expect(",")
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import json
+import hashlib
+from typing import Callable, Iterable, Iterator, List, Optional, TextIO
+
+from base.client import APIClient, get_client
+from base.profiler import stage
+
+# upper bound of records in one request (kept from the former fixed chunk size)
+MAX_BATCH_RECORDS = 10000
+# API payload limit is 6MB, keep some margin for headers and encoding
+MAX_BATCH_BYTES = 5 * 1024 * 1024
+MIN_BATCH_BYTES = 64 * 1024
+INITIAL_BATCH_BYTES = 1024 * 1024
+# preferred seconds per request, used to adapt the batch byte size
+TARGET_LATENCY = 10.0
+
+PAYLOAD_HEAD = '{"Items": ['
+PAYLOAD_TAIL = "]}"
+PAYLOAD_SEP = ", "
+# key of attributes shared by every record in a batch, same as the metafile endpoint
+COMMON_KEY = "common_keyvalue"
+
+
+class BatchUploader:
+    """
+    BatchUploader class
+
+    Divide meta data records into batches bounded by serialized byte size
+    and record count, then upload them one by one.
+    The target byte size of a batch is adapted from observed latency,
+    and a batch rejected as too large (HTTP 413) is split and retried.
+
+    Attributes
+    ----------
+    url : str
+        endpoint url to post records
+    client : APIClient
+        client to send requests
+    max_batch_records : int
+        maximum number of records in one batch
+    max_batch_bytes : int
+        maximum serialized byte size of one batch
+    min_batch_bytes : int
+        minimum target byte size of one batch
+    batch_bytes : int
+        current target byte size of one batch
+    target_latency : float
+        preferred seconds per request
+    uploaded_num : int
+        number of acknowledged records on the last upload
+    uploaded_bytes : int
+        number of acknowledged payload bytes on the last upload
+    batch_num : int
+        number of acknowledged requests on the last upload
+    dry_run : bool
+        if True, build payloads without sending requests
+    output : file object
+        if given on dry run, each payload is written as one line of JSONL
+    common_attributes : dict
+        attributes sent once per batch instead of on every record
+    """
+
+    def __init__(
+        self,
+        url: str,
+        client: Optional[APIClient] = None,
+        max_batch_records: int = MAX_BATCH_RECORDS,
+        max_batch_bytes: int = MAX_BATCH_BYTES,
+        min_batch_bytes: int = MIN_BATCH_BYTES,
+        initial_batch_bytes: int = INITIAL_BATCH_BYTES,
+        target_latency: float = TARGET_LATENCY,
+        dry_run: bool = False,
+        output: Optional[TextIO] = None,
+        common_attributes: Optional[dict] = None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        url : str
+            endpoint url to post records
+        client : APIClient, default None
+            client to send requests, use the shared client if None
+        max_batch_records : int, default 10000
+            maximum number of records in one batch
+        max_batch_bytes : int, default 5MB
+            maximum serialized byte size of one batch
+        min_batch_bytes : int, default 64KB
+            minimum target byte size of one batch
+        initial_batch_bytes : int, default 1MB
+            target byte size of the first batch
+        target_latency : float, default 10.0
+            preferred seconds per request
+        dry_run : bool, default False
+            if True, build payloads without sending requests
+        output : file object, default None
+            if given on dry run, each payload is written as one line of JSONL
+        common_attributes : dict, default None
+            attributes sent once per batch instead of on every record,
+            the records must not contain them
+        """
+        self.url = url
+        self.client = client or get_client()
+        self.max_batch_records = max_batch_records
+        self.max_batch_bytes = max_batch_bytes
+        self.min_batch_bytes = min(min_batch_bytes, max_batch_bytes)
+        self.batch_bytes = min(
+            max(initial_batch_bytes, self.min_batch_bytes), max_batch_bytes
+        )
+        self.target_latency = target_latency
+        self.dry_run = dry_run
+        self.output = output
+        self.common_attributes = common_attributes or None
+
+        self.uploaded_num = 0
+        self.uploaded_bytes = 0
+        self.batch_num = 0
+
+    def iter_batches(self, records: Iterable[dict]) -> Iterator[List[str]]:
+        """
+        Divide records into batches of serialized records.
+
+        The current `batch_bytes` is read for every record,
+        so the adaptation by the previous upload takes effect immediately.
+
+        Parameters
+        ----------
+        records : iterable of dict
+            meta data records
+
+        Yields
+        ------
+        batch : list of str
+            json serialized records
+        """
+        base_size = len(build_payload([], self.common_attributes))
+        batch = []
+        batch_size = base_size
+        for record in records:
+            with stage("encode"):
+                serialized = json.dumps(record)
+            size = len(serialized) + len(PAYLOAD_SEP)
+            if batch and (
+                len(batch) >= self.max_batch_records
+                or batch_size + size > self.batch_bytes
+            ):
+                yield batch
+                batch = []
+                batch_size = base_size
+            batch.append(serialized)
+            batch_size += size
+
+        if batch:
+            yield batch
+
+    def upload(
+        self,
+        records: Iterable[dict],
+        callback: Optional[Callable[[int, int, str], None]] = None,
+    ) -> int:
+        """
+        Upload records with adaptive batching.
+
+        Parameters
+        ----------
+        records : iterable of dict
+            meta data records
+        callback : function, default None
+            called with (uploaded record count, uploaded bytes, batch id)
+            after each acknowledged request
+
+        Returns
+        -------
+        record_num : int
+            number of uploaded records
+
+        Raises
+        ------
+        Exception
+            raises if something went wrong on uploading request to server
+        """
+        self.uploaded_num = 0
+        self.uploaded_bytes = 0
+        self.batch_num = 0
+        for batch in self.iter_batches(records):
+            self.post_batch(batch, callback=callback)
+        return self.uploaded_num
+
+    def post_batch(
+        self,
+        batch: List[str],
+        callback: Optional[Callable[[int, int, str], None]] = None,
+    ) -> None:
+        """
+        Post one batch of serialized records.
+
+        If the server rejects the batch as too large,
+        lower the byte size limit and post each half of the batch.
+        The batch id is sent as idempotency key, so that a retried batch
+        is never applied twice.
+
+        Parameters
+        ----------
+        batch : list of str
+            json serialized records
+        callback : function, default None
+            called with (uploaded record count, uploaded bytes, batch id)
+            after each acknowledged request
+
+        Raises
+        ------
+        Exception
+            raises if something went wrong on uploading request to server
+        """
+        payload = build_payload(batch, self.common_attributes)
+        batch_id = get_batch_id(payload)
+
+        if self.dry_run:
+            if self.output is not None:
+                self.output.write(payload.decode("utf-8") + "\n")
+        else:
+            res = self.client.request(
+                "POST", self.url, data=payload, idempotency_key=batch_id
+            )
+
+            if res.status_code == 413 and len(batch) > 1:
+                # remember the rejected size as a new upper limit
+                self.max_batch_bytes = max(self.min_batch_bytes, len(payload) - 1)
+                self.batch_bytes = max(self.min_batch_bytes, len(payload) // 2)
+                half = len(batch) // 2
+                self.post_batch(batch[:half], callback=callback)
+                self.post_batch(batch[half:], callback=callback)
+                return
+            if res.status_code != 200:
+                raise Exception("Failed to upload meta data.")
+
+            # latency of the acknowledged attempt, without backoff of retries
+            self.adapt(len(payload), res.elapsed.total_seconds())
+
+        self.uploaded_num += len(batch)
+        self.uploaded_bytes += len(payload)
+        self.batch_num += 1
+        if callback is not None:
+            callback(self.uploaded_num, self.uploaded_bytes, batch_id)
+
+    def adapt(self, payload_bytes: int, elapsed: float) -> None:
+        """
+        Update target byte size of a batch from observed latency.
+
+        The new size is scaled by the ratio of target latency and
+        observed latency, limited to half or double of the current size.
+
+        Parameters
+        ----------
+        payload_bytes : int
+            posted payload bytes
+        elapsed : float
+            seconds taken by the request
+        """
+        if payload_bytes < self.batch_bytes // 2:
+            # small batch (e.g. the last one) tells nothing about the limit
+            return
+        ratio = self.target_latency / max(elapsed, 1e-3)
+        ratio = min(max(ratio, 0.5), 2.0)
+        batch_bytes = int(self.batch_bytes * ratio)
+        self.batch_bytes = min(
+            max(batch_bytes, self.min_batch_bytes), self.max_batch_bytes
+        )
+
+
+def build_payload(batch: List[str], common_attributes: Optional[dict] = None) -> bytes:
+    """
+    Build request payload from json serialized records.
+
+    Parameters
+    ----------
+    batch : list of str
+        json serialized records
+    common_attributes : dict, default None
+        attributes shared by every record in the batch
+
+    Returns
+    -------
+    payload : bytes
+        encoded payload, same as json.dumps({"Items": records})
+        or json.dumps({"Items": records, "common_keyvalue": common_attributes})
+    """
+    payload = PAYLOAD_HEAD + PAYLOAD_SEP.join(batch)
+    if common_attributes:
+        payload += f'], "{COMMON_KEY}": {json.dumps(common_attributes)}}}'
+    else:
+        payload += PAYLOAD_TAIL
+    return payload.encode("utf-8")
+
+
+def expand_common_attributes(payload: dict) -> List[dict]:
+    """
+    Restore full records from a payload with batch level common attributes.
+
+    This is what the API does on receiving the payload,
+    attributes of each record take precedence over common attributes.
+
+    Parameters
+    ----------
+    payload : dict
+        decoded payload, {"Items": records, "common_keyvalue": common_attributes}
+
+    Returns
+    -------
+    records : list of dict
+        meta data records with common attributes
+    """
+    common_attributes = payload.get(COMMON_KEY) or {}
+    return [{**common_attributes, **record} for record in payload["Items"]]
+
+
+def get_batch_id(payload: bytes) -> str:
+    """
+    Get content based id of a batch.
+
+    Parameters
+    ----------
+    payload : bytes
+        encoded payload
+
+    Returns
+    -------
+    batch_id : str
+        sha256 hash string of the payload
+    """
+    return hashlib.sha256(payload).hexdigest()
+
+
+if __name__ == "__main__":
+    pass
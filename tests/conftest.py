@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import json
+import datetime
+
+import pytest
+
+from base import aio, cache, client, config, files, ingest, linker, project
+from base.mock_server import MockServer
+from base.uploader import BatchUploader
+
+USER_ID = "test@adansons.co.jp"
+ACCESS_KEY = "test-key"
+
+
+class DummyResponse:
+    def __init__(self, status_code, headers={}, elapsed=0.0):
+        self.status_code = status_code
+        self.headers = headers
+        self.elapsed = datetime.timedelta(seconds=elapsed)
+
+
+@pytest.fixture
+def dummy_response():
+    """
+    Class of fake responses returned by patched `requests` functions.
+    """
+    return DummyResponse
+
+
+@pytest.fixture
+def response_cache_dir(monkeypatch, tmp_path):
+    """
+    Directory of cached responses under tmp_path instead of ~/.base/cache.
+    Shared clients of `get_client()` are created again with it.
+    """
+    cache_dir = str(tmp_path / "cache")
+    monkeypatch.setattr(cache, "CACHE_DIR", cache_dir)
+    monkeypatch.setattr(client, "_CLIENTS", {})
+    return cache_dir
+
+
+@pytest.fixture
+def mock_server(monkeypatch, tmp_path, response_cache_dir):
+    """
+    Mock server of Base API, with the user and local files under tmp_path.
+    `server.client` is the shared client of the access key.
+    """
+    monkeypatch.setenv("BASE_USER_ID", USER_ID)
+    monkeypatch.setenv("BASE_ACCESS_KEY", ACCESS_KEY)
+    monkeypatch.setattr(config, "CONFIG_FILE", str(tmp_path / "config"))
+    monkeypatch.setattr(config, "PROJECT_FILE", str(tmp_path / "projects"))
+    monkeypatch.setattr(config, "REGISTRY_FILE", str(tmp_path / "registry"))
+    monkeypatch.setattr(linker, "LINKER_DIR", str(tmp_path / "linker"))
+    with MockServer() as server:
+        for module in (aio, config, files, ingest, project):
+            monkeypatch.setattr(module, "BASE_API_ENDPOINT", server.url)
+        server.client = client.get_client(ACCESS_KEY)
+        yield server
+
+
+@pytest.fixture
+def create_project(mock_server):
+    """
+    Function to create a project on the mock server, with `records_num`
+    records and their datafiles "/data/{i}.png" in the linker.
+    It returns the project uid.
+    """
+
+    def create(project_name, records_num=0):
+        res = mock_server.client.request(
+            "POST",
+            f"{mock_server.url}/projects?user={USER_ID}",
+            data=json.dumps({"ProjectName": project_name, "PrivateProject": 0}),
+        )
+        project_uid = res.json()["ProjectUid"]
+        if records_num > 0:
+            records = [
+                {"FileHash": f"hash{i}", "label": ["cat", "dog"][i % 2], "id": str(i)}
+                for i in range(records_num)
+            ]
+            url = f"{mock_server.url}/project/{project_uid}?user={USER_ID}"
+            BatchUploader(url, client=mock_server.client).upload(records)
+            linker.update_linker(
+                project_uid, {f"hash{i}": f"/data/{i}.png" for i in range(records_num)}
+            )
+        return project_uid
+
+    return create
+
+
+@pytest.fixture
+def mock_project(mock_server, create_project):
+    """
+    Mock server with "project_a" of 20 records, labeled "cat" and "dog" alternately.
+    """
+    mock_server.project_uid = create_project("project_a", records_num=20)
+    return mock_server
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import time
+import asyncio
+
+import pytest
+
+from base.aio import AsyncProject
+
+USER_ID = "test@adansons.co.jp"
+ACCESS_KEY = "test-key"
+
+
+@pytest.fixture
+def projects(mock_server, create_project):
+    mock_server.latency = 0.05
+    project_names = ["project_a", "project_b"]
+    for name in project_names:
+        create_project(name)
+
+    async def create():
+        return await asyncio.gather(
+            *[
+                AsyncProject.create(name, user_id=USER_ID, access_key=ACCESS_KEY)
+                for name in project_names
+            ]
+        )
+
+    return asyncio.run(create())
+
+
+def make_datafiles(dir_path, num):
+    for label in ("cat", "dog"):
+        (dir_path / label).mkdir(parents=True)
+        for i in range(num):
+            (dir_path / label / f"{i}.txt").write_text(f"{dir_path} {label} {i}")
+
+
+def test_concurrent_projects(projects, tmp_path):
+    for i in range(len(projects)):
+        make_datafiles(tmp_path / f"data{i}", 10)
+
+    async def run():
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(time.time())
+                await asyncio.sleep(0.01)
+
+        tick_task = asyncio.ensure_future(ticker())
+        counts = await asyncio.gather(
+            *[
+                p.add_datafiles(
+                    str(tmp_path / f"data{i}"),
+                    "txt",
+                    attributes={"project": str(i)},
+                    parsing_rule="{label}/{id}.txt",
+                )
+                for i, p in enumerate(projects)
+            ]
+        )
+        results = await asyncio.gather(
+            *[p.files(conditions="dog", sort_key="id") for p in projects]
+        )
+        summaries = await asyncio.gather(*[p.get_metadata_summary() for p in projects])
+        await asyncio.gather(*[p.wait_for_tables(interval=0.01) for p in projects])
+        tick_task.cancel()
+        return counts, results, summaries, ticks
+
+    counts, results, summaries, ticks = asyncio.run(run())
+    assert counts == [20, 20]
+    for i, result in enumerate(results):
+        assert len(result) == 10
+        assert all(f.label == "dog" and f.project == str(i) for f in result)
+        assert all(path.startswith(str(tmp_path / f"data{i}")) for path in result.paths)
+    for summary in summaries:
+        assert {key["KeyName"] for key in summary} == {"label", "id", "project"}
+    # the event loop kept running while requests were in flight
+    assert len(ticks) > 10
+
+
+def test_async_files_filter(projects, tmp_path):
+    make_datafiles(tmp_path / "data", 5)
+    p = projects[0]
+
+    async def run():
+        await p.add_datafiles(
+            str(tmp_path / "data"), "txt", parsing_rule="{label}/{id}.txt"
+        )
+        result = await p.files()
+        cats = await result.filter(conditions="cat")
+        dogs = await result.filter(query=["label == dog"])
+        return result, cats, dogs
+
+    result, cats, dogs = asyncio.run(run())
+    assert len(result) == 10
+    assert sorted(cats.paths + dogs.paths) == sorted(result.paths)
+    assert [f.label for f in cats] == ["cat"] * 5
+    assert len(cats | dogs) == 10
+
+
+def test_add_multiple_directories(projects, tmp_path):
+    make_datafiles(tmp_path / "train", 5)
+    (tmp_path / "test" / "images" / "cat").mkdir(parents=True)
+    for i in range(3):
+        (tmp_path / "test" / "images" / "cat" / f"{i}.txt").write_text(f"test {i}")
+    p = projects[0]
+    specs = [
+        {
+            "Directory": str(tmp_path / "train"),
+            "Extension": "txt",
+            "ParsingRule": "{label}/{id}.txt",
+            "Attributes": {"split": "train"},
+        },
+        {
+            "Directory": str(tmp_path / "test"),
+            "Extension": ".txt",
+            "ParsingRule": "{_}/{label}/{id}.txt",
+            "Attributes": {"split": "test"},
+        },
+    ]
+
+    async def run():
+        file_num = await p.add_datafiles(
+            attributes={"source": "local"}, specs=specs, max_workers=2
+        )
+        return file_num, await p.files(conditions="cat")
+
+    file_num, cats = asyncio.run(run())
+    assert file_num == 13
+    assert p.project.import_report["RecordCount"] == 13
+    assert sorted((f.split, f.id) for f in cats) == sorted(
+        [("train", str(i)) for i in range(5)] + [("test", str(i)) for i in range(3)]
+    )
+    assert all(f.source == "local" for f in cats)
+
+    with pytest.raises(ValueError):
+        asyncio.run(p.add_datafiles(str(tmp_path / "train"), "txt", specs=specs))
+    with pytest.raises(ValueError):
+        asyncio.run(p.add_datafiles(specs=[{"Directory": str(tmp_path / "test")}]))
+    # no datafiles with the extension in a directory
+    with pytest.raises(ValueError):
+        asyncio.run(p.add_datafiles(specs=[*specs, {**specs[0], "Extension": "png"}]))
+
+
+def test_create_without_blocking(mock_server, create_project):
+    mock_server.latency = 0.2
+    project_uid = create_project("project_a")
+
+    async def run():
+        ticks = []
+
+        async def tick():
+            while True:
+                ticks.append(time.time())
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(tick())
+        # the project is not found locally, the project list is updated
+        p = await AsyncProject.create(
+            "project_a", user_id=USER_ID, access_key=ACCESS_KEY
+        )
+        ticker.cancel()
+        return p, ticks
+
+    p, ticks = asyncio.run(run())
+    assert p.project_uid == project_uid
+    # the event loop kept running while the project list was updated
+    assert len(ticks) >= 10
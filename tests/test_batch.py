@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import threading
+import time
+
+import pytest
+
+from base import daemon, files
+from base.batch import BatchPlan, BatchRunner, BatchStep
+
+
+def test_plan(tmp_path):
+    plan_path = tmp_path / "plan.yaml"
+    plan_path.write_text(
+        "steps:\n"
+        "  - run: new project_a\n"
+        "  - name: search\n"
+        "    run: base search project_a -q 'label == cat'\n"
+        "  - run: [list]\n"
+    )
+    plan = BatchPlan.load(str(plan_path))
+    # steps without "needs" run in order
+    assert [(step.name, step.needs) for step in plan.steps] == [
+        ("step1", []),
+        ("search", ["step1"]),
+        ("step3", ["search"]),
+    ]
+    assert plan.steps[1].args == ["search", "project_a", "-q", "label == cat"]
+    assert plan.concurrency is None
+
+    plan = BatchPlan.from_dict(
+        {
+            "concurrency": 2,
+            "steps": [
+                {"name": "export", "run": "search a", "needs": ["import"]},
+                {"name": "import", "run": "import a", "needs": "new"},
+                {"name": "new", "run": "new a"},
+                {"name": "list", "run": "list", "needs": []},
+            ],
+        }
+    )
+    assert [step.name for step in plan.steps] == ["new", "list", "import", "export"]
+    assert plan.concurrency == 2
+
+
+@pytest.mark.parametrize(
+    "steps",
+    [
+        [BatchStep("a", ["daemon", "stop"])],
+        [BatchStep("a", ["list"]), BatchStep("a", ["list"])],
+        [BatchStep("a", ["list"], needs=["b"])],
+        [BatchStep("a", ["list"], needs=["b"]), BatchStep("b", ["list"], ["a"])],
+    ],
+)
+def test_invalid_plan(steps):
+    with pytest.raises(ValueError):
+        BatchPlan(steps)
+
+
+def test_run_batch(mock_project, tmp_path, capsys):
+    output_path = tmp_path / "cat.csv"
+    plan = BatchPlan.from_dict(
+        {
+            "steps": [
+                {"name": "count", "run": "search project_a --count", "needs": []},
+                {
+                    "name": "export",
+                    "run": ["search", "project_a", "-c", "cat", "-s"]
+                    + ["-e", "csv", "-o", str(output_path)],
+                    "needs": [],
+                },
+                {"name": "unknown", "run": "show project_b", "needs": []},
+                # commands echo the error, and exit with non-zero code
+                {"name": "xml", "run": "search project_a -e xml", "needs": []},
+                {
+                    "name": "mismatch",
+                    "run": "import project_a -d a -d b -d c -e txt -e png",
+                    "needs": [],
+                },
+                {"name": "after", "run": "list", "needs": ["unknown"]},
+                {"name": "after-xml", "run": "list", "needs": ["xml"]},
+            ]
+        }
+    )
+    report = BatchRunner(plan, concurrency=2).run()
+
+    assert [(step["Name"], step["Status"]) for step in report["Steps"]] == [
+        ("count", "Succeeded"),
+        ("export", "Succeeded"),
+        ("unknown", "Failed"),
+        ("xml", "Failed"),
+        ("mismatch", "Failed"),
+        ("after", "Skipped"),
+        ("after-xml", "Skipped"),
+    ]
+    assert len(output_path.read_text().splitlines()) == 11
+    # output lines are written with the step name
+    lines = capsys.readouterr().out.splitlines()
+    assert "[count] 20" in lines
+    assert "[export] 10 files" in lines
+    assert files.SEARCH_CACHE is None
+
+
+def test_imports_of_same_project(monkeypatch):
+    lock = threading.Lock()
+    importing = []
+    overlapped = []
+
+    def run_cli(args, local=False):
+        with lock:
+            importing.append(args[1])
+            overlapped.append(list(importing))
+        time.sleep(0.1)
+        with lock:
+            importing.remove(args[1])
+        return 0
+
+    monkeypatch.setattr(daemon, "_run_cli", run_cli)
+    plan = BatchPlan.from_dict(
+        {
+            "steps": [
+                {"name": "train", "run": "import project_a -d train", "needs": []},
+                {"name": "test", "run": "import project_a -d test", "needs": []},
+                {"name": "other", "run": "import project_b -d train", "needs": []},
+            ]
+        }
+    )
+    report = BatchRunner(plan, concurrency=3).run()
+
+    assert all(step["Status"] == "Succeeded" for step in report["Steps"])
+    # imports of the same project share the checkpoint, they never run at once
+    assert all(projects.count("project_a") <= 1 for projects in overlapped)
+    assert ["project_a", "project_b"] in overlapped
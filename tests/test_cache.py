@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import time
+
+import pytest
+import requests
+
+from base.cache import ResponseCache, SearchCache
+from base.client import APIClient
+
+ETAG = '"v1"'
+
+
+def make_response(status_code, body=b"", headers={}):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = body
+    response.headers.update(headers)
+    return response
+
+
+@pytest.fixture
+def server(monkeypatch):
+    calls = []
+
+    def request(self, method, url, **kwargs):
+        calls.append((method, kwargs["headers"]))
+        if method != "GET":
+            return make_response(200)
+        if kwargs["headers"].get("If-None-Match") == ETAG:
+            return make_response(304)
+        return make_response(200, b'{"Projects": []}', {"ETag": ETAG})
+
+    monkeypatch.setattr(requests.Session, "request", request)
+    return calls
+
+
+def test_fresh_response(server, tmp_path):
+    client = APIClient("test-key", cache=ResponseCache(str(tmp_path), ttl=60))
+    for _ in range(3):
+        res = client.request("GET", "http://localhost/projects", cache=True)
+        assert res.json() == {"Projects": []}
+    assert len(server) == 1
+
+
+def test_revalidate_after_ttl(server, tmp_path):
+    client = APIClient("test-key", cache=ResponseCache(str(tmp_path), ttl=0))
+    client.request("GET", "http://localhost/projects", cache=True)
+    res = client.request("GET", "http://localhost/projects", cache=True)
+    assert res.status_code == 200
+    assert res.json() == {"Projects": []}
+    assert [h.get("If-None-Match") for _, h in server] == [None, ETAG]
+
+
+def test_invalidate_on_modification(server, tmp_path):
+    client = APIClient("test-key", cache=ResponseCache(str(tmp_path), ttl=60))
+    client.request("GET", "http://localhost/projects", cache=True)
+    time.sleep(0.01)
+    client.request("POST", "http://localhost/projects", data="{}")
+    client.request("GET", "http://localhost/projects", cache=True)
+    assert [(m, h.get("If-None-Match")) for m, h in server] == [
+        ("GET", None),
+        ("POST", None),
+        ("GET", ETAG),
+    ]
+
+
+def test_scope_by_access_key(server, tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=60)
+    APIClient("key-a", cache=cache).request("GET", "http://localhost/a", cache=True)
+    APIClient("key-b", cache=cache).request("GET", "http://localhost/a", cache=True)
+    assert len(server) == 2
+
+
+def test_search_cache():
+    cache = SearchCache(ttl=60, max_entries=2)
+    cache.put("project_a", "url1", [{"FileHash": "hash1"}])
+    cache.put("project_a", "url2", [])
+    assert cache.get("project_a", "url1") == [{"FileHash": "hash1"}]
+    # the least recently used result is dropped
+    cache.put("project_b", "url1", [])
+    assert cache.get("project_a", "url2") is None
+    assert cache.hits == 1
+
+    cache.invalidate("project_a")
+    assert cache.get("project_a", "url1") is None
+    assert cache.get("project_b", "url1") == []
+
+    cache.ttl = 0
+    assert cache.get("project_b", "url1") is None
+    assert len(cache) == 0
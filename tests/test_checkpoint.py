@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from base import checkpoint
+from base.checkpoint import ImportCheckpoint
+
+PROJECT_UID = "test_project_uid"
+SIGNATURE = {"DirPath": "/data", "Extension": "png", "Attributes": {}}
+
+
+def test_resume_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_DIR", str(tmp_path))
+
+    ckpt = ImportCheckpoint(PROJECT_UID, SIGNATURE)
+    ckpt.clear()
+    ckpt.save()
+    for i in range(5):
+        ckpt.add_record(f"/data/{i}.png", {"FileHash": str(i)})
+    ckpt.mark_linked()
+    ckpt.mark_uploaded("batch1", 2)
+
+    resumed = ImportCheckpoint(PROJECT_UID, SIGNATURE)
+    assert resumed.load()
+    assert resumed.linked
+    assert resumed.uploaded_batches == ["batch1"]
+    assert resumed.paths == [f"/data/{i}.png" for i in range(5)]
+    assert resumed.pending_records() == [{"FileHash": str(i)} for i in range(2, 5)]
+
+    other = ImportCheckpoint(PROJECT_UID, {**SIGNATURE, "Extension": "jpg"})
+    assert not other.load()
+
+    resumed.remove()
+    assert not os.path.exists(os.path.join(str(tmp_path), PROJECT_UID))
+
+
+def test_records_without_close(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_DIR", str(tmp_path))
+
+    ckpt = ImportCheckpoint(PROJECT_UID, SIGNATURE)
+    ckpt.clear()
+    ckpt.save()
+    ckpt.add_record("/data/0.png", {"FileHash": "0"})
+    monkeypatch.setattr(checkpoint, "FLUSH_INTERVAL", 0.0)
+    ckpt.add_record("/data/1.png", {"FileHash": "1"})
+    monkeypatch.setattr(checkpoint, "FLUSH_INTERVAL", 3600.0)
+    ckpt.add_record("/data/2.png", {"FileHash": "2"})
+
+    # the import is killed while calculating filehashs
+    resumed = ImportCheckpoint(PROJECT_UID, SIGNATURE)
+    assert resumed.load()
+    assert resumed.paths == ["/data/0.png", "/data/1.png"]
+    ckpt.close()
+
+
+def test_broken_record_line(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_DIR", str(tmp_path))
+
+    ckpt = ImportCheckpoint(PROJECT_UID, SIGNATURE)
+    ckpt.save()
+    ckpt.add_record("/data/0.png", {"FileHash": "0"})
+    ckpt.close()
+    with open(ckpt.records_location, "a", encoding="utf-8") as f:
+        f.write('{"FilePath": "/data/1.png", "Rec')
+
+    resumed = ImportCheckpoint(PROJECT_UID, SIGNATURE)
+    assert resumed.load()
+    assert resumed.paths == ["/data/0.png"]
+    resumed.add_record("/data/1.png", {"FileHash": "1"})
+    resumed.close()
+
+    reloaded = ImportCheckpoint(PROJECT_UID, SIGNATURE)
+    assert reloaded.load()
+    assert reloaded.paths == ["/data/0.png", "/data/1.png"]
+
+
+def test_imports_on_same_project(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_DIR", str(tmp_path))
+
+    train = ImportCheckpoint(PROJECT_UID, SIGNATURE)
+    test = ImportCheckpoint(PROJECT_UID, {**SIGNATURE, "DirPath": "/test"})
+    assert train.checkpoint_dir != test.checkpoint_dir
+
+    def run(ckpt, name):
+        ckpt.clear()
+        for i in range(20):
+            ckpt.add_record(f"/{name}/{i}.png", {"FileHash": f"{name}{i}"})
+            ckpt.mark_uploaded(f"batch{i}", i + 1)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        list(executor.map(run, [train, test], ["train", "test"]))
+
+    # removing one checkpoint keeps the other import resumable
+    train.remove()
+    resumed = ImportCheckpoint(PROJECT_UID, {**SIGNATURE, "DirPath": "/test"})
+    assert resumed.load()
+    assert resumed.uploaded_num == 20
+    assert resumed.paths == [f"/test/{i}.png" for i in range(20)]
+
+    resumed.remove()
+    assert not os.path.exists(os.path.join(str(tmp_path), PROJECT_UID))
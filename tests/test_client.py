@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import gc
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from base.client import APIClient, get_client
+from base.retry import RetryPolicy
+
+
+@pytest.fixture
+def sent(monkeypatch, dummy_response):
+    calls = []
+
+    def request(self, method, url, **kwargs):
+        calls.append((self, method, url, kwargs))
+        return dummy_response(404 if url.endswith("missing") else 200)
+
+    monkeypatch.setattr(requests.Session, "request", request)
+    return calls
+
+
+def test_pooled_session(sent):
+    client = APIClient(access_key="test-key", pool_size=4)
+    client.request("GET", "http://localhost/a")
+    client.request("POST", "http://localhost/b", data="{}")
+    assert [call[0] for call in sent] == [client.session, client.session]
+    assert client.session.get_adapter("https://localhost")._pool_maxsize == 4
+
+    _, method, _, kwargs = sent[1]
+    assert method == "POST"
+    assert kwargs["headers"] == {
+        "Content-Type": "application/json",
+        "x-api-key": "test-key",
+    }
+    assert kwargs["timeout"] == client.retry_policy.timeout
+
+
+def test_unauthorized_request(sent):
+    client = APIClient(access_key="test-key")
+    client.request("GET", "http://localhost/presigned", authorized=False)
+    assert sent[0][3]["headers"] == {}
+
+
+def test_error_message(sent):
+    client = APIClient(access_key="test-key")
+    assert client.request("GET", "http://localhost/missing").status_code == 404
+    with pytest.raises(Exception, match="Failed to get"):
+        client.request("GET", "http://localhost/missing", error_message="Failed to get")
+
+
+def test_concurrent_clients(sent):
+    clients = [get_client(f"key-{i}") for i in range(4)]
+    assert get_client("key-0") is clients[0]
+
+    def call(i):
+        clients[i % 4].request("GET", f"http://localhost/{i}")
+        return id(clients[i % 4].session), threading.get_ident()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        owners = list(executor.map(call, range(64)))
+
+    for _, _, url, kwargs in sent:
+        i = int(url.rsplit("/", 1)[-1])
+        assert kwargs["headers"]["x-api-key"] == f"key-{i % 4}"
+    # each session is used by only one thread
+    session_threads = {}
+    for session_id, thread_id in owners:
+        session_threads.setdefault(session_id, set()).add(thread_id)
+    assert all(len(threads) == 1 for threads in session_threads.values())
+
+
+def test_governor_per_client(monkeypatch, dummy_response):
+    released = threading.Event()
+
+    def request(self, method, url, **kwargs):
+        if url.endswith("slow"):
+            released.wait(10)
+        return dummy_response(200)
+
+    monkeypatch.setattr(requests.Session, "request", request)
+    policy = RetryPolicy(max_retries=0)
+    busy = APIClient(access_key="key-a", retry_policy=policy, max_concurrency=1)
+    idle = APIClient(access_key="key-b", retry_policy=policy, max_concurrency=1)
+    assert policy.governor is None
+    assert busy.retry_policy.governor is not idle.retry_policy.governor
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(busy.request, "GET", "http://localhost/slow")
+        while busy.retry_policy.governor.acquire(blocking=False):
+            busy.retry_policy.governor.release()
+        # the saturated client never blocks requests of the other client
+        assert idle.request("GET", "http://localhost/a").status_code == 200
+        assert not busy.retry_policy.governor.acquire(timeout=0.1)
+        released.set()
+        assert future.result().status_code == 200
+    assert busy.retry_policy.governor.acquire(blocking=False)
+
+
+def test_sessions_of_finished_threads(monkeypatch, dummy_response):
+    # `sent` keeps the sessions alive, do not record them here
+    monkeypatch.setattr(
+        requests.Session, "request", lambda *args, **kwargs: dummy_response(200)
+    )
+    client = APIClient(access_key="test-key")
+    for i in range(20):
+        # e.g. update_project_info starts new threads on each call
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(client.request, ["GET"] * 2, ["http://localhost/a"] * 2))
+    gc.collect()
+    assert len(client._sessions) <= 2
+    client.close()
+    assert len(client._sessions) == 0
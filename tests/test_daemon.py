@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import io
+import os
+import json
+import functools
+
+import pytest
+from click.testing import CliRunner
+
+from base import config, files, linker, project
+from base.cli import main
+from base.daemon import (
+    Daemon,
+    forward_command,
+    get_daemon_status,
+    notify_modified,
+)
+
+USER_ID = "test@adansons.co.jp"
+
+
+@pytest.fixture
+def daemon(mock_project, tmp_path):
+    with Daemon(str(tmp_path / "daemon.sock"), cache_ttl=60) as daemon:
+        daemon.server = mock_project
+        yield daemon
+
+
+def run(daemon, args):
+    stdout, stderr = io.StringIO(), io.StringIO()
+    exit_code = forward_command(args, daemon.socket_path, stdout, stderr)
+    return exit_code, stdout.getvalue()
+
+
+def test_forward_search(daemon):
+    exit_code, output = run(daemon, ["search", "project_a", "-c", "cat"])
+    assert exit_code == 0
+    assert output.startswith("10 files\n")
+    assert "'FilePath': '/data/0.png'" in output
+
+    # the registry and the search result are warm
+    requests_num = daemon.server.stats["Requests"]
+    exit_code, output = run(daemon, ["search", "project_a", "-q", "label == dog"])
+    assert exit_code == 0
+    assert output.startswith("10 files\n")
+    exit_code, output = run(daemon, ["search", "project_a", "-c", "cat", "-s"])
+    assert output == "10 files\n"
+    assert daemon.search_cache.hits == 1
+    assert daemon.server.stats["Requests"] == requests_num + 2
+
+    status = get_daemon_status(daemon.socket_path)
+    assert status["Pid"] == os.getpid()
+    assert status["Commands"] == 3
+    assert status["CachedSearches"] == 2
+
+    notify_modified("project_a", daemon.socket_path)
+    assert len(daemon.search_cache) == 0
+
+
+def test_export_in_caller_directory(daemon, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    exit_code, _ = run(daemon, ["search", "project_a", "-e", "json", "-s"])
+    assert exit_code == 0
+    with open(tmp_path / "dataset.json", encoding="utf-8") as f:
+        assert len(json.load(f)["Data"]) == 20
+
+
+def test_not_forwarded(daemon, monkeypatch):
+    # commands which prompt or read local datafiles run in the caller
+    assert run(daemon, ["import", "project_a"])[0] is None
+    assert run(daemon, [])[0] is None
+
+    monkeypatch.setenv("BASE_USER_ID", "other@adansons.co.jp")
+    assert run(daemon, ["list"])[0] is None
+    monkeypatch.setenv("BASE_USER_ID", USER_ID)
+    assert run(daemon, ["list"])[0] == 0
+
+    daemon.stop()
+    assert not os.path.exists(daemon.socket_path)
+    assert get_daemon_status(daemon.socket_path) is None
+    assert run(daemon, ["list"])[0] is None
+
+
+def test_linker_reload(tmp_path, monkeypatch):
+    monkeypatch.setattr(linker, "LINKER_DIR", str(tmp_path / "linker"))
+    linker.update_linker("project_uid", {"hash1": "/data/1.png"})
+    hash_dict = linker.load_linker("project_uid")
+    assert linker.load_linker("project_uid") is hash_dict
+
+    linker.update_linker("project_uid", {"hash2": "/data/2.png"})
+    assert linker.load_linker("project_uid") == {
+        "hash1": "/data/1.png",
+        "hash2": "/data/2.png",
+    }
+    assert hash_dict == {"hash1": "/data/1.png"}
+
+
+def test_start_without_access_key(monkeypatch, tmp_path):
+    monkeypatch.delenv("BASE_USER_ID", raising=False)
+    monkeypatch.delenv("BASE_ACCESS_KEY", raising=False)
+    monkeypatch.setattr(config, "CONFIG_FILE", str(tmp_path / "config"))
+
+    result = CliRunner().invoke(main, ["daemon", "start"])
+    assert result.exit_code == 1
+    assert "Please configure your access key first." in result.output
+
+
+def test_invalidate_on_sdk_import(daemon, monkeypatch, tmp_path):
+    exit_code, output = run(daemon, ["search", "project_a", "-c", "cat", "-s"])
+    assert output == "10 files\n"
+    assert len(daemon.search_cache) == 1
+
+    (tmp_path / "cat.png").write_bytes(b"cat")
+    with monkeypatch.context() as m:
+        # the daemon runs in this process, notify it as an SDK script does
+        m.setattr(files, "SEARCH_CACHE", None)
+        m.setattr(
+            "base.daemon.notify_modified",
+            functools.partial(notify_modified, socket_path=daemon.socket_path),
+        )
+        pjt = project.Project("project_a")
+        pjt.ingest([(str(tmp_path / "cat.png"), {"label": "cat"})])
+    assert len(daemon.search_cache) == 0
+    exit_code, output = run(daemon, ["search", "project_a", "-c", "cat", "-s"])
+    assert output == "11 files\n"
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import io
+import csv
+import json
+
+import pytest
+
+from base import export
+from base.export import (
+    collect_keys,
+    export_records,
+    get_output_path,
+    infer_column_types,
+    write_csv,
+    write_json,
+    write_jsonl,
+)
+
+RECORDS = [
+    {"FilePath": "/data/1.png", "label": "cat, black", "note": 'say "hi"'},
+    {"FilePath": "/data/2.png", "label": "dog", "size": 3},
+    {"FilePath": "/data/3.png", "label": "line\nbreak", "note": None},
+]
+
+
+def test_collect_keys():
+    assert collect_keys(RECORDS) == ["FilePath", "label", "note", "size"]
+
+
+def test_write_csv():
+    f = io.StringIO(newline="")
+    assert write_csv(RECORDS, f) == 3
+    f.seek(0)
+    rows = list(csv.DictReader(f))
+    assert [row["label"] for row in rows] == ["cat, black", "dog", "line\nbreak"]
+    assert rows[0]["note"] == 'say "hi"'
+    # missing values are empty
+    assert rows[0]["size"] == "" and rows[1]["size"] == "3"
+
+
+@pytest.mark.parametrize("records", [[], RECORDS[:1], RECORDS])
+def test_write_json(records, monkeypatch):
+    # records are written across batches
+    monkeypatch.setattr(export, "JSON_BATCH_SIZE", 2)
+    f = io.StringIO()
+    assert write_json(iter(records), f) == len(records)
+    assert f.getvalue() == json.dumps({"Data": records}, indent=4, ensure_ascii=False)
+
+
+def test_export_records(tmp_path):
+    output_path = get_output_path(str(tmp_path / "out" / "dataset.json"), "unused")
+    assert export_records(RECORDS, output_path, "JSON") == 3
+    with open(output_path, encoding="utf-8") as f:
+        assert json.load(f)["Data"] == RECORDS
+
+    # existing file is not overwritten
+    output_path = get_output_path(str(tmp_path / "out" / "dataset.json"), "unused")
+    assert output_path == str(tmp_path / "out" / "dataset (1).json")
+
+    with pytest.raises(ValueError):
+        export_records(RECORDS, str(tmp_path / "dataset.xml"), "xml")
+
+
+def test_write_jsonl(monkeypatch):
+    monkeypatch.setattr(export, "JSON_BATCH_SIZE", 2)
+    f = io.StringIO()
+    assert write_jsonl(iter(RECORDS), f) == 3
+    assert [json.loads(line) for line in f.getvalue().splitlines()] == RECORDS
+
+
+def test_infer_column_types():
+    records = [
+        {"a": 1, "b": 1, "c": "x", "d": None, "e": True, "f": [1]},
+        {"a": 2, "b": 1.5, "c": 3, "d": None, "e": False},
+    ]
+    assert infer_column_types(records) == {
+        "a": "int",
+        "b": "float",
+        "c": "string",
+        "d": "string",
+        "e": "bool",
+        "f": "string",
+    }
+
+
+@pytest.mark.parametrize("file_type", ["parquet", "feather"])
+def test_write_arrow(file_type, tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.feather
+    import pyarrow.parquet
+
+    records = [
+        {"FilePath": f"/data/{i}.png", "label": str(i % 3), "size": i * 1.5}
+        for i in range(10)
+    ]
+    records[3]["extra"] = [1, 2]
+    output_path = str(tmp_path / f"dataset.{file_type}")
+    assert export.write_arrow(records, output_path, file_type, chunk_size=4) == 10
+
+    if file_type == "parquet":
+        table = pyarrow.parquet.read_table(output_path, columns=["label", "size"])
+        assert pyarrow.parquet.ParquetFile(output_path).num_row_groups == 3
+    else:
+        table = pyarrow.feather.read_table(output_path, memory_map=True)
+        assert table.column("extra").to_pylist()[3] == "[1, 2]"
+    assert table.schema.field("size").type == pa.float64()
+    assert table.column("label").to_pylist() == [r["label"] for r in records]
+
+
+def test_arrow_requires_pyarrow(tmp_path):
+    try:
+        import pyarrow
+    except ImportError:
+        with pytest.raises(ImportError, match=r"pip install adansons-base\[arrow\]"):
+            export_records(RECORDS, str(tmp_path / "dataset.parquet"), "parquet")
+        assert not (tmp_path / "dataset.parquet").exists()
+    else:
+        pytest.skip("pyarrow is installed")
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import sys
+import subprocess
+
+# seconds, `import base.cli` took over 2 seconds with eager imports
+IMPORT_TIME_BUDGET = 0.5
+HEAVY_MODULES = ["pandas", "numpy", "sklearn", "ruamel.yaml", "requests"]
+
+
+def run_python(code):
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return res.stdout, res.stderr
+
+
+def cumulative_import_time(stderr, module):
+    for line in stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        _, cumulative, name = line.split("|")
+        if name.strip() == module:
+            return int(cumulative) / 1e6
+    raise KeyError(module)
+
+
+def test_cli_import_time():
+    code = "import sys, base.cli; print(','.join(sorted(sys.modules)))"
+    stdout, stderr = run_python(code)
+    modules = stdout.strip().split(",")
+    for module in HEAVY_MODULES:
+        assert module not in modules
+    assert cumulative_import_time(stderr, "base.cli") < IMPORT_TIME_BUDGET
+
+
+def test_lazy_attributes():
+    code = "import sys, base; base.Project; print('pandas' in sys.modules)"
+    stdout, _ = run_python(code)
+    # pandas is imported on demand, not with Project
+    assert stdout.strip() == "False"
+
+    import base
+
+    assert "Project" in dir(base)
+    assert base.Dataset.__module__ == "base.dataset"
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import os
+import json
+import time
+import hashlib
+import multiprocessing
+
+import pytest
+import requests
+
+from base import linker
+from base.client import APIClient
+from base.ingest import IngestWriter
+
+CLIENT = APIClient(access_key="test-key")
+
+
+@pytest.fixture
+def posted(monkeypatch, tmp_path, dummy_response):
+    batches = []
+
+    def request(self, method, url, data, headers, timeout):
+        batches.append(json.loads(data)["Items"])
+        return dummy_response(200)
+
+    monkeypatch.setattr(requests.Session, "request", request)
+    monkeypatch.setattr(linker, "LINKER_DIR", str(tmp_path / "linker"))
+    return batches
+
+
+def test_write_paths_and_bytes(posted, tmp_path):
+    file_path = tmp_path / "sample.txt"
+    file_path.write_bytes(b"sample")
+
+    with IngestWriter("uid", "user", client=CLIENT, attributes={"rig": "A"}) as writer:
+        path_hash = writer.write(str(file_path), {"label": "1"})
+        bytes_hash = writer.write(b"blob", {"label": "2"})
+
+    assert path_hash == hashlib.sha256(b"sample").hexdigest()
+    assert bytes_hash == hashlib.sha256(b"blob").hexdigest()
+    assert [r for batch in posted for r in batch] == [
+        {"FileHash": path_hash, "rig": "A", "label": "1"},
+        {"FileHash": bytes_hash, "rig": "A", "label": "2"},
+    ]
+    assert writer.uploaded_num == 2
+    # only datafiles with a local path are linked
+    assert linker.load_linker("uid") == {path_hash: str(file_path)}
+
+
+def test_flush_by_size(posted):
+    with IngestWriter("uid", "user", client=CLIENT, max_batch_records=10) as writer:
+        writer.write_many(str(i).encode() for i in range(35))
+    assert [len(batch) for batch in posted] == [10, 10, 10, 5]
+    assert writer.record_num == writer.uploaded_num == 35
+
+
+def test_flush_by_latency(posted):
+    writer = IngestWriter("uid", "user", client=CLIENT, max_latency=0.1)
+    writer.write(b"first")
+    deadline = time.time() + 5
+    while not posted and time.time() < deadline:
+        time.sleep(0.05)
+    assert posted == [[{"FileHash": hashlib.sha256(b"first").hexdigest()}]]
+    writer.close()
+    with pytest.raises(ValueError):
+        writer.write(b"second")
+
+
+def update_linker(index):
+    for i in range(20):
+        linker.update_linker("uid", {f"hash{index}-{i}": f"/data/{index}/{i}.txt"})
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="linker is locked by fcntl")
+def test_update_linker_from_processes(monkeypatch, tmp_path):
+    # e.g. the job worker, the daemon and SDK write the linker of the project
+    monkeypatch.setattr(linker, "LINKER_DIR", str(tmp_path / "linker"))
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        pool.map(update_linker, range(4))
+
+    assert len(linker.load_linker("uid")) == 80
+    # no tmp files are left
+    assert sorted(os.listdir(tmp_path / "linker" / "uid")) == [
+        "linked_hash.json",
+        "linked_hash.json.lock",
+    ]
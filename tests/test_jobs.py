@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import os
+import importlib.util
+
+import pytest
+from click.testing import CliRunner
+
+from base.cli import main, queue_import
+from base.jobs import JobQueue
+from base.mock_server import MockServer
+
+# jobs run in the repository root, so that `python -m base.jobs` imports this tree
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+USER_ID = "test@adansons.co.jp"
+ACCESS_KEY = "test-key"
+
+
+@pytest.fixture
+def env(tmp_path):
+    with MockServer() as server:
+        yield {
+            "HOME": str(tmp_path / "home"),
+            "BASE_API_ENDPOINT": server.url,
+            "BASE_ACCESS_KEY": ACCESS_KEY,
+            "BASE_USER_ID": USER_ID,
+        }
+
+
+def test_run_jobs(env, tmp_path):
+    for label in ("cat", "dog"):
+        (tmp_path / "data" / label).mkdir(parents=True)
+        for i in range(5):
+            (tmp_path / "data" / label / f"{i}.txt").write_text(f"{label} {i}")
+
+    queue = JobQueue(str(tmp_path / "jobs"))
+
+    def submit(args):
+        return queue.submit(args, cwd=ROOT_DIR, env=env, start_worker=False)
+
+    # jobs of the same project run one by one in order of submission
+    submit(["new", "project_a"])
+    # the job can not prompt the parsing rule, nothing answers it
+    submit(["import", "project_a", "-d", str(tmp_path / "data"), "-e", "txt"])
+    submit(["show", "project_b"])
+    canceled = submit(["list"])
+    assert queue.cancel(canceled["JobId"])["Status"] == "Canceled"
+    assert [job["Status"] for job in queue.list_jobs()] == ["Queued"] * 3 + ["Canceled"]
+    # the environment is kept in the job file only, it can have the access key
+    assert "Env" not in queue.get_job("1")
+
+    queue.run_worker(concurrency=2, poll_interval=0.05)
+    assert not queue.is_worker_running()
+
+    jobs = queue.list_jobs()
+    assert [job["Status"] for job in jobs] == [
+        "Succeeded",
+        "Failed",
+        "Failed",
+        "Canceled",
+    ]
+    assert all(job["Attempts"] == 1 for job in jobs[:3])
+    assert jobs[2]["ExitCode"] != 0
+
+    submit(
+        ["import", "project_a", "-d", str(tmp_path / "data"), "-e", "txt"]
+        + ["-c", "{label}/{id}.txt", "--resume"]
+    )
+    queue.run_worker(poll_interval=0.05)
+    assert queue.get_job("5")["Status"] == "Succeeded"
+    assert queue.read_log("5", lines=1) == "Success!\n"
+    assert queue.get_progress("5").startswith("stage=uploading count=10 total=10")
+
+    with pytest.raises(Exception):
+        queue.get_job("6")
+    with pytest.raises(Exception):
+        queue.cancel("5")
+
+
+def test_unsupported_platform(monkeypatch, tmp_path):
+    find_spec = importlib.util.find_spec
+    # e.g. Windows, which has no fcntl
+    monkeypatch.setattr(
+        importlib.util,
+        "find_spec",
+        lambda name, *args: None if name == "fcntl" else find_spec(name, *args),
+    )
+    with pytest.raises(Exception, match="not supported"):
+        JobQueue(str(tmp_path / "jobs"))
+
+    result = CliRunner().invoke(main, ["jobs", "list"])
+    assert result.exit_code == 1
+    assert "base jobs are not supported on this platform" in result.output
+
+
+def test_queue_import_without_options():
+    # the job can not prompt, it fails instead of queueing
+    with pytest.raises(SystemExit) as e:
+        queue_import("project_a", False, ("data",), ("txt",), (), {})
+    assert e.value.code == 1
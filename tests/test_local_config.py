@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import os
+import configparser
+import multiprocessing
+
+import pytest
+
+from base import config
+from base.config import LocalConfig
+
+USER_ID = "test@adansons.co.jp"
+
+
+@pytest.fixture
+def local_config(monkeypatch, tmp_path):
+    monkeypatch.delenv("BASE_USER_ID", raising=False)
+    monkeypatch.delenv("BASE_ACCESS_KEY", raising=False)
+    monkeypatch.setattr(config, "CONFIG_FILE", str(tmp_path / "config"))
+    monkeypatch.setattr(config, "PROJECT_FILE", str(tmp_path / "projects"))
+    (tmp_path / "config").write_text("[default]\naccess_key = test-key\n")
+
+    reads = []
+    read = configparser.ConfigParser.read
+
+    def count_read(self, filenames, encoding=None):
+        reads.append(filenames)
+        return read(self, filenames, encoding)
+
+    monkeypatch.setattr(configparser.ConfigParser, "read", count_read)
+    local_config = config.get_config()
+    local_config.reads = reads
+    return local_config
+
+
+def test_load_once(local_config):
+    config.register_user_id(USER_ID)
+    config.register_project_uid(USER_ID, "project_a", "uid_a")
+    local_config.reads.clear()
+
+    for _ in range(10):
+        assert config.get_user_id() == USER_ID
+        assert config.get_access_key() == "test-key"
+        assert config.check_project_exists(USER_ID, "project_a")
+        assert config.get_project_uid(USER_ID, "project_a") == "uid_a"
+    assert local_config.reads == [config.CONFIG_FILE, config.PROJECT_FILE]
+    assert config.get_config() is local_config
+
+
+def test_reload_on_change(local_config):
+    config.register_user_id(USER_ID)
+    config.register_project_uid(USER_ID, "project_a", "uid_a")
+    assert config.get_project_uid(USER_ID, "project_a") == "uid_a"
+
+    config.register_project_uid(USER_ID, "project_a", "uid_b")
+    assert config.get_project_uid(USER_ID, "project_a") == "uid_b"
+    config.delete_project_config(USER_ID, "project_a")
+    assert not config.check_project_exists(USER_ID, "project_a")
+    with pytest.raises(KeyError):
+        config.get_project_uid(USER_ID, "project_a")
+    with pytest.raises(KeyError):
+        config.check_project_exists("unknown@adansons.co.jp", "project_a")
+
+    # written by other process
+    with open(config.CONFIG_FILE, "w") as f:
+        f.write("[default]\naccess_key = new-key\nuser_id = other\n")
+    assert config.get_access_key() == "new-key"
+
+
+def test_environment_variables(monkeypatch, tmp_path):
+    monkeypatch.setenv("BASE_USER_ID", "env@adansons.co.jp")
+    monkeypatch.setenv("BASE_ACCESS_KEY", "env-key")
+    local_config = LocalConfig(str(tmp_path / "config"), str(tmp_path / "projects"))
+    # environment variables are read once
+    monkeypatch.delenv("BASE_USER_ID")
+    assert local_config.get_user_id() == "env@adansons.co.jp"
+    assert local_config.get_access_key() == "env-key"
+
+
+def register_projects(index):
+    for i in range(20):
+        config.register_project_uid(USER_ID, f"project{index}-{i}", f"uid{i}")
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="processes are forked")
+def test_write_from_processes(local_config, tmp_path):
+    # e.g. the CLI, daemon and job worker update the project file at once
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        pool.map(register_projects, range(4))
+
+    # writers do not clobber tmp files of each other, and none of them is left
+    assert sorted(os.listdir(tmp_path)) == ["config", "projects"]
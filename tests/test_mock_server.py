@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import os
+import json
+import base64
+
+import pytest
+
+from base import files, linker
+from base.cache import ResponseCache
+from base.client import APIClient
+from base.mock_server import MockServer, MemoryStorage, SQLiteStorage
+from base.retry import RetryPolicy
+from base.uploader import BatchUploader
+
+TESTS_DIR = os.path.dirname(__file__)
+USER_ID = "test@adansons.co.jp"
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def server(request, tmp_path):
+    if request.param == "sqlite":
+        storage = SQLiteStorage(str(tmp_path / "mock.db"))
+    else:
+        storage = MemoryStorage()
+    with MockServer(storage=storage) as server:
+        yield server
+
+
+def make_client(tmp_path, **kwargs):
+    return APIClient(
+        "test-key", cache=ResponseCache(str(tmp_path / "cache"), ttl=0), **kwargs
+    )
+
+
+def create_project(server, client, project_name="test_project"):
+    res = client.request(
+        "POST",
+        f"{server.url}/projects?user={USER_ID}",
+        data=json.dumps({"ProjectName": project_name, "PrivateProject": 0}),
+        error_message="Failed to create project",
+    )
+    return res.json()["ProjectUid"]
+
+
+def search(server, client, project_uid, conditions=[]):
+    url = f"{server.url}/project/{project_uid}/files"
+    url += "".join(f"/{condition}" for condition in conditions)
+    res = client.request("GET", f"{url}?user={USER_ID}")
+    res = client.request("GET", res.json()["URL"], authorized=False)
+    return res.json()["Items"]
+
+
+def test_project_lifecycle(server, tmp_path):
+    client = make_client(tmp_path)
+    project_uid = create_project(server, client)
+    url = f"{server.url}/projects?user={USER_ID}"
+
+    projects = client.request("GET", url, cache=True).json()["Projects"]
+    assert [(p["ProjectUid"], p["UserRole"]) for p in projects] == [
+        (project_uid, "Owner")
+    ]
+    # cached response is revalidated with ETag
+    assert client.request("GET", url, cache=True).json()["Projects"] == projects
+
+    project_url = f"{server.url}/project/{project_uid}"
+    assert client.request("DELETE", f"{project_url}?user={USER_ID}").status_code == 200
+    assert client.request("GET", url).json()["Projects"] == []
+    archived = client.request("GET", url + "&archived=1").json()["Projects"]
+    assert [p["ProjectUid"] for p in archived] == [project_uid]
+
+    res = client.request("DELETE", f"{project_url}/confirm?user={USER_ID}")
+    assert res.status_code == 200
+    assert client.request("GET", url + "&archived=1").json()["Projects"] == []
+
+
+def test_upload_search_and_join(server, tmp_path):
+    client = make_client(tmp_path)
+    project_uid = create_project(server, client)
+    url = f"{server.url}/project/{project_uid}?user={USER_ID}"
+
+    records = [{"FileHash": f"hash{i}", "key1": str(i)} for i in range(1, 11)]
+    uploader = BatchUploader(url, client=client, common_attributes={"split": "train"})
+    assert uploader.upload(records) == 10
+    assert len(search(server, client, project_uid)) == 10
+    assert len(search(server, client, project_uid, ["1", "4"])) == 2
+
+    # extract the external csv, estimate the join rule and join it
+    with open(os.path.join(TESTS_DIR, "data", "sample.csv"), "rb") as f:
+        item = {"Items": base64.b64encode(f.read()).decode(), "is_csv": 1}
+    res = client.request(
+        "POST",
+        f"{server.url}/project/{project_uid}/meta_file?user={USER_ID}",
+        data=json.dumps(item),
+    )
+    tables = client.request("GET", res.json()["URL"], authorized=False).json()
+    table = tables["Items"][0]
+    assert table[0] == {"key1": 1, "key2": 2, "key3": 3}
+
+    res = client.request("PUT", url, data=json.dumps({"Items": table}))
+    update_rule = res.json()["UpdateRule"]
+    assert update_rule == {"key1": "key1", "key2": None, "key3": None}
+
+    client.request(
+        "PUT",
+        f"{server.url}/project/{project_uid}/files?user={USER_ID}",
+        data=json.dumps({"Items": table, "UpdateRule": update_rule}),
+        error_message="Failed to join",
+    )
+    joined = search(server, client, project_uid, ["4"])
+    assert joined == [
+        {"FileHash": "hash4", "key1": "4", "split": "train", "key2": 5, "key3": 6}
+    ]
+
+    summary = client.request("GET", url).json()["Items"]
+    summary = {key["KeyName"]: key for key in summary}
+    assert summary["key1"]["RecordedCount"] == 10
+    assert summary["key2"]["ValueType"] == "int"
+    assert summary["key2"]["UpperValue"] == "8"
+
+
+def test_files_search(server, tmp_path, monkeypatch):
+    client = make_client(tmp_path)
+    project_uid = create_project(server, client)
+    url = f"{server.url}/project/{project_uid}?user={USER_ID}"
+    records = [
+        {"FileHash": f"hash{i}", "label": str(i % 3), "split": ["train", "test"][i % 2]}
+        for i in range(30)
+    ]
+    BatchUploader(url, client=client).upload(records)
+
+    monkeypatch.setattr(files, "BASE_API_ENDPOINT", server.url)
+    monkeypatch.setattr(files, "get_project_uid", lambda user_id, name: project_uid)
+    monkeypatch.setattr(linker, "LINKER_DIR", str(tmp_path / "linker"))
+    linker.update_linker(project_uid, {f"hash{i}": f"/data/{i}.png" for i in range(30)})
+
+    result = files.Files(
+        "test_project",
+        conditions="train",
+        query=["label in ['1','2']"],
+        sort_key="label",
+        user_id=USER_ID,
+        access_key="test-key",
+    )
+    assert sorted(result.paths) == sorted(
+        f"/data/{i}.png" for i in range(0, 30, 2) if i % 3 != 0
+    )
+    assert all(f.split == "train" and f.label in ("1", "2") for f in result.files)
+    assert [f.path for f in result.filter(query=["label == 2"]).files] == [
+        f.path for f in result.files if f.label == "2"
+    ]
+
+
+def test_files_limit_and_count(server, tmp_path, monkeypatch):
+    client = make_client(tmp_path)
+    project_uid = create_project(server, client)
+    url = f"{server.url}/project/{project_uid}?user={USER_ID}"
+    records = [
+        {"FileHash": f"hash{i}", "index": i, "label": str(i % 3)} for i in range(30)
+    ]
+    BatchUploader(url, client=client).upload(records)
+
+    monkeypatch.setattr(files, "BASE_API_ENDPOINT", server.url)
+    monkeypatch.setattr(files, "get_project_uid", lambda user_id, name: project_uid)
+    monkeypatch.setattr(linker, "LINKER_DIR", str(tmp_path / "linker"))
+    linker.update_linker(project_uid, {f"hash{i}": f"/data/{i}.png" for i in range(30)})
+
+    def search_files(**kwargs):
+        return files.Files(
+            "test_project", user_id=USER_ID, access_key="test-key", **kwargs
+        )
+
+    all_files = search_files(query=["label != 0"])
+    assert len(all_files) == 20
+    assert search_files(query=["label != 0"], limit=10, offset=3).paths == (
+        all_files.paths[3:13]
+    )
+    assert len(search_files(limit=0)) == 0
+    assert len(search_files(offset=40)) == 0
+
+    # top-n of sorted files is same as slice of all sorted files
+    sorted_files = search_files(sort_key="label")
+    top_files = search_files(sort_key="label", limit=7, offset=2)
+    assert top_files.paths == sorted_files.paths[2:9]
+
+    # local paths are not resolved to count
+    monkeypatch.setattr(files, "load_linker", None)
+    file_num = files.Files.count(
+        "test_project", query=["label == 1"], user_id=USER_ID, access_key="test-key"
+    )
+    assert file_num == 10
+    with pytest.raises(ValueError):
+        search_files(limit=-1)
+    with pytest.raises(TypeError):
+        search_files(offset="1")
+
+
+def test_members(server, tmp_path):
+    client = make_client(tmp_path)
+    project_uid = create_project(server, client)
+    url = f"{server.url}/project/{project_uid}/member"
+
+    client.request(
+        "POST",
+        f"{url}?user={USER_ID}",
+        data=json.dumps({"TargetUserID": "member", "NewUserRole": "Viewer"}),
+        error_message="Failed to invite",
+    )
+    client.request(
+        "PUT",
+        f"{url}/member?user={USER_ID}",
+        data=json.dumps({"NewUserRole": "Editor"}),
+        error_message="Failed to update",
+    )
+    members = client.request("GET", f"{url}?user={USER_ID}").json()["Members"]
+    assert {m["UserID"]: m["UserRole"] for m in members} == {
+        USER_ID: "Owner",
+        "member": "Editor",
+    }
+
+    client.request("DELETE", f"{url}/member?user={USER_ID}", error_message="Failed")
+    res = client.request("DELETE", f"{url}/member?user={USER_ID}")
+    assert res.status_code == 404
+
+
+def test_failure_injection(tmp_path):
+    with MockServer(failure_rate=0.5, seed=0) as server:
+        client = make_client(
+            tmp_path, retry_policy=RetryPolicy(max_retries=10, backoff_factor=0)
+        )
+        server.failure_rate = 0
+        project_uid = create_project(server, client)
+        server.failure_rate = 0.5
+
+        url = f"{server.url}/project/{project_uid}?user={USER_ID}"
+        records = [{"FileHash": f"hash{i}", "key": str(i)} for i in range(100)]
+        uploader = BatchUploader(url, client=client, max_batch_records=10)
+        assert uploader.upload(records) == 100
+        assert server.stats["Failures"] > 0
+
+        server.failure_rate = 0
+        assert len(search(server, client, project_uid)) == 100
+
+    with MockServer(failure_rate=1.0) as server:
+        res = make_client(tmp_path).request("GET", f"{server.url}/projects")
+        assert res.status_code == 503
+
+
+def test_payload_limit_and_latency(tmp_path):
+    with MockServer(latency=0.05, max_payload_bytes=4096) as server:
+        client = make_client(tmp_path)
+        project_uid = create_project(server, client)
+
+        url = f"{server.url}/project/{project_uid}?user={USER_ID}"
+        records = [{"FileHash": f"hash{i}", "key": "x" * 100} for i in range(100)]
+        uploader = BatchUploader(url, client=client)
+        assert uploader.upload(records) == 100
+        # batches rejected with 413 are split until they fit in the limit
+        assert uploader.batch_num > 1
+        assert len(search(server, client, project_uid)) == 100
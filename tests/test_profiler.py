@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import pstats
+from concurrent.futures import ThreadPoolExecutor
+
+import base
+from base import profiler
+from base.hash import calc_file_hash
+from base.parser import Parser
+from base.profiler import profile, stage
+
+
+def test_disabled():
+    assert profiler._PROFILER is None
+    with stage("hash") as timer:
+        assert timer is None
+
+
+def test_profile_stages(tmp_path):
+    paths = []
+    for i in range(10):
+        path = tmp_path / f"{i}.txt"
+        path.write_text(str(i))
+        paths.append(str(path))
+
+    with base.profile() as p:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(calc_file_hash, paths))
+        parser = Parser("{label}/{id}.txt", extension="txt")
+        assert parser("cat/1.txt") == {"label": "cat", "id": "1"}
+        with stage("outer"):
+            with stage("inner"):
+                pass
+    assert profiler._PROFILER is None
+
+    stages = {stage["Stage"]: stage for stage in p.summary()}
+    assert stages["hash"]["Calls"] == 10
+    assert stages["parse"]["Calls"] == 1
+    assert stages["outer"]["WallTime"] >= stages["inner"]["WallTime"]
+    assert p.total_time >= stages["outer"]["WallTime"]
+
+    lines = p.format_summary().splitlines()
+    assert lines[0].split() == ["stage", "calls", "wall(s)", "cpu(s)"]
+    assert lines[-1].startswith("total")
+    assert {line.split()[0] for line in lines[1:-1]} == set(stages)
+
+
+def test_cprofile_output(tmp_path):
+    output_path = str(tmp_path / "base.prof")
+    with profile(output_path) as p:
+        calc_file_hash(__file__)
+    stats = pstats.Stats(output_path)
+    assert any(func[2] == "calc_file_hash" for func in stats.stats)
+    assert p.format_summary().endswith(f"cProfile stats: {output_path}")
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from base import progress
+from base.progress import (
+    ProgressDisplay,
+    StageProgress,
+    format_progress,
+    set_progress_mode,
+)
+
+
+def test_stage_progress(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(progress.time, "time", lambda: now[0])
+    snapshots = []
+
+    stage = StageProgress(
+        "hashing", total=100, total_bytes=1000, callback=snapshots.append
+    )
+    now[0] += 1.0
+    stage.update(10, 100)
+    assert stage.rate == 10.0
+    assert stage.byte_rate == 100.0
+    assert stage.eta == 9.0
+
+    now[0] += 1.0
+    stage.update(20, 200)
+    # smoothed rate: 0.3 * 20 + 0.7 * 10
+    assert abs(stage.rate - 13.0) < 1e-9
+    assert len(snapshots) == 2
+
+    now[0] += 0.1
+    stage.update(1, 10)
+    assert len(snapshots) == 2
+
+    stage.finish()
+    assert snapshots[-1]["Finished"]
+    assert snapshots[-1]["ETA"] == 0.0
+    assert snapshots[-1]["Count"] == 31
+
+
+def test_format_progress():
+    snapshot = {
+        "Stage": "hashing",
+        "Count": 1200,
+        "Total": 5000,
+        "Bytes": 0,
+        "TotalBytes": 0,
+        "Rate": 240.0,
+        "ByteRate": 35.2 * 1024 * 1024,
+        "Elapsed": 5.0,
+        "ETA": 75.0,
+        "Finished": False,
+    }
+    text = format_progress(snapshot, "files")
+    assert text == "1200/5000 files, 240.0 files/s, 35.2 MB/s, estimated time: 1m 15s"
+
+
+def test_update_from_threads():
+    stage = StageProgress("hashing", total=8000)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for _ in range(8000):
+            executor.submit(stage.update, 1, 10)
+    stage.finish()
+    assert stage.count == 8000
+    assert stage.nbytes == 80000
+
+
+class TtyStream(io.StringIO):
+    def isatty(self):
+        return True
+
+
+def test_progress_display(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(progress.time, "time", lambda: now[0])
+    snapshot = {
+        "Stage": "hashing",
+        "Count": 5,
+        "Total": 20,
+        "Bytes": 0,
+        "TotalBytes": 0,
+        "Rate": 5.0,
+        "ByteRate": 0.0,
+        "Elapsed": 1.0,
+        "ETA": 3.0,
+        "Finished": False,
+    }
+
+    stream = TtyStream()
+    with ProgressDisplay("Hashing...", "Done.", unit="files", stream=stream) as d:
+        d.update(snapshot)
+    assert stream.getvalue() == (
+        "\r\033[2KHashing..."
+        "\r\033[2KHashing... [#####---------------]  25% 5/20 files, 5.0 files/s,"
+        " 0.0 MB/s, estimated time: 0m 3s"
+        "\r\033[2KDone.\n"
+    )
+
+    # log lines are throttled on other streams
+    stream = io.StringIO()
+    with ProgressDisplay("Hashing...", "Done.", stream=stream) as d:
+        d.update(snapshot)
+        now[0] += 10.0
+        d.update(snapshot)
+        d.update({**snapshot, "Count": 20, "ETA": 0.0, "Finished": True})
+    assert stream.getvalue().splitlines() == [
+        "Hashing...",
+        "stage=hashing count=5 total=20 rate=5.0/s elapsed=1.0s eta=3s",
+        "stage=hashing count=20 total=20 rate=5.0/s elapsed=1.0s eta=0s",
+        "Done.",
+    ]
+
+    stream = TtyStream()
+    with ProgressDisplay("Hashing...", stream=stream, mode="off") as d:
+        d.update(snapshot)
+    assert stream.getvalue() == ""
+
+
+def test_set_progress_mode(monkeypatch):
+    monkeypatch.setattr(progress, "PROGRESS_MODE", "auto")
+    set_progress_mode("off")
+    stream = TtyStream()
+    with ProgressDisplay("Hashing...", stream=stream):
+        pass
+    assert stream.getvalue() == ""
+    with pytest.raises(ValueError):
+        set_progress_mode("quiet")
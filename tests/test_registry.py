@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import json
+
+import pytest
+
+from base import config, project
+from base.cache import ResponseCache
+from base.client import APIClient
+
+USER_ID = "test@adansons.co.jp"
+
+
+@pytest.fixture
+def server(mock_server, monkeypatch, tmp_path):
+    client = APIClient("test-key", cache=ResponseCache(str(tmp_path / "cache"), ttl=0))
+    monkeypatch.setattr(config, "get_client", lambda: client)
+    mock_server.client = client
+    return mock_server
+
+
+def test_update_project_info_with_ttl(server, create_project):
+    project_uid = create_project("project_a")
+    assert config.update_project_info(USER_ID, "project_a", ttl=60)
+    assert config.get_project_uid(USER_ID, "project_a") == project_uid
+
+    requests_num = server.stats["Requests"]
+    # fresh, and the project is found locally
+    assert not config.update_project_info(USER_ID, "project_a", ttl=60)
+    assert not config.update_project_info(USER_ID, ttl=60)
+    assert server.stats["Requests"] == requests_num
+
+    # the project is not found locally
+    project_uid = create_project("project_b")
+    assert config.update_project_info(USER_ID, "project_b", ttl=60)
+    assert config.get_project_uid(USER_ID, "project_b") == project_uid
+
+    # expired, or ttl is not given
+    assert config.update_project_info(USER_ID, "project_a", ttl=1e-9)
+    assert config.update_project_info(USER_ID, "project_a")
+
+
+def test_archived_projects(server, create_project):
+    project_uid = create_project("project_a")
+    server.client.request(
+        "DELETE", f"{server.url}/project/{project_uid}?user={USER_ID}"
+    )
+    config.update_project_info(USER_ID)
+    assert config.get_project_uid(USER_ID, "project_a") == project_uid
+
+
+def test_project_with_access_key(server, create_project, monkeypatch, tmp_path):
+    project_uid = create_project("project_a")
+    clients = []
+
+    def get_client(access_key=None):
+        client = APIClient(access_key, cache=ResponseCache(str(tmp_path / "cache")))
+        clients.append(client)
+        return client
+
+    def get_default_client():
+        raise AssertionError("the default client must not be used")
+
+    monkeypatch.setattr(project, "get_client", get_client)
+    monkeypatch.setattr(config, "get_client", get_default_client)
+    # the project is not registered locally yet
+    p = project.Project("project_a", user_id=USER_ID, access_key="other-key")
+    assert p.project_uid == project_uid
+    assert [client.access_key for client in clients] == ["other-key"]
+
+
+def test_update_project_info_without_cache(server, tmp_path):
+    # responses of the project list are cached for a long time
+    server.client.cache = ResponseCache(str(tmp_path / "cache"), ttl=3600)
+    config.update_project_info(USER_ID)
+    server.client.request("GET", f"{server.url}/projects?user={USER_ID}", cache=True)
+
+    # the project is created by another client, e.g. another process
+    other = APIClient("test-key", cache=ResponseCache(str(tmp_path / "other")))
+    other.request(
+        "POST",
+        f"{server.url}/projects?user={USER_ID}",
+        data=json.dumps({"ProjectName": "project_a", "PrivateProject": 0}),
+    )
+    assert config.update_project_info(USER_ID, "project_a", ttl=60)
+    assert config.get_project_uid(USER_ID, "project_a")
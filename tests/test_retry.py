@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import pytest
+import requests
+
+from base import retry
+from base.retry import RetryPolicy, send_request, parse_retry_after
+
+
+def patch_requests(monkeypatch, responses):
+    calls = []
+    sleeps = []
+
+    def request(method, url, **kwargs):
+        calls.append(kwargs)
+        res = responses.pop(0)
+        if isinstance(res, Exception):
+            raise res
+        return res
+
+    monkeypatch.setattr(retry.requests, "request", request)
+    monkeypatch.setattr(retry.time, "sleep", sleeps.append)
+    return calls, sleeps
+
+
+def test_retry_server_error(monkeypatch, dummy_response):
+    calls, sleeps = patch_requests(
+        monkeypatch,
+        [dummy_response(503), requests.ConnectionError(), dummy_response(200)],
+    )
+    res = send_request("GET", "http://localhost")
+    assert res.status_code == 200
+    assert len(calls) == 3
+    assert len(sleeps) == 2
+    assert calls[0]["timeout"] == retry.DEFAULT_TIMEOUT
+
+
+def test_retry_after(monkeypatch, dummy_response):
+    calls, sleeps = patch_requests(
+        monkeypatch,
+        [dummy_response(429, {"Retry-After": "3"}), dummy_response(200)],
+    )
+    res = send_request("POST", "http://localhost", data="{}")
+    assert res.status_code == 200
+    assert sleeps == [3.0]
+
+
+def test_no_retry_without_idempotency(monkeypatch, dummy_response):
+    calls, sleeps = patch_requests(monkeypatch, [dummy_response(503)])
+    res = send_request("POST", "http://localhost", data="{}")
+    assert res.status_code == 503
+
+    patch_requests(monkeypatch, [requests.ConnectionError()])
+    with pytest.raises(requests.ConnectionError):
+        send_request("POST", "http://localhost", data="{}")
+
+
+def test_idempotency_key(monkeypatch, dummy_response):
+    calls, sleeps = patch_requests(
+        monkeypatch, [dummy_response(502), dummy_response(200)]
+    )
+    res = send_request(
+        "POST",
+        "http://localhost",
+        data="{}",
+        headers={"Content-Type": "application/json"},
+        idempotency_key="batch-id",
+    )
+    assert res.status_code == 200
+    assert [c["headers"]["Idempotency-Key"] for c in calls] == ["batch-id"] * 2
+    assert calls[0]["headers"]["Content-Type"] == "application/json"
+
+
+def test_max_retries(monkeypatch, dummy_response):
+    policy = RetryPolicy(max_retries=2)
+    calls, sleeps = patch_requests(monkeypatch, [dummy_response(500)] * 3)
+    res = send_request("GET", "http://localhost", retry_policy=policy)
+    assert res.status_code == 500
+    assert len(calls) == 3
+
+
+def test_backoff():
+    policy = RetryPolicy(backoff_factor=1.0, max_backoff=10.0)
+    for attempt in range(10):
+        assert 0 <= policy.get_backoff(attempt) <= min(10.0, 2**attempt)
+    assert parse_retry_after("5") == 5.0
+    assert parse_retry_after("invalid") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
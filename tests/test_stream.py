@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import json
+
+import pytest
+
+from base.stream import iter_json_array
+
+RESULT = {
+    "Count": 3,
+    "Items": [
+        {"FileHash": "a", "label": "7", "name": '日本語 "quoted"'},
+        {"FileHash": "b", "index": 12345, "score": -1.5e-3, "flag": True},
+        {"FileHash": "c", "nested": {"list": [1, None, {"k": "]}"}]}},
+    ],
+    "NextToken": None,
+}
+
+
+def split(data, size):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 4096])
+def test_iter_json_array(size):
+    data = json.dumps(RESULT, ensure_ascii=False).encode("utf-8")
+    assert list(iter_json_array(split(data, size))) == RESULT["Items"]
+
+
+def test_empty_array():
+    assert list(iter_json_array([b'{"Items": [ ]}'])) == []
+
+
+def test_invalid_data():
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'{"Count": 0}']))
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'{"Items": [{"a": 1}, {"b"']))
+    with pytest.raises(ValueError):
+        list(iter_json_array([b"[]"]))
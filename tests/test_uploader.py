@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Adansons Inc.
+# Please contact engineer@adansons.co.jp
+import io
+import json
+import time
+
+import requests
+
+from base import retry
+from base.client import APIClient
+from base.uploader import (
+    BatchUploader,
+    build_payload,
+    expand_common_attributes,
+    get_batch_id,
+)
+
+CLIENT = APIClient(access_key="test-key")
+RECORDS = [{"FileHash": f"{i:064d}", "label": str(i % 10)} for i in range(1000)]
+
+
+def test_build_payload():
+    batch = [json.dumps(r) for r in RECORDS[:3]]
+    payload = build_payload(batch)
+    assert json.loads(payload) == {"Items": RECORDS[:3]}
+    assert payload == json.dumps({"Items": RECORDS[:3]}).encode("utf-8")
+
+
+def test_iter_batches_by_bytes():
+    batch_uploader = BatchUploader(
+        "http://localhost", CLIENT, min_batch_bytes=1024, initial_batch_bytes=4096
+    )
+    batches = list(batch_uploader.iter_batches(RECORDS))
+    assert sum(len(b) for b in batches) == len(RECORDS)
+    for batch in batches:
+        assert len(build_payload(batch)) <= 4096
+
+
+def test_iter_batches_by_records():
+    batch_uploader = BatchUploader("http://localhost", CLIENT, max_batch_records=300)
+    batches = list(batch_uploader.iter_batches(RECORDS))
+    assert [len(b) for b in batches] == [300, 300, 300, 100]
+
+
+def test_split_too_large_batch(monkeypatch, dummy_response):
+    posted = []
+
+    def request(self, method, url, data, headers, timeout):
+        assert headers["Idempotency-Key"] == get_batch_id(data)
+        assert headers["x-api-key"] == "test-key"
+        if len(data) > 2048:
+            return dummy_response(413)
+        posted.extend(json.loads(data)["Items"])
+        return dummy_response(200)
+
+    monkeypatch.setattr(requests.Session, "request", request)
+    batch_uploader = BatchUploader(
+        "http://localhost", CLIENT, min_batch_bytes=1024, initial_batch_bytes=8192
+    )
+    record_num = batch_uploader.upload(RECORDS)
+    assert record_num == len(RECORDS)
+    assert posted == RECORDS
+    assert batch_uploader.max_batch_bytes < 8192
+
+
+def test_adapt_batch_bytes():
+    batch_uploader = BatchUploader(
+        "http://localhost", CLIENT, initial_batch_bytes=1024 * 1024, target_latency=10.0
+    )
+    batch_uploader.adapt(1024 * 1024, 1.0)
+    assert batch_uploader.batch_bytes == 2 * 1024 * 1024
+    batch_uploader.adapt(2 * 1024 * 1024, 40.0)
+    assert batch_uploader.batch_bytes == 1024 * 1024
+
+
+def test_dry_run(monkeypatch):
+    def request(self, *args, **kwargs):
+        raise AssertionError("dry run must not send requests")
+
+    monkeypatch.setattr(requests.Session, "request", request)
+    output = io.StringIO()
+    batch_uploader = BatchUploader(
+        "http://localhost", CLIENT, max_batch_records=300, dry_run=True, output=output
+    )
+    record_num = batch_uploader.upload(RECORDS)
+    lines = output.getvalue().splitlines()
+    assert record_num == len(RECORDS)
+    assert batch_uploader.batch_num == len(lines) == 4
+    assert batch_uploader.uploaded_bytes == sum(len(line) for line in lines)
+    assert [r for line in lines for r in json.loads(line)["Items"]] == RECORDS
+
+
+def test_common_attributes(monkeypatch, dummy_response):
+    common = {f"shared{i}": "value" for i in range(10)}
+    posted = []
+
+    def request(self, method, url, data, headers, timeout):
+        posted.extend(expand_common_attributes(json.loads(data)))
+        return dummy_response(200)
+
+    monkeypatch.setattr(requests.Session, "request", request)
+    batch_uploader = BatchUploader(
+        "http://localhost", CLIENT, initial_batch_bytes=8192, common_attributes=common
+    )
+    batch_uploader.upload(RECORDS)
+    assert posted == [{**common, **r} for r in RECORDS]
+
+    batch = [json.dumps(r) for r in RECORDS[:3]]
+    payload = build_payload(batch, common)
+    assert json.loads(payload) == {"Items": RECORDS[:3], "common_keyvalue": common}
+    # record attributes take precedence over common attributes
+    assert expand_common_attributes(
+        {"Items": [{"label": "1"}], "common_keyvalue": {"label": "0", "rig": "A"}}
+    ) == [{"label": "1", "rig": "A"}]
+
+
+def test_adapt_without_retry_wait(monkeypatch, dummy_response):
+    responses = [dummy_response(429, {"Retry-After": "30"})]
+
+    def request(self, method, url, data, headers, timeout):
+        return responses.pop(0) if responses else dummy_response(200, elapsed=0.1)
+
+    # waiting for Retry-After moves the clock without sleeping
+    offset = []
+    real_time = time.time
+    monkeypatch.setattr(requests.Session, "request", request)
+    monkeypatch.setattr(retry.time, "sleep", offset.append)
+    monkeypatch.setattr(time, "time", lambda: real_time() + sum(offset))
+    batch_uploader = BatchUploader(
+        "http://localhost",
+        CLIENT,
+        min_batch_bytes=1024,
+        initial_batch_bytes=2048,
+        target_latency=1.0,
+    )
+    batch_uploader.upload(RECORDS[:15])
+    assert batch_uploader.batch_num == 1
+    assert sum(offset) == 30.0
+    # the wait is not taken as latency of the server
+    assert batch_uploader.batch_bytes == 4096